@@ -1,37 +1,131 @@
-from pydantic_ai import Agent
-from pydantic_ai.models.openai import OpenAIModel
-from pydantic_ai.providers.openai import OpenAIProvider
+import asyncio
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, List, Tuple
+from ..models import COMMON_FIELDS
 from ..models.character import CharacterCreate
-from ..utils.i18n import trans 
+from ..utils.i18n import get_language
+from ..utils.rate_limit import RateLimiter, retry_async
 from ..config import settings
+from .prompts import get_system_prompt
+from .registry import get_agent
+from .generation_cache import generation_cache, make_key, normalize_prompt
 
+if TYPE_CHECKING:
+    from pydantic_ai import Agent
 
-# model_provider
-OPENAI_API_KEY = settings.OPENAI_API_KEY
-OPENAI_BASE_URL = settings.OPENAI_BASE_URL
-OPENAI_MODEL = settings.OPENAI_MODEL
+# 所有模型调用共用的并发与速率限制
+generation_limiter = RateLimiter(
+    settings.GENERATION_CONCURRENCY,
+    requests_per_minute=settings.GENERATION_RPM,
+    tokens_per_minute=settings.GENERATION_TPM,
+)
 
-if OPENAI_API_KEY is None:
-    raise ValueError("OPENAI_API_KEY is not set, please set it and try again.")
-if OPENAI_BASE_URL is None:
-    raise ValueError("OPENAI_BASE_URL is not set, please set it and try again.")
-if OPENAI_MODEL is None:
-    raise ValueError("OPENAI_MODEL is not set, please set it and try again.")
 
+def get_character_agent() -> "Agent[None, CharacterCreate]":
+    """当前请求语言的角色生成 agent，每种语言只创建一次，由 registry 缓存并共用连接池"""
+    language = get_language()
+    return get_agent(CharacterCreate, get_system_prompt("character", language), language)
 
-# agent 
-provider = OpenAIProvider(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL)
-model = OpenAIModel(model_name=OPENAI_MODEL, provider=provider)
-character_agent = Agent(
-    model,
-    output_type=CharacterCreate,
-    system_prompt=trans("You are a helpful assistant that can help with character creation."),
-)
+
+def _cache_key(user_prompt: str) -> str:
+    language = get_language()
+    return make_key(
+        model=settings.OPENAI_MODEL,
+        base_url=settings.OPENAI_BASE_URL,
+        system_prompt=get_system_prompt("character", language),
+        language=language,
+        user_prompt=user_prompt,
+        output_type=CharacterCreate,
+    )
+
+
+async def _cached_character(key: str) -> CharacterCreate | None:
+    value = await generation_cache.get(key)
+    return CharacterCreate.model_validate_json(value) if value is not None else None
+
+
+def _estimate_tokens(user_prompt: str) -> int:
+    # 按每个字符一个 token 估算（中文接近，英文偏多），实际用量在调用结束后修正
+    return len(get_system_prompt("character")) + len(user_prompt) + settings.GENERATION_ESTIMATED_OUTPUT_TOKENS
+
+
+async def _run_agent(user_prompt: str):
+    estimated = _estimate_tokens(user_prompt)
+
+    async def run():
+        async with generation_limiter.slot(estimated):
+            result = await get_character_agent().run(user_prompt)
+        generation_limiter.record_usage(estimated, result.usage().total_tokens)
+        return result
+
+    return await retry_async(
+        run,
+        retries=settings.GENERATION_MAX_RETRIES,
+        base_delay=settings.GENERATION_RETRY_BASE_SECONDS,
+        max_delay=settings.GENERATION_RETRY_MAX_SECONDS,
+        limiter=generation_limiter,
+    )
+
+
+async def generate_character(user_prompt: str, use_cache: bool = True) -> CharacterCreate | None:
+    """generate character by user_prompt，use_cache=False 时跳过生成结果缓存"""
+    use_cache = use_cache and settings.GENERATION_CACHE_ENABLED
+    if use_cache:
+        key = _cache_key(user_prompt)
+        cached = await _cached_character(key)
+        if cached is not None:
+            return cached
+    result = await _run_agent(user_prompt)
+    if not hasattr(result, 'output'):
+        return None
+    if use_cache:
+        await generation_cache.set(key, result.output.model_dump_json(exclude=COMMON_FIELDS))
+    return result.output
+
+
+async def stream_character(user_prompt: str, use_cache: bool = True) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """
+    流式生成角色：每当模型多填出一部分字段就产生一个 ("partial", 已生成的字段)，
+    结束时产生 ("result", 校验后的完整角色)。提前关闭迭代器会关闭到模型的流式请求。
+    命中生成结果缓存时直接产生 result。
+    """
+    use_cache = use_cache and settings.GENERATION_CACHE_ENABLED
+    if use_cache:
+        key = _cache_key(user_prompt)
+        cached = await _cached_character(key)
+        if cached is not None:
+            yield "result", cached.model_dump(mode="json")
+            return
+    estimated = _estimate_tokens(user_prompt)
+    async with generation_limiter.slot(estimated), get_character_agent().run_stream(user_prompt) as result:
+        previous = None
+        output = None
+        async for output in result.stream(debounce_by=settings.GENERATION_STREAM_DEBOUNCE_SECONDS):
+            partial = output.model_dump(mode="json", exclude_unset=True, exclude=COMMON_FIELDS)
+            if partial != previous:
+                previous = partial
+                yield "partial", partial
+        if output is None:
+            output = await result.get_output()
+        generation_limiter.record_usage(estimated, result.usage().total_tokens)
+    if use_cache:
+        await generation_cache.set(key, output.model_dump_json(exclude=COMMON_FIELDS))
+    yield "result", output.model_dump(mode="json")
 
 
-async def generate_character(user_prompt: str) -> CharacterCreate | None:
-    """generate character by user_prompt"""
-    result = await character_agent.run(user_prompt)
-    if hasattr(result, 'output'):
-        return result.output
-    return None
\ No newline at end of file
+async def generate_characters(user_prompts: List[str], use_cache: bool = True) -> List[CharacterCreate | Exception]:
+    """
+    并发生成多个角色，并发数与速率由 generation_limiter 控制，总耗时接近最慢的一次调用。
+    返回与 user_prompts 一一对应的结果，失败的元素为对应的异常。
+    同一提示词出现多次时只有第一次使用缓存，其余重新生成，避免得到完全相同的角色。
+    """
+    seen = set()
+    calls = []
+    for user_prompt in user_prompts:
+        key = normalize_prompt(user_prompt)
+        calls.append(generate_character(user_prompt, use_cache=use_cache and key not in seen))
+        seen.add(key)
+    results = await asyncio.gather(*calls, return_exceptions=True)
+    return [
+        result if result is not None else ValueError("The model returned no character")
+        for result in results
+    ]
@@ -0,0 +1,207 @@
+"""
+模型生成结果的持久化缓存。
+
+相同的 (模型, 接口地址, 系统提示词, 语言, 用户提示词, 输出结构) 直接返回上次的结果，不再调用模型。
+键是上述内容规范化后的 blake2b 摘要：提示词做 Unicode NFC 规范化并合并空白，输出结构取 JSON Schema 并排序键。
+
+结果保存在独立的 SQLite 文件中（GENERATION_CACHE_PATH），与业务数据库无关，重启后仍然有效：
+- 超过 GENERATION_CACHE_TTL_SECONDS 的条目视为过期
+- 条目数或总大小超过上限时，按最近访问时间淘汰到上限的 90%
+数据库操作在线程池中执行，不阻塞事件循环。
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from functools import lru_cache
+from typing import Any, Optional, Type
+
+from anyio import to_thread
+from pydantic import BaseModel
+
+from ..config import settings
+
+# 规范化规则或缓存内容格式变化时修改，使旧条目全部失效
+KEY_VERSION = 1
+# 淘汰时清理到上限的比例，避免缓存满后每次写入都触发淘汰
+LOW_WATERMARK = 0.9
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS generation_cache (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS ix_generation_cache_accessed_at ON generation_cache (accessed_at);
+"""
+
+
+def normalize_prompt(text: Optional[str]) -> str:
+    text = unicodedata.normalize("NFC", text or "")
+    return re.sub(r"\s+", " ", text).strip()
+
+
+@lru_cache(maxsize=64)
+def _schema(output_type: Type[BaseModel]) -> str:
+    return json.dumps(output_type.model_json_schema(), ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+
+
+def _normalize_base_url(url: Optional[str]) -> str:
+    return (url or "").strip().rstrip("/").lower()
+
+
+def make_key(
+    *,
+    model: str,
+    base_url: Optional[str],
+    system_prompt: str,
+    language: str,
+    user_prompt: str,
+    output_type: Type[BaseModel],
+) -> str:
+    payload = {
+        "v": KEY_VERSION,
+        "model": model,
+        "base_url": _normalize_base_url(base_url),
+        "system_prompt": normalize_prompt(system_prompt),
+        "language": language,
+        "user_prompt": normalize_prompt(user_prompt),
+        "schema": _schema(output_type),
+    }
+    raw = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=20).hexdigest()
+
+
+class GenerationCache:
+    def __init__(self, path: str, ttl_seconds: float, max_entries: int, max_bytes: int):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._connection: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.expired = 0
+        self.evictions = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        # 第一次使用时才创建文件
+        if self._connection is None:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(_SCHEMA)
+            self._connection = connection
+        return self._connection
+
+    def get_sync(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            row = connection.execute("SELECT value, created_at FROM generation_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            value, created_at = row
+            if created_at + self.ttl_seconds < now:
+                connection.execute("DELETE FROM generation_cache WHERE key = ?", (key,))
+                self.expired += 1
+                self.misses += 1
+                return None
+            connection.execute(
+                "UPDATE generation_cache SET accessed_at = ?, hits = hits + 1 WHERE key = ?", (now, key)
+            )
+            self.hits += 1
+            return value
+
+    def set_sync(self, key: str, value: str):
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            connection.execute(
+                "INSERT OR REPLACE INTO generation_cache (key, value, size, created_at, accessed_at, hits) "
+                "VALUES (?, ?, ?, ?, ?, 0)",
+                (key, value, size, now, now),
+            )
+            self.writes += 1
+            self._evict(connection, now)
+
+    def _evict(self, connection: sqlite3.Connection, now: float):
+        count, total = connection.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM generation_cache").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        self.expired += connection.execute(
+            "DELETE FROM generation_cache WHERE created_at < ?", (now - self.ttl_seconds,)
+        ).rowcount
+        count, total = connection.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM generation_cache").fetchone()
+        target_count = int(self.max_entries * LOW_WATERMARK)
+        target_bytes = int(self.max_bytes * LOW_WATERMARK)
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        victims = []
+        for key, size in connection.execute("SELECT key, size FROM generation_cache ORDER BY accessed_at, key"):
+            if count <= target_count and total <= target_bytes:
+                break
+            victims.append((key,))
+            count -= 1
+            total -= size
+        connection.executemany("DELETE FROM generation_cache WHERE key = ?", victims)
+        self.evictions += len(victims)
+
+    async def get(self, key: str) -> Optional[str]:
+        return await to_thread.run_sync(self.get_sync, key)
+
+    async def set(self, key: str, value: str):
+        await to_thread.run_sync(self.set_sync, key, value)
+
+    def clear(self):
+        with self._lock:
+            self._connect().execute("DELETE FROM generation_cache")
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        stats: dict[str, Any] = {
+            "enabled": settings.GENERATION_CACHE_ENABLED,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "writes": self.writes,
+            "expired": self.expired,
+            "evictions": self.evictions,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+        }
+        if self._connection is not None:
+            with self._lock:
+                stats["entries"], stats["size_bytes"] = self._connection.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM generation_cache"
+                ).fetchone()
+        return stats
+
+
+generation_cache = GenerationCache(
+    settings.GENERATION_CACHE_PATH,
+    ttl_seconds=settings.GENERATION_CACHE_TTL_SECONDS,
+    max_entries=settings.GENERATION_CACHE_MAX_ENTRIES,
+    max_bytes=settings.GENERATION_CACHE_MAX_BYTES,
+)
@@ -0,0 +1,31 @@
+"""
+agent 的系统提示词。
+
+提示词原文（英文）作为翻译的 msgid 写在 SYSTEM_PROMPTS 中，
+第一次使用时为 SUPPORTED_LANGUAGE 中的每种语言翻译一次并保存，之后按请求语言查表，
+不再在导入时固定为启动时的语言。修改提示词后需要同步更新 locales 中的翻译。
+"""
+from functools import lru_cache
+from typing import Dict, Optional
+
+from ..utils.i18n import DEFAULT_LANGUAGE, SUPPORTED_LANGUAGE, get_language, trans
+
+SYSTEM_PROMPTS: Dict[str, str] = {
+    "character": "You are a helpful assistant that can help with character creation.",
+}
+
+
+@lru_cache(maxsize=1)
+def _prompt_table() -> Dict[str, Dict[str, str]]:
+    # 在应用启动编译翻译文件之后才会被调用到
+    return {
+        name: {language: trans(message, language) for language in SUPPORTED_LANGUAGE}
+        for name, message in SYSTEM_PROMPTS.items()
+    }
+
+
+def get_system_prompt(name: str, language: Optional[str] = None) -> str:
+    """name 对应的系统提示词，language 为空时使用当前请求的语言，不支持的语言使用默认语言"""
+    prompts = _prompt_table()[name]
+    return prompts.get(language or get_language()) or prompts[DEFAULT_LANGUAGE]
+
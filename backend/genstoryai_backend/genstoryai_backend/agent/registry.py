@@ -0,0 +1,112 @@
+"""
+模型与 agent 的注册表。
+
+- 所有 provider 共用一个 httpx.AsyncClient：连接池保持长连接，大部分调用不需要重新建立 TCP/TLS 连接，
+  连接数上限与超时由 GENERATION_HTTP_* 配置
+- provider 按 (接口地址, API key) 缓存，agent 按 (模型配置, 输出结构, 语言) 缓存，首次使用时才创建
+- 默认使用 OPENAI_MODEL / OPENAI_BASE_URL / OPENAI_API_KEY，调用方可以为某个 agent 指定其他模型或服务商
+应用关闭时调用 close_http_client 关闭连接池并清空缓存，再次使用时重新创建。
+"""
+import threading
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple, Type
+
+import httpx
+from pydantic import BaseModel
+
+from ..config import settings
+
+if TYPE_CHECKING:
+    from pydantic_ai import Agent
+    from pydantic_ai.providers.openai import OpenAIProvider
+
+
+@dataclass(frozen=True)
+class ModelConfig:
+    model: str
+    base_url: str
+    api_key: str
+
+    @classmethod
+    def from_settings(cls, model: Optional[str] = None, base_url: Optional[str] = None, api_key: Optional[str] = None):
+        config = cls(
+            model=model or settings.OPENAI_MODEL,
+            base_url=base_url or settings.OPENAI_BASE_URL,
+            api_key=api_key or settings.OPENAI_API_KEY,
+        )
+        if not config.api_key:
+            raise ValueError("OPENAI_API_KEY is not set, please set it and try again.")
+        if not config.base_url:
+            raise ValueError("OPENAI_BASE_URL is not set, please set it and try again.")
+        if not config.model:
+            raise ValueError("OPENAI_MODEL is not set, please set it and try again.")
+        return config
+
+
+_lock = threading.Lock()
+_http_client: Optional[httpx.AsyncClient] = None
+_providers: Dict[Tuple[str, str], "OpenAIProvider"] = {}
+_agents: Dict[Tuple[ModelConfig, Type[BaseModel], str], "Agent[None, Any]"] = {}
+
+
+def get_http_client() -> httpx.AsyncClient:
+    global _http_client
+    with _lock:
+        if _http_client is None or _http_client.is_closed:
+            _http_client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=settings.GENERATION_HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.GENERATION_HTTP_MAX_KEEPALIVE,
+                    keepalive_expiry=settings.GENERATION_HTTP_KEEPALIVE_SECONDS,
+                ),
+                timeout=httpx.Timeout(
+                    settings.GENERATION_HTTP_TIMEOUT_SECONDS,
+                    connect=settings.GENERATION_HTTP_CONNECT_TIMEOUT_SECONDS,
+                ),
+            )
+        return _http_client
+
+
+def get_provider(config: ModelConfig) -> "OpenAIProvider":
+    from pydantic_ai.providers.openai import OpenAIProvider
+
+    key = (config.base_url, config.api_key)
+    provider = _providers.get(key)
+    if provider is None:
+        provider = OpenAIProvider(base_url=config.base_url, api_key=config.api_key, http_client=get_http_client())
+        _providers[key] = provider
+    return provider
+
+
+def get_agent(
+    output_type: Type[BaseModel],
+    system_prompt: str,
+    language: str,
+    config: Optional[ModelConfig] = None,
+) -> "Agent[None, Any]":
+    """
+    返回缓存的 agent，没有时创建；system_prompt 为 language 对应的提示词，
+    同一 (模型配置, 输出结构, 语言) 只创建一次，因此调用方需要保证提示词只由这些参数决定
+    """
+    from pydantic_ai import Agent
+    from pydantic_ai.models.openai import OpenAIModel
+
+    config = config or ModelConfig.from_settings()
+    key = (config, output_type, language)
+    agent = _agents.get(key)
+    if agent is None:
+        model = OpenAIModel(model_name=config.model, provider=get_provider(config))
+        agent = Agent(model, output_type=output_type, system_prompt=system_prompt)
+        _agents[key] = agent
+    return agent
+
+
+async def close_http_client():
+    global _http_client
+    with _lock:
+        client, _http_client = _http_client, None
+        _providers.clear()
+        _agents.clear()
+    if client is not None:
+        await client.aclose()
+
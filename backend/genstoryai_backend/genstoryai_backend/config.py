@@ -23,6 +23,18 @@ def print_env_vars():
     # 数据库配置
     print("\n🗄️  数据库配置:")
     print(f"  DATABASE_URL: {os.getenv('DATABASE_URL', 'sqlite:///./genstoryai.db')}")
+    print(f"  DB_POOL_SIZE: {os.getenv('DB_POOL_SIZE', '5')}")
+    print(f"  DB_MAX_OVERFLOW: {os.getenv('DB_MAX_OVERFLOW', '10')}")
+    print(f"  DB_POOL_RECYCLE: {os.getenv('DB_POOL_RECYCLE', '1800')}")
+    print(f"  DB_POOL_PRE_PING: {os.getenv('DB_POOL_PRE_PING', 'true')}")
+    print(f"  SQLITE_JOURNAL_MODE: {os.getenv('SQLITE_JOURNAL_MODE', 'WAL')}")
+    print(f"  SQLITE_SYNCHRONOUS: {os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')}")
+    print(f"  SOFT_DELETE: {os.getenv('SOFT_DELETE', 'true')}")
+    print(f"  PURGE_INTERVAL_SECONDS: {os.getenv('PURGE_INTERVAL_SECONDS', '3600')}")
+    print(f"  PURGE_RETENTION_DAYS: {os.getenv('PURGE_RETENTION_DAYS', '30')}")
+    print(f"  ENTITY_CACHE_ENABLED: {os.getenv('ENTITY_CACHE_ENABLED', 'true')}")
+    print(f"  ENTITY_CACHE_SHARED_URL: {os.getenv('ENTITY_CACHE_SHARED_URL', '未设置')}")
+    print(f"  SSF_CODEC: {os.getenv('SSF_CODEC', 'zlib')}")
     
     # JWT配置
     print("\n🔐 JWT配置:")
@@ -51,6 +63,11 @@ def print_env_vars():
     print("\n📊 日志配置:")
     print(f"  LOG_LEVEL: {os.getenv('LOG_LEVEL', 'INFO')}")
     print(f"  LOG_FILE: {os.getenv('LOG_FILE', '未设置')}")
+
+    # 启动配置
+    print("\n🚀 启动配置:")
+    print(f"  I18N_COMPILE_ON_STARTUP: {os.getenv('I18N_COMPILE_ON_STARTUP', 'true')}")
+    print(f"  STARTUP_IMPORTTIME_ENABLED: {os.getenv('STARTUP_IMPORTTIME_ENABLED', 'false')}")
     
     print("\n" + "=" * 50)
 
@@ -59,10 +76,81 @@ class Settings:
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "your-openai-api-key")
     OPENAI_MODEL: str = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
     OPENAI_BASE_URL: str = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+    # 流式生成：部分结果的合并间隔（秒），以及等待模型时 SSE 心跳的间隔（秒）
+    GENERATION_STREAM_DEBOUNCE_SECONDS: float = float(os.getenv("GENERATION_STREAM_DEBOUNCE_SECONDS", 0.05))
+    SSE_HEARTBEAT_SECONDS: float = float(os.getenv("SSE_HEARTBEAT_SECONDS", 15))
+    # 生成结果缓存：相同提示词直接返回上次的结果，保存在独立的 SQLite 文件中
+    GENERATION_CACHE_ENABLED: bool = os.getenv("GENERATION_CACHE_ENABLED", "true").lower() == "true"
+    GENERATION_CACHE_PATH: str = os.getenv("GENERATION_CACHE_PATH", "./generation_cache.db")
+    GENERATION_CACHE_TTL_SECONDS: int = int(os.getenv("GENERATION_CACHE_TTL_SECONDS", 7 * 24 * 3600))
+    GENERATION_CACHE_MAX_ENTRIES: int = int(os.getenv("GENERATION_CACHE_MAX_ENTRIES", 10000))
+    GENERATION_CACHE_MAX_BYTES: int = int(os.getenv("GENERATION_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+    # 模型调用的并发数与服务商速率限制（0 表示不限制），预留 TPM 时按提示词字符数加上预计输出 token 数估算
+    GENERATION_CONCURRENCY: int = int(os.getenv("GENERATION_CONCURRENCY", 8))
+    GENERATION_RPM: int = int(os.getenv("GENERATION_RPM", 60))
+    GENERATION_TPM: int = int(os.getenv("GENERATION_TPM", 100000))
+    GENERATION_ESTIMATED_OUTPUT_TOKENS: int = int(os.getenv("GENERATION_ESTIMATED_OUTPUT_TOKENS", 800))
+    # 429 的重试次数与指数退避的初始、最大等待时间
+    GENERATION_MAX_RETRIES: int = int(os.getenv("GENERATION_MAX_RETRIES", 4))
+    GENERATION_RETRY_BASE_SECONDS: float = float(os.getenv("GENERATION_RETRY_BASE_SECONDS", 1.0))
+    GENERATION_RETRY_MAX_SECONDS: float = float(os.getenv("GENERATION_RETRY_MAX_SECONDS", 30.0))
+    # 批量生成单次请求的最大角色数
+    GENERATION_BATCH_MAX_ITEMS: int = int(os.getenv("GENERATION_BATCH_MAX_ITEMS", 50))
+    # 调用模型接口的共享连接池：最大连接数、保持的空闲长连接数及其存活时间、连接与整体超时
+    GENERATION_HTTP_MAX_CONNECTIONS: int = int(os.getenv("GENERATION_HTTP_MAX_CONNECTIONS", 64))
+    GENERATION_HTTP_MAX_KEEPALIVE: int = int(os.getenv("GENERATION_HTTP_MAX_KEEPALIVE", 16))
+    GENERATION_HTTP_KEEPALIVE_SECONDS: float = float(os.getenv("GENERATION_HTTP_KEEPALIVE_SECONDS", 60.0))
+    GENERATION_HTTP_CONNECT_TIMEOUT_SECONDS: float = float(os.getenv("GENERATION_HTTP_CONNECT_TIMEOUT_SECONDS", 10.0))
+    GENERATION_HTTP_TIMEOUT_SECONDS: float = float(os.getenv("GENERATION_HTTP_TIMEOUT_SECONDS", 300.0))
 
 
     # 数据库配置
     DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./genstoryai.db")
+    DB_ECHO: bool = os.getenv("DB_ECHO", "false").lower() == "true"
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", 5))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", 10))
+    DB_POOL_TIMEOUT: int = int(os.getenv("DB_POOL_TIMEOUT", 30))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", 1800))
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+    # SQLite 调优（仅对 sqlite 连接生效）
+    SQLITE_JOURNAL_MODE: str = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+    SQLITE_SYNCHRONOUS: str = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+    SQLITE_BUSY_TIMEOUT: int = int(os.getenv("SQLITE_BUSY_TIMEOUT", 5000))
+    SQLITE_MMAP_SIZE: int = int(os.getenv("SQLITE_MMAP_SIZE", 268435456))
+    SQLITE_CACHE_SIZE: int = int(os.getenv("SQLITE_CACHE_SIZE", -64000))
+    # 软删除：删除时只标记 is_deleted，由后台任务分批物理删除
+    SOFT_DELETE: bool = os.getenv("SOFT_DELETE", "true").lower() == "true"
+    PURGE_INTERVAL_SECONDS: int = int(os.getenv("PURGE_INTERVAL_SECONDS", 3600))
+    PURGE_RETENTION_DAYS: int = int(os.getenv("PURGE_RETENTION_DAYS", 30))
+    PURGE_BATCH_SIZE: int = int(os.getenv("PURGE_BATCH_SIZE", 500))
+    # 故事/角色读缓存
+    ENTITY_CACHE_ENABLED: bool = os.getenv("ENTITY_CACHE_ENABLED", "true").lower() == "true"
+    ENTITY_CACHE_MAX_BYTES: int = int(os.getenv("ENTITY_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+    ENTITY_CACHE_TTL_SECONDS: int = int(os.getenv("ENTITY_CACHE_TTL_SECONDS", 60))
+    # 多 worker 部署时的共享缓存，例如 redis://localhost:6379/0；为空表示只用进程内缓存
+    ENTITY_CACHE_SHARED_URL: str = os.getenv("ENTITY_CACHE_SHARED_URL", "")
+    ENTITY_CACHE_SHARED_TTL_SECONDS: int = int(os.getenv("ENTITY_CACHE_SHARED_TTL_SECONDS", 300))
+    # 批量接口单次请求的最大条数
+    BULK_MAX_ITEMS: int = int(os.getenv("BULK_MAX_ITEMS", 1000))
+    # SSF 存储压缩：none / zlib / zstd / lz4（zstd、lz4 需要安装可选依赖）
+    SSF_CODEC: str = os.getenv("SSF_CODEC", "zlib").lower()
+    SSF_COMPRESS_MIN_BYTES: int = int(os.getenv("SSF_COMPRESS_MIN_BYTES", 512))
+    # Story.ssf_obj 解析结果缓存的容量（按 SSF JSON 字节数估算）
+    SSF_PARSE_CACHE_MAX_BYTES: int = int(os.getenv("SSF_PARSE_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+    # 流式导入导出：每批读写的块数，导入时单行的最大字节数
+    SSF_STREAM_BATCH_SIZE: int = int(os.getenv("SSF_STREAM_BATCH_SIZE", 200))
+    SSF_IMPORT_MAX_LINE_BYTES: int = int(os.getenv("SSF_IMPORT_MAX_LINE_BYTES", 4 * 1024 * 1024))
+    # 故事历史版本：每隔多少个版本保存一次完整快照，压缩任务为每个故事保留的版本数，
+    # 以及自动版本的合并时间（秒），该时间内连续的修改合并为一个版本，0 表示每次修改都记录
+    STORY_REVISION_SNAPSHOT_INTERVAL: int = int(os.getenv("STORY_REVISION_SNAPSHOT_INTERVAL", 20))
+    STORY_REVISION_KEEP: int = int(os.getenv("STORY_REVISION_KEEP", 100))
+    STORY_REVISION_COALESCE_SECONDS: float = float(os.getenv("STORY_REVISION_COALESCE_SECONDS", 0))
+    # 人物关系图谱：内存中缓存的故事数，以及单次 k 跳查询的最大深度与节点数
+    RELATIONSHIP_GRAPH_CACHE_SIZE: int = int(os.getenv("RELATIONSHIP_GRAPH_CACHE_SIZE", 128))
+    RELATIONSHIP_GRAPH_MAX_DEPTH: int = int(os.getenv("RELATIONSHIP_GRAPH_MAX_DEPTH", 6))
+    RELATIONSHIP_GRAPH_MAX_NODES: int = int(os.getenv("RELATIONSHIP_GRAPH_MAX_NODES", 5000))
+    # 时间线区间索引：内存中缓存的故事数
+    TIMELINE_INDEX_CACHE_SIZE: int = int(os.getenv("TIMELINE_INDEX_CACHE_SIZE", 128))
     
     # JWT配置
     SECRET_KEY: str = os.getenv("SECRET_KEY", "your-secret-key-change-this-in-production")
@@ -87,6 +175,13 @@ class Settings:
     LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO").upper()
     LOG_FILE: str = os.getenv("LOG_FILE", "")
 
+    # 启动配置
+    # 启动时是否编译过期的翻译文件；构建阶段已执行 compile-translations 时可关闭
+    I18N_COMPILE_ON_STARTUP: bool = os.getenv("I18N_COMPILE_ON_STARTUP", "true").lower() == "true"
+    # /system/startup?importtime=true 会启动子进程，只在调试时开启；子进程的超时时间（秒）
+    STARTUP_IMPORTTIME_ENABLED: bool = os.getenv("STARTUP_IMPORTTIME_ENABLED", "false").lower() == "true"
+    STARTUP_IMPORTTIME_TIMEOUT_SECONDS: float = float(os.getenv("STARTUP_IMPORTTIME_TIMEOUT_SECONDS", 60))
+
     @classmethod
     def get_smtp_config(cls) -> dict:
         return {
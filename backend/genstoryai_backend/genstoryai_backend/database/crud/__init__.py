@@ -1,3 +1,7 @@
 from .character_crud import *
 from .user_crud import *
 from .story_crud import *
+from .story_block_crud import *
+from .story_revision_crud import *
+from .character_relationship_crud import *
+from .timeline_crud import *
@@ -0,0 +1,111 @@
+"""
+批量写入的通用实现：整批数据在一个事务中通过 executemany 写入，返回每个元素的结果。
+"""
+from datetime import datetime
+from typing import Any, Dict, List, Type
+
+from fastapi import HTTPException, status
+from sqlalchemy import insert, update
+from sqlmodel import SQLModel, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from genstoryai_backend.config import settings
+from genstoryai_backend.models import COMMON_FIELDS, BulkItemResult
+
+
+def check_bulk_size(items: List[Any]):
+    if not items:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No items given")
+    if len(items) > settings.BULK_MAX_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {settings.BULK_MAX_ITEMS} items per request",
+        )
+
+
+def _table_values(model: Type[SQLModel], data: Dict[str, Any]) -> Dict[str, Any]:
+    columns = model.__table__.columns
+    return {key: value for key, value in data.items() if key in columns}
+
+
+async def _alive_ids(db: AsyncSession, model: Type[SQLModel], ids: List[int]) -> set:
+    return set((await db.exec(
+        select(model.id).where(model.id.in_(set(ids)), model.is_deleted == False)
+    )).all())
+
+
+async def bulk_create_async(
+    db: AsyncSession, model: Type[SQLModel], items: List[SQLModel], commit: bool = True
+) -> List[BulkItemResult]:
+    """
+    commit=False 时由调用方在同一事务中写入关联数据后提交。
+    支持 INSERT ... RETURNING 的数据库（SQLite、PostgreSQL）一条语句写入并按参数顺序返回主键，
+    MySQL 没有 RETURNING，逐行插入并读取 lastrowid，仍在同一个事务中。
+    """
+    check_bulk_size(items)
+    now = datetime.utcnow()
+    rows = [
+        {**_table_values(model, item.model_dump(exclude={"id"} | COMMON_FIELDS)),
+         "create_time": now, "update_time": now, "is_deleted": False}
+        for item in items
+    ]
+    if db.bind.dialect.insert_executemany_returning_sort_by_parameter_order:
+        ids = (await db.exec(
+            insert(model).returning(model.id, sort_by_parameter_order=True), params=rows
+        )).scalars().all()
+    else:
+        ids = [(await db.exec(insert(model).values(**row))).inserted_primary_key[0] for row in rows]
+    if commit:
+        await db.commit()
+    return [BulkItemResult(index=index, id=row_id, ok=True) for index, row_id in enumerate(ids)]
+
+
+async def bulk_update_async(
+    db: AsyncSession, model: Type[SQLModel], items: List[SQLModel], commit: bool = True
+) -> List[BulkItemResult]:
+    """按主键批量更新，每个元素只更新其显式给出的字段；commit=False 时由调用方提交"""
+    check_bulk_size(items)
+    alive = await _alive_ids(db, model, [item.id for item in items])
+    now = datetime.utcnow()
+    results, rows = [], []
+    for index, item in enumerate(items):
+        if item.id not in alive:
+            results.append(BulkItemResult(index=index, id=item.id, ok=False, error="Not found"))
+            continue
+        values = _table_values(model, item.model_dump(exclude_unset=True, exclude=COMMON_FIELDS))
+        values["id"] = item.id
+        values["update_time"] = now
+        rows.append(values)
+        results.append(BulkItemResult(index=index, id=item.id, ok=True))
+    if rows:
+        await db.exec(update(model), params=rows)
+        if "version" in model.__table__.columns:
+            # 带版本号的表每次更新都要递增版本，ETag 依赖于它
+            await db.exec(
+                update(model).where(model.id.in_([row["id"] for row in rows])).values(version=model.version + 1)
+            )
+        if commit:
+            await db.commit()
+    return results
+
+
+async def bulk_delete_async(
+    db: AsyncSession, model: Type[SQLModel], ids: List[int], commit: bool = True
+) -> List[BulkItemResult]:
+    """按主键批量删除（SOFT_DELETE 时软删除）；commit=False 时由调用方在同一事务中删除关联数据后提交"""
+    check_bulk_size(ids)
+    alive = await _alive_ids(db, model, ids)
+    found = [row_id for row_id in ids if row_id in alive]
+    if found:
+        if settings.SOFT_DELETE:
+            await db.exec(
+                update(model).where(model.id.in_(found)).values(is_deleted=True, update_time=datetime.utcnow())
+            )
+        else:
+            await db.exec(model.__table__.delete().where(model.id.in_(found)))
+        if commit:
+            await db.commit()
+    return [
+        BulkItemResult(index=index, id=row_id, ok=row_id in alive, error=None if row_id in alive else "Not found")
+        for index, row_id in enumerate(ids)
+    ]
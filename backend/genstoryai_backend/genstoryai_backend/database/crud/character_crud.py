@@ -1,41 +1,91 @@
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from fastapi import HTTPException, status
-from sqlmodel import Session, select
-from genstoryai_backend.models.character import Character, CharacterCreate, CharacterUpdate
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from genstoryai_backend.config import settings
+from genstoryai_backend.models import COMMON_FIELDS, BulkItemResult
+from genstoryai_backend.models.character import Character, CharacterCreate, CharacterUpdate, CharacterBulkUpdate
+from genstoryai_backend.database.crud.bulk import bulk_create_async, bulk_update_async, bulk_delete_async
+from genstoryai_backend.database.pagination import decode_cursor, encode_cursor
+from genstoryai_backend.database.entity_cache import character_cache, get_cached, set_cached, invalidate
+from genstoryai_backend.database.crud.character_relationship_crud import touch_character_relationships_async
 
 
-def create_character(db: Session, character: CharacterCreate) -> Character:
-    db_character = Character.from_orm(character)
+async def create_character_async(db: AsyncSession, character: CharacterCreate) -> Character:
+    db_character = Character.model_validate(character)
     db.add(db_character)
-    db.commit()
-    db.refresh(db_character)
+    await db.commit()
+    await db.refresh(db_character)
     return db_character
 
-def get_character(db: Session, character_id: int) -> Character:
-    db_character = db.exec(select(Character).where(Character.id == character_id)).first()
+async def get_character_async(db: AsyncSession, character_id: int) -> Character:
+    """读取角色，优先走缓存；返回的对象可能脱离 session，只用于读取"""
+    cached = await get_cached(character_cache, Character, character_id)
+    if cached is not None:
+        return cached
+    db_character = (await db.exec(select(Character).where(Character.id == character_id, Character.is_deleted == False))).first()
     if db_character is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Character not found")
+    await set_cached(character_cache, character_id, db_character)
     return db_character
 
-def get_characters(db: Session, skip: int = 0, limit: int = 100) -> List[Character]:
-    return db.exec(select(Character).offset(skip).limit(limit)).all()
+async def get_characters_async(db: AsyncSession, limit: int = 100, cursor: Optional[str] = None) -> Tuple[List[Character], Optional[str]]:
+    """按 id 升序的游标分页，返回 (当前页, 下一页游标)"""
+    statement = select(Character).where(Character.is_deleted == False)
+    after = decode_cursor(cursor, (int,))
+    if after is not None:
+        statement = statement.where(Character.id > after[0])
+    characters = list((await db.exec(statement.order_by(Character.id).limit(limit + 1))).all())
+    if len(characters) <= limit:
+        return characters, None
+    characters = characters[:limit]
+    return characters, encode_cursor([characters[-1].id])
 
 
-def update_character(db: Session, character_id: int, character: CharacterUpdate) -> Character:
-    db_character = db.exec(select(Character).where(Character.id == character_id)).first()
+async def update_character_async(db: AsyncSession, character_id: int, character: CharacterUpdate) -> Character:
+    db_character = (await db.exec(select(Character).where(Character.id == character_id, Character.is_deleted == False))).first()
     if db_character is None:
         raise HTTPException(status_code=404, detail="Character not found")
-    update_data = character.dict(exclude_unset=True)
+    update_data = character.model_dump(exclude_unset=True, exclude=COMMON_FIELDS)
     for key, value in update_data.items():
         setattr(db_character, key, value)
     db.add(db_character)
-    db.commit()
-    db.refresh(db_character)
+    await db.commit()
+    await invalidate(character_cache, [character_id])
+    if "name" in update_data:
+        await touch_character_relationships_async(db, [character_id])
+    await db.refresh(db_character)
     return db_character
 
-def delete_character(db: Session, character_id: int):
-    db_character = db.exec(select(Character).where(Character.id == character_id)).first()
+async def delete_character_async(db: AsyncSession, character_id: int):
+    db_character = (await db.exec(select(Character).where(Character.id == character_id, Character.is_deleted == False))).first()
     if db_character is None:
         raise HTTPException(status_code=404, detail="Character not found")
-    db.delete(db_character)
-    db.commit()
+    if settings.SOFT_DELETE:
+        db_character.is_deleted = True
+        db.add(db_character)
+    else:
+        await db.delete(db_character)
+    # 与角色的删除在同一事务中提交
+    await touch_character_relationships_async(db, [character_id])
+    await invalidate(character_cache, [character_id])
+
+
+async def create_characters_async(db: AsyncSession, characters: List[CharacterCreate]) -> List[BulkItemResult]:
+    return await bulk_create_async(db, Character, characters)
+
+
+async def update_characters_async(db: AsyncSession, characters: List[CharacterBulkUpdate]) -> List[BulkItemResult]:
+    results = await bulk_update_async(db, Character, characters)
+    await invalidate(character_cache, [result.id for result in results if result.ok])
+    renamed = [result.id for result, item in zip(results, characters) if result.ok and item.name is not None]
+    await touch_character_relationships_async(db, renamed)
+    return results
+
+
+async def delete_characters_async(db: AsyncSession, character_ids: List[int]) -> List[BulkItemResult]:
+    results = await bulk_delete_async(db, Character, character_ids, commit=False)
+    deleted = [result.id for result in results if result.ok]
+    await touch_character_relationships_async(db, deleted)
+    await invalidate(character_cache, deleted)
+    return results
@@ -0,0 +1,160 @@
+"""
+人物关系的读写与图谱查询。
+
+关系边保存在 character_relationship 表中，图查询使用 relationship_graph 中按故事缓存的内存索引。
+角色改名、删除时刷新其关系的 update_time，缓存的图谱在下一次查询时按指纹失效。
+"""
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import delete, func, or_, union, update
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from genstoryai_backend.config import settings
+from genstoryai_backend.models.character import Character
+from genstoryai_backend.models.character_relationship import (
+    CharacterRelationship, CharacterRelationshipCreate, CharacterRelationshipUpdate,
+)
+from genstoryai_backend.database.pagination import decode_cursor, encode_cursor
+from genstoryai_backend.database.relationship_graph import RelationshipGraph, relationship_graph_cache
+from genstoryai_backend.database.crud.story_block_crud import get_alive_story_async
+
+
+async def _check_characters(db: AsyncSession, character_ids: List[int]):
+    alive = set((await db.exec(
+        select(Character.id).where(Character.id.in_(character_ids), Character.is_deleted == False)
+    )).all())
+    if alive != set(character_ids):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Character not found")
+
+
+async def _get_relationship(db: AsyncSession, story_id: int, relationship_id: int) -> CharacterRelationship:
+    db_relationship = (await db.exec(select(CharacterRelationship).where(
+        CharacterRelationship.id == relationship_id, CharacterRelationship.story_id == story_id,
+    ))).first()
+    if db_relationship is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Relationship not found")
+    return db_relationship
+
+
+async def _commit_relationship(db: AsyncSession, db_relationship: CharacterRelationship) -> CharacterRelationship:
+    db.add(db_relationship)
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Relationship already exists")
+    relationship_graph_cache.discard([db_relationship.story_id])
+    await db.refresh(db_relationship)
+    return db_relationship
+
+
+async def create_relationship_async(
+    db: AsyncSession, story_id: int, relationship: CharacterRelationshipCreate,
+) -> CharacterRelationship:
+    await get_alive_story_async(db, story_id)
+    if relationship.source_id == relationship.target_id:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="A character cannot relate to itself")
+    await _check_characters(db, [relationship.source_id, relationship.target_id])
+    db_relationship = CharacterRelationship.model_validate(relationship, update={"story_id": story_id})
+    return await _commit_relationship(db, db_relationship)
+
+
+async def get_relationships_async(
+    db: AsyncSession,
+    story_id: int,
+    character_id: Optional[int] = None,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+) -> Tuple[List[CharacterRelationship], Optional[str]]:
+    """按 id 升序的游标分页，character_id 不为空时只返回与该角色相连的关系"""
+    await get_alive_story_async(db, story_id)
+    statement = select(CharacterRelationship).where(CharacterRelationship.story_id == story_id)
+    if character_id is not None:
+        statement = statement.where(or_(
+            CharacterRelationship.source_id == character_id, CharacterRelationship.target_id == character_id,
+        ))
+    after = decode_cursor(cursor, (int,))
+    if after is not None:
+        statement = statement.where(CharacterRelationship.id > after[0])
+    relationships = list((await db.exec(statement.order_by(CharacterRelationship.id).limit(limit + 1))).all())
+    if len(relationships) <= limit:
+        return relationships, None
+    relationships = relationships[:limit]
+    return relationships, encode_cursor([relationships[-1].id])
+
+
+async def update_relationship_async(
+    db: AsyncSession, story_id: int, relationship_id: int, relationship: CharacterRelationshipUpdate,
+) -> CharacterRelationship:
+    await get_alive_story_async(db, story_id)
+    db_relationship = await _get_relationship(db, story_id, relationship_id)
+    for key, value in relationship.model_dump(exclude_unset=True, exclude_none=True).items():
+        setattr(db_relationship, key, value)
+    return await _commit_relationship(db, db_relationship)
+
+
+async def delete_relationship_async(db: AsyncSession, story_id: int, relationship_id: int):
+    await get_alive_story_async(db, story_id)
+    db_relationship = await _get_relationship(db, story_id, relationship_id)
+    await db.delete(db_relationship)
+    await db.commit()
+    relationship_graph_cache.discard([story_id])
+
+
+async def touch_character_relationships_async(db: AsyncSession, character_ids: List[int]):
+    """
+    角色改名或删除后调用：刷新其关系的 update_time，物理删除角色时一并删除其关系，
+    并与调用方尚未提交的修改一起提交
+    """
+    if character_ids:
+        involved = or_(
+            CharacterRelationship.source_id.in_(character_ids), CharacterRelationship.target_id.in_(character_ids),
+        )
+        if settings.SOFT_DELETE:
+            await db.exec(update(CharacterRelationship).where(involved).values(update_time=datetime.utcnow()))
+        else:
+            await db.exec(delete(CharacterRelationship).where(involved))
+    await db.commit()
+
+
+async def delete_story_relationships_async(db: AsyncSession, story_ids: List[int]):
+    """删除故事的全部关系（不提交），故事被物理删除时调用"""
+    if story_ids:
+        await db.exec(delete(CharacterRelationship).where(CharacterRelationship.story_id.in_(story_ids)))
+        relationship_graph_cache.discard(story_ids)
+
+
+async def get_relationship_graph_async(db: AsyncSession, story_id: int) -> RelationshipGraph:
+    """故事的关系图谱；边没有变化时直接返回缓存的图"""
+    await get_alive_story_async(db, story_id)
+    fingerprint = tuple((await db.exec(
+        select(
+            func.count(CharacterRelationship.id),
+            func.max(CharacterRelationship.id),
+            func.max(CharacterRelationship.update_time),
+        ).where(CharacterRelationship.story_id == story_id)
+    )).one())
+    graph = relationship_graph_cache.get(story_id, fingerprint)
+    if graph is not None:
+        return graph
+
+    edges = (await db.exec(
+        select(
+            CharacterRelationship.id, CharacterRelationship.source_id, CharacterRelationship.target_id,
+            CharacterRelationship.relation_type, CharacterRelationship.weight,
+        ).where(CharacterRelationship.story_id == story_id)
+    )).all()
+    endpoints = union(
+        select(CharacterRelationship.source_id).where(CharacterRelationship.story_id == story_id),
+        select(CharacterRelationship.target_id).where(CharacterRelationship.story_id == story_id),
+    )
+    names = dict((await db.exec(
+        select(Character.id, Character.name).where(Character.id.in_(endpoints), Character.is_deleted == False)
+    )).all())
+    graph = RelationshipGraph(names, edges)
+    relationship_graph_cache.put(story_id, fingerprint, graph)
+    return graph
@@ -0,0 +1,317 @@
+"""
+故事内容块的读写。
+
+内容块保存在 story_block 表中，Story.ssf 只保留 content_blocks 以外的部分，编辑单个段落只写一行。
+引入块存储之前的故事，正文仍在 ssf 中，第一次通过块接口访问时迁移到 story_block。
+插入、删除、重排都需要整体移动 block_index，为了不违反 (story_id, block_index) 唯一索引，
+先把受影响的行移到负数区间，再翻转回来。
+修改块时在同一事务中递增故事的 version 并刷新 update_time，ETag / If-Match 与列表排序都能感知到正文的变化。
+"""
+import json
+from contextlib import asynccontextmanager
+from datetime import datetime
+from difflib import SequenceMatcher
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import bindparam, delete, func, insert, update
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from genstoryai_backend.models.story import Story
+from genstoryai_backend.models.story_block import StoryBlock
+from genstoryai_backend.config import settings
+from genstoryai_backend.ssf.codec import decode_ssf, encode_ssf
+from genstoryai_backend.ssf.ssf import StorySchemaFormat
+from genstoryai_backend.ssf.stream import STORY_FIELDS
+from genstoryai_backend.database.entity_cache import story_cache, invalidate
+
+_block_table = StoryBlock.__table__
+
+
+def extract_ssf_blocks(json_text: Optional[str]) -> Tuple[Optional[str], Optional[List[str]]]:
+    """
+    从 SSF JSON 中取出 content_blocks.blocks，返回 (去掉正文的 JSON, 块列表)。
+    没有 blocks 列表或无法解析时块列表为 None，JSON 原样返回；blocks 为空列表时返回 []。
+    """
+    if not json_text:
+        return json_text, None
+    try:
+        data = json.loads(json_text)
+    except ValueError:
+        return json_text, None
+    content_blocks = data.get("content_blocks") if isinstance(data, dict) else None
+    blocks = content_blocks.get("blocks") if isinstance(content_blocks, dict) else None
+    if not isinstance(blocks, list):
+        return json_text, None
+    content_blocks["blocks"] = []
+    return json.dumps(data, ensure_ascii=False), [str(block) for block in blocks]
+
+
+def split_ssf_blocks(json_text: Optional[str]) -> Tuple[Optional[str], List[str]]:
+    """与 extract_ssf_blocks 相同，但没有正文时原样返回 JSON 与空列表"""
+    stripped, blocks = extract_ssf_blocks(json_text)
+    if not blocks:
+        return json_text, []
+    return stripped, blocks
+
+
+async def insert_blocks_async(db: AsyncSession, story_id: int, blocks: List[str], start: int = 0):
+    """批量写入块（不提交），调用方保证 [start, start + len(blocks)) 没有被占用"""
+    if blocks:
+        await db.exec(insert(StoryBlock), params=[
+            {"story_id": story_id, "block_index": start + offset, "content": content}
+            for offset, content in enumerate(blocks)
+        ])
+
+
+async def delete_story_blocks_async(db: AsyncSession, story_ids: List[int]):
+    """删除故事的全部块（不提交），故事被物理删除时调用"""
+    if story_ids:
+        await db.exec(delete(StoryBlock).where(StoryBlock.story_id.in_(story_ids)))
+
+
+async def get_block_contents_async(db: AsyncSession, story_id: int) -> List[str]:
+    return list((await db.exec(
+        select(StoryBlock.content).where(StoryBlock.story_id == story_id).order_by(StoryBlock.block_index)
+    )).all())
+
+
+async def iter_block_contents_async(
+    db: AsyncSession, story_id: int, batch_size: int = settings.SSF_STREAM_BATCH_SIZE
+) -> AsyncIterator[str]:
+    """按 block_index 分批读取正文，内存中最多保留一批"""
+    last_index = -1
+    while True:
+        rows = (await db.exec(
+            select(StoryBlock.block_index, StoryBlock.content)
+            .where(StoryBlock.story_id == story_id, StoryBlock.block_index > last_index)
+            .order_by(StoryBlock.block_index)
+            .limit(batch_size)
+        )).all()
+        for _, content in rows:
+            yield content
+        if len(rows) < batch_size:
+            break
+        last_index = rows[-1][0]
+
+
+def document_without_blocks(story: Story) -> Dict[str, Any]:
+    """ssf 中正文以外的部分，解析结果走 ssf_parse_cache；没有 ssf 或无法解析时用故事信息生成 metadata"""
+    lazy = story.ssf_lazy
+    data = lazy.document() if lazy is not None else None
+    if not isinstance(data, dict):
+        data = StorySchemaFormat.model_validate({
+            "metadata": story.model_dump(include={"title", "author", "genre", "summary", "version"}),
+            "content_blocks": {}, "characters": {}, "timeline": {}, "extended_metadata": {},
+        }).model_dump(mode="json")
+    if not isinstance(data.get("content_blocks"), dict):
+        data["content_blocks"] = {}
+    data["content_blocks"].pop("blocks", None)
+    return data
+
+
+async def get_alive_story_async(db: AsyncSession, story_id: int) -> Story:
+    """未删除的故事，不走缓存；正文块、历史版本、人物关系、时间线等从属数据读写前用于检查故事是否存在"""
+    db_story = (await db.exec(select(Story).where(Story.id == story_id, Story.is_deleted == False))).first()
+    if db_story is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Story not found")
+    return db_story
+
+
+async def get_export_header_async(db: AsyncSession, story_id: int) -> Dict[str, Any]:
+    """流式导出的 header：故事字段与不含正文的 SSF；调用前需要先用 ensure_story_blocks_async 迁移旧故事的正文"""
+    db_story = await get_alive_story_async(db, story_id)
+    return {
+        "story": db_story.model_dump(mode="json", include=set(STORY_FIELDS)),
+        "ssf": document_without_blocks(db_story),
+    }
+
+
+async def _block_count(db: AsyncSession, story_id: int) -> int:
+    return (await db.exec(
+        select(func.count()).select_from(StoryBlock).where(StoryBlock.story_id == story_id)
+    )).one()
+
+
+async def ensure_story_blocks_async(db: AsyncSession, story_id: int):
+    """确认故事存在；正文仍在 ssf 中的旧故事，把正文迁移到 story_block"""
+    row = (await db.exec(select(Story.id, Story.ssf).where(Story.id == story_id, Story.is_deleted == False))).first()
+    if row is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Story not found")
+    stripped, blocks = split_ssf_blocks(decode_ssf(row[1]))
+    if not blocks or await _block_count(db, story_id) > 0:
+        return
+    try:
+        await insert_blocks_async(db, story_id, blocks)
+        await db.exec(
+            update(Story)
+            .where(Story.id == story_id)
+            # 正文内容没有变化，不更新 update_time
+            .values(ssf=encode_ssf(stripped), update_time=Story.update_time)
+        )
+        await db.commit()
+    except IntegrityError:
+        # 并发请求已经完成了迁移
+        await db.rollback()
+        return
+    await invalidate(story_cache, [story_id])
+
+
+@asynccontextmanager
+async def _writing_blocks(db: AsyncSession, story_id: int):
+    """
+    块的修改与故事 version、update_time 的更新以及历史版本在同一事务中提交，提交后清除故事缓存。
+    并发修改同一故事的块可能违反 (story_id, block_index) 或版本号的唯一索引，此时回滚并返回 409。
+    """
+    # story_revision_crud 依赖本模块，在这里导入
+    from genstoryai_backend.database.crud.story_revision_crud import record_revision_async
+
+    try:
+        yield
+        await db.exec(
+            update(Story).where(Story.id == story_id).values(version=Story.version + 1, update_time=datetime.utcnow())
+        )
+        await record_revision_async(db, story_id)
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Blocks were modified concurrently, please retry")
+    await invalidate(story_cache, [story_id])
+
+
+async def _shift_blocks(db: AsyncSession, story_id: int, from_index: int, delta: int):
+    """将 block_index >= from_index 的块整体移动 delta，分两步避免唯一索引冲突"""
+    await db.exec(
+        update(_block_table)
+        .where(_block_table.c.story_id == story_id, _block_table.c.block_index >= from_index)
+        .values(block_index=-(_block_table.c.block_index + delta) - 1, update_time=_block_table.c.update_time)
+    )
+    await _flip_negative_indexes(db, story_id)
+
+
+async def _flip_negative_indexes(db: AsyncSession, story_id: int):
+    await db.exec(
+        update(_block_table)
+        .where(_block_table.c.story_id == story_id, _block_table.c.block_index < 0)
+        .values(block_index=-_block_table.c.block_index - 1, update_time=_block_table.c.update_time)
+    )
+
+
+async def get_blocks_async(db: AsyncSession, story_id: int, start: int = 0, end: Optional[int] = None) -> List[StoryBlock]:
+    """读取 [start, end) 区间的块"""
+    await ensure_story_blocks_async(db, story_id)
+    statement = select(StoryBlock).where(StoryBlock.story_id == story_id, StoryBlock.block_index >= start)
+    if end is not None:
+        statement = statement.where(StoryBlock.block_index < end)
+    return list((await db.exec(statement.order_by(StoryBlock.block_index))).all())
+
+
+async def get_block_async(db: AsyncSession, story_id: int, block_index: int) -> StoryBlock:
+    await ensure_story_blocks_async(db, story_id)
+    db_block = (await db.exec(
+        select(StoryBlock).where(StoryBlock.story_id == story_id, StoryBlock.block_index == block_index)
+    )).first()
+    if db_block is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Block not found")
+    return db_block
+
+
+async def insert_block_async(db: AsyncSession, story_id: int, content: str, block_index: Optional[int] = None) -> StoryBlock:
+    """在 block_index 处插入块，原来位于其后的块顺延；block_index 为空时追加到末尾"""
+    await ensure_story_blocks_async(db, story_id)
+    count = await _block_count(db, story_id)
+    if block_index is None:
+        block_index = count
+    if not 0 <= block_index <= count:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Block index out of range")
+    db_block = StoryBlock(story_id=story_id, block_index=block_index, content=content)
+    async with _writing_blocks(db, story_id):
+        if block_index < count:
+            await _shift_blocks(db, story_id, block_index, 1)
+        db.add(db_block)
+        await db.flush()
+    await db.refresh(db_block)
+    return db_block
+
+
+async def update_block_async(db: AsyncSession, story_id: int, block_index: int, content: str) -> StoryBlock:
+    db_block = await get_block_async(db, story_id, block_index)
+    async with _writing_blocks(db, story_id):
+        db_block.content = content
+        db.add(db_block)
+    await db.refresh(db_block)
+    return db_block
+
+
+async def delete_block_async(db: AsyncSession, story_id: int, block_index: int):
+    """删除块，其后的块前移"""
+    db_block = await get_block_async(db, story_id, block_index)
+    async with _writing_blocks(db, story_id):
+        await db.delete(db_block)
+        await db.flush()
+        await _shift_blocks(db, story_id, block_index + 1, -1)
+
+
+async def reorder_blocks_async(db: AsyncSession, story_id: int, order: List[int]) -> List[StoryBlock]:
+    """按 order 重排，order[i] 为新位置 i 上的原 block_index"""
+    await ensure_story_blocks_async(db, story_id)
+    count = await _block_count(db, story_id)
+    if sorted(order) != list(range(count)):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Order must be a permutation of all block indexes")
+    moves = [
+        {"old_index": old_index, "new_index": -new_index - 1}
+        for new_index, old_index in enumerate(order) if old_index != new_index
+    ]
+    if moves:
+        async with _writing_blocks(db, story_id):
+            await db.exec(
+                update(_block_table)
+                .where(_block_table.c.story_id == story_id, _block_table.c.block_index == bindparam("old_index"))
+                .values(block_index=bindparam("new_index"), update_time=_block_table.c.update_time),
+                params=moves,
+            )
+            await _flip_negative_indexes(db, story_id)
+    return await get_blocks_async(db, story_id)
+
+
+async def replace_blocks_async(db: AsyncSession, story_id: int, target: List[str]):
+    """
+    把正文替换为 target（不提交）。
+    与当前正文做块级比较，只删除、插入、修改有差异的块，未变化的块最多只调整 block_index。
+    """
+    rows = (await db.exec(
+        select(StoryBlock.id, StoryBlock.content).where(StoryBlock.story_id == story_id).order_by(StoryBlock.block_index)
+    )).all()
+    ids = [row[0] for row in rows]
+    matcher = SequenceMatcher(None, [row[1] for row in rows], target, autojunk=False)
+    moves, updates, deletes, inserts = [], [], [], []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        paired = i2 - i1 if tag == "equal" else min(i2 - i1, j2 - j1)
+        for offset in range(paired):
+            if i1 + offset != j1 + offset:
+                moves.append({"row_id": ids[i1 + offset], "new_index": -(j1 + offset) - 1})
+            if tag != "equal":
+                updates.append({"row_id": ids[i1 + offset], "new_content": target[j1 + offset]})
+        deletes.extend(ids[i1 + paired:i2])
+        inserts.extend(range(j1 + paired, j2))
+    if deletes:
+        await db.exec(delete(StoryBlock).where(StoryBlock.id.in_(deletes)))
+    if moves:
+        await db.exec(
+            update(_block_table)
+            .where(_block_table.c.id == bindparam("row_id"))
+            .values(block_index=bindparam("new_index"), update_time=_block_table.c.update_time),
+            params=moves,
+        )
+        await _flip_negative_indexes(db, story_id)
+    if updates:
+        await db.exec(
+            update(_block_table).where(_block_table.c.id == bindparam("row_id")).values(content=bindparam("new_content")),
+            params=updates,
+        )
+    if inserts:
+        await db.exec(insert(StoryBlock), params=[
+            {"story_id": story_id, "block_index": index, "content": target[index]} for index in inserts
+        ])
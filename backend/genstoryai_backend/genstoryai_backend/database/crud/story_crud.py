@@ -1,46 +1,275 @@
-from typing import List, Optional
+import json
+import tempfile
+from datetime import datetime
+from itertools import islice
+from typing import IO, AsyncIterator, Dict, List, Optional, Tuple
 from fastapi import HTTPException, status
-from sqlmodel import Session, select
-from genstoryai_backend.models.story import Story, StoryCreate, StoryUpdate
+from sqlalchemy import and_, or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import defer
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from genstoryai_backend.models.genre import Genre
+from genstoryai_backend.config import settings
+from genstoryai_backend.models import COMMON_FIELDS, BulkItemResult
+from genstoryai_backend.models.story import Story, StoryCreate, StoryUpdate, StoryBulkUpdate
+from genstoryai_backend.database.crud.bulk import _table_values, bulk_create_async, bulk_update_async, bulk_delete_async
+from genstoryai_backend.database.pagination import decode_cursor, encode_cursor
+from genstoryai_backend.ssf.codec import decode_ssf, encode_ssf
+from genstoryai_backend.ssf.stream import parse_block, parse_header
+from genstoryai_backend.database.crud.story_block_crud import (
+    split_ssf_blocks, extract_ssf_blocks, insert_blocks_async, delete_story_blocks_async, get_block_contents_async,
+    document_without_blocks, ensure_story_blocks_async, replace_blocks_async,
+)
+from genstoryai_backend.database.crud.story_revision_crud import delete_story_revisions_async, record_revision_async
+from genstoryai_backend.database.crud.character_relationship_crud import delete_story_relationships_async
+from genstoryai_backend.database.crud.timeline_crud import delete_story_timelines_async
+from genstoryai_backend.database.entity_cache import story_cache, get_cached, set_cached, invalidate
 
+# 导入时暂存正文的临时文件，超过该大小后写入磁盘
+IMPORT_SPOOL_MEMORY_BYTES = 4 * 1024 * 1024
 
-def create_story(db: Session, story: StoryCreate) -> Story:
-    db_story = Story(**story.dict())
+
+def _encoded(story: StoryCreate) -> StoryCreate:
+    """写入前按 SSF_CODEC 压缩 ssf"""
+    return story.model_copy(update={"ssf": encode_ssf(story.ssf)}) if story.ssf else story
+
+
+def _split_blocks(story: StoryCreate) -> Tuple[StoryCreate, List[str]]:
+    """正文块单独写入 story_block，ssf 中只保留其余部分"""
+    stripped, blocks = split_ssf_blocks(story.ssf)
+    if not blocks:
+        return story, []
+    return story.model_copy(update={"ssf": stripped}), blocks
+
+
+async def create_story_async(db: AsyncSession, story: StoryCreate) -> Story:
+    story, blocks = _split_blocks(story)
+    db_story = Story(**_encoded(story).model_dump())
     db.add(db_story)
-    db.commit()
-    db.refresh(db_story)
+    await db.flush()
+    await insert_blocks_async(db, db_story.id, blocks)
+    await record_revision_async(db, db_story.id)
+    await db.commit()
+    await db.refresh(db_story)
     return db_story
 
 
-def get_story(db: Session, story_id: int) -> Story:
-    db_story = db.exec(select(Story).where(Story.id == story_id)).first()
+async def get_story_async(db: AsyncSession, story_id: int) -> Story:
+    """读取故事，优先走缓存；返回的对象可能脱离 session，只用于读取"""
+    cached = await get_cached(story_cache, Story, story_id)
+    if cached is not None:
+        return cached
+    db_story = (await db.exec(select(Story).where(Story.id == story_id, Story.is_deleted == False))).first()
     if db_story is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Story not found")
+    await set_cached(story_cache, story_id, db_story)
     return db_story
 
 
-def get_stories(db: Session, skip: int = 0, limit: int = 100) -> List[Story]:
-    return list(db.exec(select(Story).offset(skip).limit(limit)).all())
+async def get_stories_async(
+    db: AsyncSession,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    creator_user_id: Optional[int] = None,
+    genre: Optional[Genre] = None,
+) -> Tuple[List[Story], Optional[str]]:
+    """
+    按 (update_time, id) 倒序的游标分页，返回 (当前页, 下一页游标)。
+    ssf 正文不加载（访问会报错），列表只用于 StorySummary。
+    """
+    statement = select(Story).options(defer(Story.ssf, raiseload=True)).where(Story.is_deleted == False)
+    if creator_user_id is not None:
+        statement = statement.where(Story.creator_user_id == creator_user_id)
+    if genre is not None:
+        statement = statement.where(Story.genre == genre)
+    after = decode_cursor(cursor, (datetime, int))
+    if after is not None:
+        update_time, story_id = after
+        statement = statement.where(or_(
+            Story.update_time < update_time,
+            and_(Story.update_time == update_time, Story.id < story_id),
+        ))
+    statement = statement.order_by(Story.update_time.desc(), Story.id.desc()).limit(limit + 1)
+    stories = list((await db.exec(statement)).all())
+    if len(stories) <= limit:
+        return stories, None
+    stories = stories[:limit]
+    return stories, encode_cursor([stories[-1].update_time, stories[-1].id])
 
 
-def update_story(db: Session, story_id: int, story: StoryUpdate) -> Story:
-    db_story = db.exec(select(Story).where(Story.id == story_id)).first()
+async def get_story_ssf_async(db: AsyncSession, story_id: int) -> Optional[str]:
+    """导出完整的 SSF JSON：ssf 中的其余部分加上 story_block 中的正文"""
+    db_story = (await db.exec(
+        select(Story).where(Story.id == story_id, Story.is_deleted == False)
+    )).first()
     if db_story is None:
-        raise HTTPException(status_code=404, detail="Story not found")
-    
-    update_data = story.dict(exclude_unset=True)
-    for key, value in update_data.items():
-        setattr(db_story, key, value)
-    
-    db.add(db_story)
-    db.commit()
-    db.refresh(db_story)
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Story not found")
+    blocks = await get_block_contents_async(db, story_id)
+    if not blocks:
+        return decode_ssf(db_story.ssf)
+    data = document_without_blocks(db_story)
+    data["content_blocks"]["blocks"] = blocks
+    return json.dumps(data, ensure_ascii=False)
+
+
+async def _spool_blocks(lines: AsyncIterator[bytes], spool: IO[bytes]) -> int:
+    """校验每一行并把正文写入临时文件，返回块数"""
+    count = 0
+    async for line in lines:
+        spool.write(json.dumps(parse_block(line, count + 2), ensure_ascii=False).encode("utf-8") + b"\n")
+        count += 1
+    return count
+
+
+async def import_story_async(db: AsyncSession, lines: AsyncIterator[bytes], batch_size: int = settings.SSF_STREAM_BATCH_SIZE) -> Story:
+    """
+    逐行导入 NDJSON 格式的故事（格式见 ssf/stream.py）。
+    上传过程中只解析、校验，正文暂存在临时文件中（较小时在内存中），不打开写事务；
+    全部接收并校验通过后，在一个较短的事务中分批写入，任何一行校验失败都不会留下数据。
+    """
+    line_iter = lines.__aiter__()
+    try:
+        first_line = await line_iter.__anext__()
+    except StopAsyncIteration:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Empty import")
+    header = parse_header(first_line)
+    ssf_text = None
+    if header.ssf:
+        content_blocks = {**(header.ssf.get("content_blocks") or {}), "blocks": []}
+        ssf_text = json.dumps({**header.ssf, "content_blocks": content_blocks}, ensure_ascii=False)
+
+    with tempfile.SpooledTemporaryFile(max_size=IMPORT_SPOOL_MEMORY_BYTES) as spool:
+        await _spool_blocks(line_iter, spool)
+        spool.seek(0)
+        db_story = Story(**header.story.model_dump(), ssf=encode_ssf(ssf_text))
+        db.add(db_story)
+        await db.flush()
+        start = 0
+        while True:
+            batch = [json.loads(line) for line in islice(spool, batch_size)]
+            if not batch:
+                break
+            await insert_blocks_async(db, db_story.id, batch, start)
+            start += len(batch)
+        await record_revision_async(db, db_story.id)
+        await db.commit()
+    await db.refresh(db_story)
     return db_story
 
 
-def delete_story(db: Session, story_id: int):
-    db_story = db.exec(select(Story).where(Story.id == story_id)).first()
+def _split_update_ssf(ssf: Optional[str]) -> Tuple[Optional[str], Optional[List[str]]]:
+    """返回 (压缩后的 ssf, 新的正文块)，ssf 中没有 blocks 时正文块为 None，表示正文不变"""
+    stripped, blocks = extract_ssf_blocks(ssf)
+    return encode_ssf(stripped), blocks
+
+
+async def _commit_content(db: AsyncSession, story_ids: List[int], story_blocks: Dict[int, List[str]]):
+    """与故事的更新在同一事务中替换正文块、记录历史版本并提交"""
+    try:
+        for story_id in story_ids:
+            if story_id in story_blocks:
+                await replace_blocks_async(db, story_id, story_blocks[story_id])
+            await record_revision_async(db, story_id)
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Blocks were modified concurrently, please retry")
+
+
+async def update_story_async(
+    db: AsyncSession, story_id: int, story: StoryUpdate, expected_versions: Optional[List[int]] = None
+) -> Story:
+    """
+    更新故事并将 version 加一，故事本身是一条 UPDATE 语句；ssf 带有正文块时在同一事务中替换 story_block，
+    并记录历史版本。
+    expected_versions 不为空时只在当前版本属于其中之一时更新，否则返回 412。
+    """
+    # 正文仍在 ssf 中的旧故事先迁移到 story_block，避免被新的 ssf 覆盖，历史版本也从 story_block 读取正文
+    await ensure_story_blocks_async(db, story_id)
+    values = _table_values(Story, story.model_dump(exclude_unset=True, exclude=COMMON_FIELDS))
+    blocks = None
+    if "ssf" in values:
+        values["ssf"], blocks = _split_update_ssf(values["ssf"])
+    statement = (
+        update(Story)
+        .where(Story.id == story_id, Story.is_deleted == False)
+        .values(**values, version=Story.version + 1)
+    )
+    if expected_versions is not None:
+        statement = statement.where(Story.version.in_(expected_versions))
+    result = await db.exec(statement)
+    if result.rowcount == 0:
+        await db.rollback()
+        exists = (await db.exec(select(Story.id).where(Story.id == story_id, Story.is_deleted == False))).first()
+        if exists is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Story not found")
+        raise HTTPException(status_code=status.HTTP_412_PRECONDITION_FAILED, detail="Story has been modified")
+    await _commit_content(db, [story_id], {story_id: blocks} if blocks is not None else {})
+    await invalidate(story_cache, [story_id])
+    return (await db.exec(
+        select(Story).where(Story.id == story_id).execution_options(populate_existing=True)
+    )).one()
+
+
+async def _delete_story_rows(db: AsyncSession, story_ids: List[int]):
+    """物理删除故事时一并删除正文块、历史版本、人物关系与时间线"""
+    await delete_story_blocks_async(db, story_ids)
+    await delete_story_revisions_async(db, story_ids)
+    await delete_story_relationships_async(db, story_ids)
+    await delete_story_timelines_async(db, story_ids)
+
+
+async def delete_story_async(db: AsyncSession, story_id: int):
+    db_story = (await db.exec(select(Story).where(Story.id == story_id, Story.is_deleted == False))).first()
     if db_story is None:
         raise HTTPException(status_code=404, detail="Story not found")
-    db.delete(db_story)
-    db.commit()
+    if settings.SOFT_DELETE:
+        db_story.is_deleted = True
+        db.add(db_story)
+    else:
+        await db.delete(db_story)
+        await _delete_story_rows(db, [story_id])
+    await db.commit()
+    await invalidate(story_cache, [story_id])
+
+
+async def create_stories_async(db: AsyncSession, stories: List[StoryCreate]) -> List[BulkItemResult]:
+    split = [_split_blocks(story) for story in stories]
+    results = await bulk_create_async(db, Story, [_encoded(story) for story, _ in split], commit=False)
+    for result, (_, blocks) in zip(results, split):
+        await insert_blocks_async(db, result.id, blocks)
+        await record_revision_async(db, result.id)
+    await db.commit()
+    return results
+
+
+async def update_stories_async(db: AsyncSession, stories: List[StoryBulkUpdate]) -> List[BulkItemResult]:
+    """带 ssf 的元素与 update_story_async 相同，正文块的替换与历史版本在同一事务中写入"""
+    items, story_blocks = [], {}
+    for story in stories:
+        try:
+            await ensure_story_blocks_async(db, story.id)
+        except HTTPException:
+            # 不存在的故事由 bulk_update_async 报告
+            items.append(story)
+            continue
+        if "ssf" in story.model_fields_set:
+            ssf, blocks = _split_update_ssf(story.ssf)
+            story = story.model_copy(update={"ssf": ssf})
+            if blocks is not None:
+                story_blocks[story.id] = blocks
+        items.append(story)
+    results = await bulk_update_async(db, Story, items, commit=False)
+    await _commit_content(db, [result.id for result in results if result.ok], story_blocks)
+    await invalidate(story_cache, [result.id for result in results if result.ok])
+    return results
+
+
+async def delete_stories_async(db: AsyncSession, story_ids: List[int]) -> List[BulkItemResult]:
+    results = await bulk_delete_async(db, Story, story_ids, commit=False)
+    if not settings.SOFT_DELETE:
+        await _delete_story_rows(db, [result.id for result in results if result.ok])
+    await db.commit()
+    await invalidate(story_cache, [result.id for result in results if result.ok])
+    return results
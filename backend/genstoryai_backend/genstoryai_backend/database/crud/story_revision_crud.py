@@ -0,0 +1,201 @@
+"""
+故事历史版本。
+
+每个版本保存为相对上一个版本的块级 delta，每 STORY_REVISION_SNAPSHOT_INTERVAL 个版本保存一次完整快照，
+还原任意版本只需要从最近的快照开始依次应用 delta。
+
+故事的每个写入路径（创建、导入、更新、批量更新、块编辑、恢复）都在同一事务中调用 record_revision_async 记录版本；
+STORY_REVISION_COALESCE_SECONDS 大于 0 时，该时间内连续的自动版本合并为一个。
+"""
+import json
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import delete, func
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from genstoryai_backend.config import settings
+from genstoryai_backend.models.story import Story
+from genstoryai_backend.models.story_revision import StoryRevision, StoryRevisionDelta
+from genstoryai_backend.ssf.codec import decode_ssf, encode_ssf
+from genstoryai_backend.ssf.delta import apply_delta, compute_delta, is_identity
+from genstoryai_backend.database.crud.story_block_crud import (
+    ensure_story_blocks_async, document_without_blocks, get_alive_story_async, get_block_contents_async,
+    replace_blocks_async,
+)
+from genstoryai_backend.database.entity_cache import story_cache, invalidate
+
+SNAPSHOT = "snapshot"
+DELTA = "delta"
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False)
+
+
+def materialize_revisions(chain: List[StoryRevision]) -> Tuple[Dict[str, Any], List[str]]:
+    """chain 为从快照开始、按版本号升序的连续版本，返回最后一个版本的 (不含正文的文档, 块列表)"""
+    document, blocks = None, []
+    for revision in chain:
+        payload = json.loads(decode_ssf(revision.payload))
+        blocks = payload if revision.kind == SNAPSHOT else apply_delta(blocks, payload)
+        if revision.document is not None:
+            document = json.loads(decode_ssf(revision.document))
+    return document, blocks
+
+
+def revision_chain_statement(story_id: int, revision: int):
+    """查询 revision 及其之前最近的快照之间的所有版本"""
+    snapshot = (
+        select(func.max(StoryRevision.revision))
+        .where(StoryRevision.story_id == story_id, StoryRevision.kind == SNAPSHOT, StoryRevision.revision <= revision)
+        .scalar_subquery()
+    )
+    return (
+        select(StoryRevision)
+        .where(StoryRevision.story_id == story_id, StoryRevision.revision >= snapshot, StoryRevision.revision <= revision)
+        .order_by(StoryRevision.revision)
+    )
+
+
+async def _materialize_async(db: AsyncSession, story_id: int, revision: int) -> Tuple[List[StoryRevision], Dict[str, Any], List[str]]:
+    chain = list((await db.exec(revision_chain_statement(story_id, revision))).all())
+    if not chain or chain[-1].revision != revision:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Revision not found")
+    document, blocks = materialize_revisions(chain)
+    return chain, document, blocks
+
+
+def _coalescible(latest: Optional[StoryRevision], message: str) -> bool:
+    """最新版本是合并时间内自动记录的 delta 时可以直接改写；快照和带说明的版本保留"""
+    interval = settings.STORY_REVISION_COALESCE_SECONDS
+    return (
+        interval > 0 and latest is not None and latest.kind == DELTA and not message and not latest.message
+        and latest.create_time >= datetime.utcnow() - timedelta(seconds=interval)
+    )
+
+
+async def record_revision_async(db: AsyncSession, story_id: int, message: str = "") -> StoryRevision:
+    """
+    把故事当前状态（包括本事务中尚未提交的修改）记录为版本，只 flush 不提交，由调用方与修改一起提交。
+    调用前正文需要已经迁移到 story_block（见 ensure_story_blocks_async）。
+    与上一个版本完全相同时不产生新版本，返回上一个版本。
+    """
+    db_story = (await db.exec(
+        select(Story).where(Story.id == story_id, Story.is_deleted == False).execution_options(populate_existing=True)
+    )).first()
+    if db_story is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Story not found")
+    document = document_without_blocks(db_story)
+    blocks = await get_block_contents_async(db, story_id)
+
+    latest = (await db.exec(
+        select(StoryRevision).where(StoryRevision.story_id == story_id).order_by(StoryRevision.revision.desc()).limit(1)
+    )).first()
+    replaced = latest if _coalescible(latest, message) else None
+    base = None if latest is None else latest.revision - 1 if replaced is not None else latest.revision
+    if base is None:
+        revision = StoryRevision(
+            story_id=story_id, revision=1, kind=SNAPSHOT, document=encode_ssf(_dumps(document)),
+            payload=encode_ssf(_dumps(blocks)),
+        )
+    else:
+        chain, previous_document, previous_blocks = await _materialize_async(db, story_id, base)
+        delta = compute_delta(previous_blocks, blocks)
+        if is_identity(delta, len(previous_blocks)) and document == previous_document:
+            if replaced is not None:
+                # 合并的修改又改回了原样
+                await db.delete(replaced)
+            elif message and not chain[-1].message:
+                chain[-1].message = message
+                db.add(chain[-1])
+            await db.flush()
+            return chain[-1]
+        snapshot = len(chain) >= settings.STORY_REVISION_SNAPSHOT_INTERVAL
+        revision = replaced or StoryRevision(story_id=story_id, revision=base + 1)
+        revision.kind = SNAPSHOT if snapshot else DELTA
+        revision.document = encode_ssf(_dumps(document)) if snapshot or document != previous_document else None
+        revision.payload = encode_ssf(_dumps(blocks if snapshot else delta))
+    revision.story_version = db_story.version
+    revision.block_count = len(blocks)
+    revision.message = message
+    db.add(revision)
+    await db.flush()
+    return revision
+
+
+async def create_revision_async(db: AsyncSession, story_id: int, message: str = "") -> StoryRevision:
+    """记录故事当前状态为新版本；与上一个版本完全相同时直接返回上一个版本（给出 message 时补上说明）"""
+    await ensure_story_blocks_async(db, story_id)
+    revision = await record_revision_async(db, story_id, message)
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Another revision was created concurrently")
+    await db.refresh(revision)
+    return revision
+
+
+async def get_revisions_async(db: AsyncSession, story_id: int, limit: int = 50, before: Optional[int] = None) -> List[StoryRevision]:
+    """按版本号倒序列出版本，before 为上一页最后一个版本号"""
+    await get_alive_story_async(db, story_id)
+    statement = select(StoryRevision).where(StoryRevision.story_id == story_id)
+    if before is not None:
+        statement = statement.where(StoryRevision.revision < before)
+    return list((await db.exec(statement.order_by(StoryRevision.revision.desc()).limit(limit))).all())
+
+
+async def get_revision_ssf_async(db: AsyncSession, story_id: int, revision: int) -> str:
+    """还原指定版本的完整 SSF JSON"""
+    await get_alive_story_async(db, story_id)
+    _, document, blocks = await _materialize_async(db, story_id, revision)
+    document.setdefault("content_blocks", {})["blocks"] = blocks
+    return _dumps(document)
+
+
+async def get_revision_delta_async(db: AsyncSession, story_id: int, revision: int) -> StoryRevisionDelta:
+    """版本相对上一个版本的差异，直接读取保存的 delta，不需要还原全文"""
+    await get_alive_story_async(db, story_id)
+    db_revision = (await db.exec(
+        select(StoryRevision).where(StoryRevision.story_id == story_id, StoryRevision.revision == revision)
+    )).first()
+    if db_revision is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Revision not found")
+    payload = json.loads(decode_ssf(db_revision.payload))
+    if db_revision.kind == SNAPSHOT:
+        return StoryRevisionDelta(revision=revision, base_revision=None, document_changed=True, ops=[["i", payload]])
+    return StoryRevisionDelta(
+        revision=revision, base_revision=revision - 1,
+        document_changed=db_revision.document is not None, ops=payload,
+    )
+
+
+async def restore_revision_async(db: AsyncSession, story_id: int, revision: int) -> StoryRevision:
+    """把故事恢复到指定版本，只改写有差异的块，并记录为新版本"""
+    await ensure_story_blocks_async(db, story_id)
+    db_story = await get_alive_story_async(db, story_id)
+    _, document, blocks = await _materialize_async(db, story_id, revision)
+    document.setdefault("content_blocks", {})["blocks"] = []
+    db_story.ssf = encode_ssf(_dumps(document))
+    db_story.version += 1
+    db.add(db_story)
+    await replace_blocks_async(db, story_id, blocks)
+    restored = await record_revision_async(db, story_id, message=f"Restore revision {revision}")
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Another revision was created concurrently")
+    await invalidate(story_cache, [story_id])
+    await db.refresh(restored)
+    return restored
+
+
+async def delete_story_revisions_async(db: AsyncSession, story_ids: List[int]):
+    """删除故事的全部版本（不提交），故事被物理删除时调用"""
+    if story_ids:
+        await db.exec(delete(StoryRevision).where(StoryRevision.story_id.in_(story_ids)))
@@ -0,0 +1,299 @@
+"""
+故事线与事件的读写、拆分与合并。
+
+按时间范围查询事件使用 timeline_index 中按故事缓存的区间索引；
+所有修改故事线或事件关联的操作都会更新故事线/事件的 update_time，缓存的索引在下一次查询时按指纹失效。
+"""
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import delete, func, insert, literal, update
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from genstoryai_backend.config import settings
+from genstoryai_backend.models import COMMON_FIELDS
+from genstoryai_backend.models.event import Event, EventCreate, EventRead, EventUpdate
+from genstoryai_backend.models.timeline import (
+    Timeline, TimelineCreate, TimelineEvent, TimelineMerge, TimelineSplit, TimelineUpdate,
+)
+from genstoryai_backend.database.pagination import decode_cursor, encode_cursor
+from genstoryai_backend.database.timeline_index import IntervalIndex, timeline_index_cache
+from genstoryai_backend.database.crud.story_block_crud import get_alive_story_async
+
+
+async def _get_timeline(db: AsyncSession, timeline_id: int) -> Timeline:
+    db_timeline = (await db.exec(select(Timeline).where(Timeline.id == timeline_id, Timeline.is_deleted == False))).first()
+    if db_timeline is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Timeline not found")
+    return db_timeline
+
+
+async def _get_event(db: AsyncSession, event_id: int) -> Event:
+    db_event = (await db.exec(select(Event).where(Event.id == event_id, Event.is_deleted == False))).first()
+    if db_event is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Event not found")
+    return db_event
+
+
+async def _check_timelines(db: AsyncSession, story_id: int, timeline_ids: List[int]):
+    """timeline_ids 必须都是该故事中未删除的故事线"""
+    if not timeline_ids:
+        return
+    found = set((await db.exec(select(Timeline.id).where(
+        Timeline.id.in_(timeline_ids), Timeline.story_id == story_id, Timeline.is_deleted == False,
+    ))).all())
+    if found != set(timeline_ids):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Unknown timeline in this story")
+
+
+def _check_range(start_time: Optional[datetime], end_time: Optional[datetime]):
+    if start_time is not None and end_time is not None and end_time < start_time:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="end_time must not be earlier than start_time")
+
+
+async def _timeline_ids_of(db: AsyncSession, event_ids: List[int]) -> Dict[int, List[int]]:
+    """事件所属的未删除故事线，按故事线 ID 升序"""
+    timeline_ids: Dict[int, List[int]] = {event_id: [] for event_id in event_ids}
+    if event_ids:
+        rows = (await db.exec(
+            select(TimelineEvent.event_id, TimelineEvent.timeline_id)
+            .join(Timeline, Timeline.id == TimelineEvent.timeline_id)
+            .where(TimelineEvent.event_id.in_(event_ids), Timeline.is_deleted == False)
+            .order_by(TimelineEvent.timeline_id)
+        )).all()
+        for event_id, timeline_id in rows:
+            timeline_ids[event_id].append(timeline_id)
+    return timeline_ids
+
+
+def _event_read(db_event: Event, timeline_ids: List[int]) -> EventRead:
+    return EventRead.model_validate(db_event, update={"timeline_ids": timeline_ids})
+
+
+async def _delete_row(db: AsyncSession, db_row, link_column):
+    if settings.SOFT_DELETE:
+        db_row.is_deleted = True
+        db.add(db_row)
+    else:
+        await db.exec(delete(TimelineEvent).where(link_column == db_row.id))
+        await db.delete(db_row)
+    await db.commit()
+    timeline_index_cache.discard([db_row.story_id])
+
+
+# ---------- 故事线 ----------
+
+async def create_timeline_async(db: AsyncSession, timeline: TimelineCreate) -> Timeline:
+    await get_alive_story_async(db, timeline.story_id)
+    db_timeline = Timeline.model_validate(timeline)
+    db.add(db_timeline)
+    await db.commit()
+    await db.refresh(db_timeline)
+    return db_timeline
+
+
+async def get_timelines_async(db: AsyncSession, story_id: int) -> List[Timeline]:
+    """故事的全部故事线，按开始时间排序"""
+    await get_alive_story_async(db, story_id)
+    return list((await db.exec(
+        select(Timeline).where(Timeline.story_id == story_id, Timeline.is_deleted == False)
+        .order_by(Timeline.start_time, Timeline.id)
+    )).all())
+
+
+async def get_timeline_async(db: AsyncSession, timeline_id: int) -> Timeline:
+    return await _get_timeline(db, timeline_id)
+
+
+async def update_timeline_async(db: AsyncSession, timeline_id: int, timeline: TimelineUpdate) -> Timeline:
+    db_timeline = await _get_timeline(db, timeline_id)
+    for key, value in timeline.model_dump(exclude_unset=True, exclude=COMMON_FIELDS).items():
+        setattr(db_timeline, key, value)
+    _check_range(db_timeline.start_time, db_timeline.end_time)
+    db.add(db_timeline)
+    await db.commit()
+    await db.refresh(db_timeline)
+    return db_timeline
+
+
+async def delete_timeline_async(db: AsyncSession, timeline_id: int):
+    db_timeline = await _get_timeline(db, timeline_id)
+    await _delete_row(db, db_timeline, TimelineEvent.timeline_id)
+
+
+async def split_timeline_async(db: AsyncSession, timeline_id: int, split: TimelineSplit) -> Tuple[Timeline, Timeline]:
+    """
+    在 at 处拆分故事线：原故事线截止到 at，新故事线从 at 开始到原来的结束时间，
+    at 及之后开始的事件改为关联到新故事线，跨越 at 的事件留在原故事线。
+    """
+    db_timeline = await _get_timeline(db, timeline_id)
+    if not db_timeline.start_time < split.at < db_timeline.end_time:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Split point must be inside the timeline")
+    new_timeline = Timeline(
+        story_id=db_timeline.story_id, name=split.name, description=db_timeline.description,
+        start_time=split.at, end_time=db_timeline.end_time,
+    )
+    db.add(new_timeline)
+    db_timeline.end_time = split.at
+    db.add(db_timeline)
+    await db.flush()
+    moved = select(Event.id).where(Event.story_id == db_timeline.story_id, Event.start_time >= split.at)
+    await db.exec(
+        update(TimelineEvent)
+        .where(TimelineEvent.timeline_id == timeline_id, TimelineEvent.event_id.in_(moved))
+        .values(timeline_id=new_timeline.id)
+    )
+    await db.commit()
+    await db.refresh(db_timeline)
+    await db.refresh(new_timeline)
+    return db_timeline, new_timeline
+
+
+async def merge_timelines_async(db: AsyncSession, merge: TimelineMerge) -> Timeline:
+    """把 source_ids 的事件并入 target_id，目标故事线的时间范围扩展到覆盖所有故事线，原故事线被删除"""
+    source_ids = list(dict.fromkeys(merge.source_ids))
+    if merge.target_id in source_ids:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cannot merge a timeline into itself")
+    target = await _get_timeline(db, merge.target_id)
+    await _check_timelines(db, target.story_id, source_ids)
+    sources = list((await db.exec(select(Timeline).where(Timeline.id.in_(source_ids)))).all())
+
+    target.start_time = min([target.start_time, *(source.start_time for source in sources)])
+    target.end_time = max([target.end_time, *(source.end_time for source in sources)])
+    db.add(target)
+    existing = select(TimelineEvent.event_id).where(TimelineEvent.timeline_id == target.id)
+    await db.exec(insert(TimelineEvent).from_select(
+        ["timeline_id", "event_id", "story_id"],
+        select(literal(target.id), TimelineEvent.event_id, func.min(TimelineEvent.story_id))
+        .where(TimelineEvent.timeline_id.in_(source_ids), TimelineEvent.event_id.not_in(existing))
+        .group_by(TimelineEvent.event_id),
+    ))
+    await db.exec(delete(TimelineEvent).where(TimelineEvent.timeline_id.in_(source_ids)))
+    if settings.SOFT_DELETE:
+        await db.exec(update(Timeline).where(Timeline.id.in_(source_ids)).values(is_deleted=True, update_time=datetime.utcnow()))
+    else:
+        await db.exec(delete(Timeline).where(Timeline.id.in_(source_ids)))
+    await db.commit()
+    timeline_index_cache.discard([target.story_id])
+    await db.refresh(target)
+    return target
+
+
+# ---------- 事件 ----------
+
+async def create_event_async(db: AsyncSession, event: EventCreate) -> EventRead:
+    await get_alive_story_async(db, event.story_id)
+    timeline_ids = sorted(set(event.timeline_ids))
+    await _check_timelines(db, event.story_id, timeline_ids)
+    db_event = Event.model_validate(event)
+    db.add(db_event)
+    await db.flush()
+    for timeline_id in timeline_ids:
+        db.add(TimelineEvent(timeline_id=timeline_id, event_id=db_event.id, story_id=db_event.story_id))
+    await db.commit()
+    await db.refresh(db_event)
+    return _event_read(db_event, timeline_ids)
+
+
+async def get_event_async(db: AsyncSession, event_id: int) -> EventRead:
+    db_event = await _get_event(db, event_id)
+    return _event_read(db_event, (await _timeline_ids_of(db, [event_id]))[event_id])
+
+
+async def update_event_async(db: AsyncSession, event_id: int, event: EventUpdate) -> EventRead:
+    db_event = await _get_event(db, event_id)
+    update_data = event.model_dump(exclude_unset=True, exclude=COMMON_FIELDS | {"timeline_ids"})
+    for key, value in update_data.items():
+        setattr(db_event, key, value)
+    if db_event.end_time is not None and db_event.start_time is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="end_time requires start_time")
+    _check_range(db_event.start_time, db_event.end_time)
+    if event.timeline_ids is not None:
+        timeline_ids = sorted(set(event.timeline_ids))
+        await _check_timelines(db, db_event.story_id, timeline_ids)
+        await db.exec(delete(TimelineEvent).where(TimelineEvent.event_id == event_id))
+        for timeline_id in timeline_ids:
+            db.add(TimelineEvent(timeline_id=timeline_id, event_id=event_id, story_id=db_event.story_id))
+    # 只修改关联时行本身没有变化，显式更新 update_time 使索引失效
+    db_event.update_time = datetime.utcnow()
+    db.add(db_event)
+    await db.commit()
+    await db.refresh(db_event)
+    return _event_read(db_event, (await _timeline_ids_of(db, [event_id]))[event_id])
+
+
+async def delete_event_async(db: AsyncSession, event_id: int):
+    db_event = await _get_event(db, event_id)
+    await _delete_row(db, db_event, TimelineEvent.event_id)
+
+
+async def get_timeline_index_async(db: AsyncSession, story_id: int) -> IntervalIndex:
+    """故事的事件区间索引；事件、故事线及其关联都没有变化时直接返回缓存的索引"""
+    await get_alive_story_async(db, story_id)
+    fingerprint = tuple((await db.exec(select(
+        select(func.count(Event.id)).where(Event.story_id == story_id).scalar_subquery(),
+        select(func.max(Event.id)).where(Event.story_id == story_id).scalar_subquery(),
+        select(func.max(Event.update_time)).where(Event.story_id == story_id).scalar_subquery(),
+        select(func.count(Timeline.id)).where(Timeline.story_id == story_id).scalar_subquery(),
+        select(func.max(Timeline.update_time)).where(Timeline.story_id == story_id).scalar_subquery(),
+        select(func.count()).select_from(TimelineEvent).where(TimelineEvent.story_id == story_id).scalar_subquery(),
+    ))).one())
+    index = timeline_index_cache.get(story_id, fingerprint)
+    if index is not None:
+        return index
+
+    events = (await db.exec(
+        select(Event.id, Event.start_time, Event.end_time)
+        .where(Event.story_id == story_id, Event.is_deleted == False, Event.start_time.is_not(None))
+    )).all()
+    links = (await db.exec(
+        select(TimelineEvent.timeline_id, TimelineEvent.event_id)
+        .join(Timeline, Timeline.id == TimelineEvent.timeline_id)
+        .where(TimelineEvent.story_id == story_id, Timeline.is_deleted == False)
+    )).all()
+    index = IntervalIndex(events, links)
+    timeline_index_cache.put(story_id, fingerprint, index)
+    return index
+
+
+async def query_events_async(
+    db: AsyncSession,
+    story_id: int,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    timeline_ids: Optional[List[int]] = None,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+) -> Tuple[List[EventRead], Optional[str]]:
+    """
+    与 [start, end] 重叠的事件，按开始时间排序并分页；timeline_ids 不为空时只返回属于其中任一故事线的事件。
+    没有开始时间的事件不参与时间范围查询。
+    """
+    _check_range(start, end)
+    index = await get_timeline_index_async(db, story_id)
+    after = decode_cursor(cursor, (datetime, int))
+    event_ids = index.overlapping(
+        start, end, timeline_ids=timeline_ids,
+        after=(after[0], after[1]) if after is not None else None, limit=limit + 1,
+    )
+    next_cursor = None
+    if len(event_ids) > limit:
+        event_ids = event_ids[:limit]
+        next_cursor = encode_cursor(list(index.key(event_ids[-1])))
+    if not event_ids:
+        return [], None
+    rows = {db_event.id: db_event for db_event in (await db.exec(select(Event).where(Event.id.in_(event_ids)))).all()}
+    timeline_map = await _timeline_ids_of(db, event_ids)
+    # 索引与数据库之间可能有并发修改，只返回仍然存在的事件
+    return [_event_read(rows[event_id], timeline_map[event_id]) for event_id in event_ids if event_id in rows], next_cursor
+
+
+async def delete_story_timelines_async(db: AsyncSession, story_ids: List[int]):
+    """删除故事的全部故事线与事件（不提交），故事被物理删除时调用"""
+    if story_ids:
+        await db.exec(delete(TimelineEvent).where(TimelineEvent.story_id.in_(story_ids)))
+        await db.exec(delete(Event).where(Event.story_id.in_(story_ids)))
+        await db.exec(delete(Timeline).where(Timeline.story_id.in_(story_ids)))
+        timeline_index_cache.discard(story_ids)
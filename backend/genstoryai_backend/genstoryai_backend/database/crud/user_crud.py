@@ -1,8 +1,15 @@
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from fastapi import HTTPException, status
-from sqlmodel import Session, select
-
-from genstoryai_backend.models.user import User, UserCreate, UserUpdate
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import case, or_
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from genstoryai_backend.config import settings
+from genstoryai_backend.models import COMMON_FIELDS
+from genstoryai_backend.models.user import DELETED_MARK, User, UserCreate, UserUpdate
+from genstoryai_backend.database.pagination import decode_cursor, encode_cursor
 from passlib.context import CryptContext
 from datetime import datetime
 import secrets
@@ -22,18 +29,49 @@ def verify_password(plain_password: str, hashed_password: str):
     return pwd_context.verify(plain_password, hashed_password)
 
 
-def create_user(db: Session, user: UserCreate, verification_token: Optional[str] = None, token_created_at: Optional[datetime] = None) -> User:
-    # 检查邮箱是否已存在
-    existing_user = get_user_by_email(db, user.email)
-    if existing_user:
-        raise HTTPException(status_code=400, detail="Email already registered")
-    
+def _blank_as_none(value: Optional[str]) -> Optional[str]:
+    """空的用户名、邮箱保存为 NULL"""
+    return value or None
+
+
+def _release_identifiers(db_user: User):
+    """软删除时给用户名、邮箱加上删除标记，已删除的用户不再占用它们"""
+    mark = f"{DELETED_MARK}{db_user.id}"
+    if db_user.email is not None:
+        db_user.email += mark
+    if db_user.username is not None:
+        db_user.username += mark
+
+
+# bcrypt 计算较慢，放到线程池中执行，避免阻塞事件循环
+
+async def _check_identifiers_available(
+    db: AsyncSession, email: Optional[str], username: Optional[str], user_id: Optional[int] = None
+):
+    """邮箱与用户名分别查重，user_id 为修改资料的用户本身"""
+    for column, value, detail in (
+        (User.email, email, "Email already registered"),
+        (User.username, username, "Username already taken"),
+    ):
+        if value is None:
+            continue
+        statement = select(User.id).where(column == value, User.is_deleted == False)
+        if user_id is not None:
+            statement = statement.where(User.id != user_id)
+        if (await db.exec(statement.limit(1))).first() is not None:
+            raise HTTPException(status_code=400, detail=detail)
+
+
+async def create_user_async(db: AsyncSession, user: UserCreate, verification_token: Optional[str] = None, token_created_at: Optional[datetime] = None) -> User:
+    email, username = _blank_as_none(user.email), _blank_as_none(user.username)
+    await _check_identifiers_available(db, email, username)
+
     # 密码加密
-    hashed_password = get_password_hash(user.password)
-    
+    hashed_password = await run_in_threadpool(get_password_hash, user.password)
+
     db_user = User(
-        username=user.username,
-        email=user.email,
+        username=username,
+        email=email,
         password=hashed_password,
         is_active=True,
         is_verified=False,
@@ -41,130 +79,155 @@ def create_user(db: Session, user: UserCreate, verification_token: Optional[str]
         token_created_at=token_created_at
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    try:
+        await db.commit()
+    except IntegrityError:
+        # 并发注册时由唯一索引兜底
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="Email or username already registered")
+    await db.refresh(db_user)
     return db_user
 
 
-def get_user_by_id(db: Session, user_id: int) -> User:
-    db_user = db.exec(select(User).where(User.id == user_id)).first()
+async def get_user_by_id_async(db: AsyncSession, user_id: int) -> User:
+    db_user = (await db.exec(select(User).where(User.id == user_id, User.is_deleted == False))).first()
     if db_user is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
     return db_user
 
 
-def get_user_by_email(db: Session, email: str) -> Optional[User]:
-    return db.exec(select(User).where(User.email == email)).first()
+async def get_user_by_email_async(db: AsyncSession, email: str) -> Optional[User]:
+    return (await db.exec(select(User).where(User.email == email, User.is_deleted == False))).first()
+
+async def get_user_by_username_async(db: AsyncSession, username: str) -> Optional[User]:
+    return (await db.exec(select(User).where(User.username == username, User.is_deleted == False))).first()
 
-def get_user_by_username(db: Session, username: str) -> Optional[User]:
-    return db.exec(select(User).where(User.username == username)).first()
 
+def _login_lookup_statement(username_or_email: str):
+    """一次查询同时匹配邮箱或用户名，两者都命中时优先邮箱"""
+    return (
+        select(User)
+        .where(or_(User.email == username_or_email, User.username == username_or_email), User.is_deleted == False)
+        .order_by(case((User.email == username_or_email, 0), else_=1))
+        .limit(1)
+    )
 
-def get_users(db: Session, skip: int = 0, limit: int = 100) -> List[User]:
-    return list(db.exec(select(User).offset(skip).limit(limit)).all())
 
+async def get_user_by_login_async(db: AsyncSession, username_or_email: str) -> Optional[User]:
+    return (await db.exec(_login_lookup_statement(username_or_email))).first()
 
-def login_user(db: Session, username_or_email: str, password: str) -> User:
+
+async def get_users_async(db: AsyncSession, limit: int = 100, cursor: Optional[str] = None) -> Tuple[List[User], Optional[str]]:
+    """按 id 升序的游标分页，返回 (当前页, 下一页游标)"""
+    statement = select(User).where(User.is_deleted == False)
+    after = decode_cursor(cursor, (int,))
+    if after is not None:
+        statement = statement.where(User.id > after[0])
+    users = list((await db.exec(statement.order_by(User.id).limit(limit + 1))).all())
+    if len(users) <= limit:
+        return users, None
+    users = users[:limit]
+    return users, encode_cursor([users[-1].id])
+
+
+async def login_user_async(db: AsyncSession, username_or_email: str, password: str) -> User:
     """
     用户登录，支持用户名或邮箱登录，包含邮箱验证检查。
     """
-    print(f"[DEBUG] 开始登录验证: {username_or_email}")  # 直接打印，确保能看到
-    
-    # 先尝试按邮箱查找用户
-    user = get_user_by_email(db, username_or_email)
-    print(f"[DEBUG] 按邮箱查找结果: {'找到' if user else '未找到'}")
-    
-    # 如果按邮箱没找到，尝试按用户名查找
-    if not user:
-        user = get_user_by_username(db, username_or_email)
-        print(f"[DEBUG] 按用户名查找结果: {'找到' if user else '未找到'}")
-    
+    # 按邮箱或用户名查找用户，一次查询
+    user = await get_user_by_login_async(db, username_or_email)
+
     if not user:
-        print(f"[DEBUG] 用户不存在: {username_or_email}")
         logger.info(f"[AUTH_DEBUG] User not found for: {username_or_email}")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    
-    print(f"[DEBUG] 用户存在，开始验证密码: {user.email}")
-    if not verify_password(password, user.password):
-        print(f"[DEBUG] 密码验证失败: {username_or_email}")
+
+    if not await run_in_threadpool(verify_password, password, user.password):
         logger.info(f"[AUTH_DEBUG] Password verification failed for: {username_or_email}")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    
-    print(f"[DEBUG] 密码验证成功，检查邮箱验证状态: {user.is_verified}")
+
     # 检查用户是否已验证邮箱
     if not user.is_verified:
-        print(f"[DEBUG] 邮箱未验证: {user.email}")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="请先验证您的邮箱地址",
         )
-    
-    print(f"[DEBUG] 登录成功: {username_or_email} -> {user.email}")
+
     logger.info(f"[AUTH_DEBUG] Authentication successful for: {username_or_email} (email: {user.email})")
     return user
 
 
-def update_user(db: Session, user_id: int, user: UserUpdate) -> User:
-    db_user = db.exec(select(User).where(User.id == user_id)).first()
+async def update_user_async(db: AsyncSession, user_id: int, user: UserUpdate) -> User:
+    db_user = (await db.exec(select(User).where(User.id == user_id, User.is_deleted == False))).first()
     if db_user is None:
         raise HTTPException(status_code=404, detail="User not found")
-    
-    update_data = user.dict(exclude_unset=True)
+
+    update_data = user.model_dump(exclude_unset=True, exclude=COMMON_FIELDS)
+    for key in ("email", "username"):
+        if key in update_data:
+            update_data[key] = _blank_as_none(update_data[key])
+    await _check_identifiers_available(db, update_data.get("email"), update_data.get("username"), user_id)
     for key, value in update_data.items():
         if key == "password" and value:
-            value = get_password_hash(value)
+            value = await run_in_threadpool(get_password_hash, value)
         setattr(db_user, key, value)
-    
+
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="Email or username already registered")
+    await db.refresh(db_user)
     return db_user
 
 
-def delete_user(db: Session, user_id: int):
-    db_user = db.exec(select(User).where(User.id == user_id)).first()
+async def delete_user_async(db: AsyncSession, user_id: int):
+    db_user = (await db.exec(select(User).where(User.id == user_id, User.is_deleted == False))).first()
     if db_user is None:
         raise HTTPException(status_code=404, detail="User not found")
-    db.delete(db_user)
-    db.commit()
+    if settings.SOFT_DELETE:
+        db_user.is_deleted = True
+        _release_identifiers(db_user)
+        db.add(db_user)
+    else:
+        await db.delete(db_user)
+    await db.commit()
 
 
-def verify_user_email(db: Session, token: str, expire_hours: int = 24) -> User:
+async def verify_user_email_async(db: AsyncSession, token: str, expire_hours: int = 24) -> User:
     """
     校验邮箱验证token，支持token只能用一次和有效期限制。
     """
-    user = db.exec(select(User).where(User.verification_token == token)).first()
+    user = (await db.exec(select(User).where(User.verification_token == token, User.is_deleted == False))).first()
     if not user:
         raise HTTPException(status_code=400, detail="无效的验证令牌")
     # 检查token是否过期
-    # 检查token是否过期
     if not user.token_created_at or (datetime.utcnow() - user.token_created_at).total_seconds() > expire_hours * 3600:
         raise HTTPException(status_code=400, detail="验证令牌已过期")
     user.is_verified = True
     user.verification_token = None
     user.token_created_at = None
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     return user
 
 
-def set_user_verification_token(db: Session, user: User) -> User:
+async def set_user_verification_token_async(db: AsyncSession, user: User) -> User:
     """
     为用户生成新的邮箱验证token和token_created_at。
     """
-    new_token = secrets.token_urlsafe(32)
-    user.verification_token = new_token
+    user.verification_token = secrets.token_urlsafe(32)
     user.token_created_at = datetime.utcnow()
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     return user
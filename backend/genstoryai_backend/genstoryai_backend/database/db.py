@@ -1,19 +1,149 @@
-from typing import Generator
+from typing import AsyncGenerator, Generator
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine, URL, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import QueuePool, StaticPool
 from sqlmodel import SQLModel, create_engine, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-# 创建 SQLite 数据库引擎
-SQLALCHEMY_DATABASE_URL = "sqlite:///./genstoryai.db"
+from ..config import settings
+
+SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL
+
+# 同步驱动 -> 异步驱动
+_ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "mysql": "mysql+aiomysql",
+}
+
+
+def is_sqlite(url: URL) -> bool:
+    return url.get_backend_name() == "sqlite"
+
+
+def _is_memory_sqlite(url: URL) -> bool:
+    return url.database in (None, "", ":memory:") or url.query.get("mode") == "memory"
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """每个新的 SQLite 连接建立时应用调优参数"""
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT)}")
+        cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}")
+        cursor.execute(f"PRAGMA cache_size={int(settings.SQLITE_CACHE_SIZE)}")
+    finally:
+        cursor.close()
+
+
+def to_async_url(url: URL) -> URL:
+    """将同步连接串转换为对应的异步驱动，例如 sqlite:// -> sqlite+aiosqlite://"""
+    async_driver = _ASYNC_DRIVERS.get(url.get_backend_name())
+    if async_driver is None or url.drivername == async_driver:
+        return url
+    return url.set(drivername=async_driver)
+
+
+def _engine_kwargs(url: URL) -> dict:
+    kwargs = {
+        "echo": settings.DB_ECHO,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+    if is_sqlite(url):
+        kwargs["connect_args"] = {"check_same_thread": False}
+    if is_sqlite(url) and _is_memory_sqlite(url):
+        # 内存数据库只能共享同一个连接
+        kwargs["poolclass"] = StaticPool
+    else:
+        kwargs.update(
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+            pool_recycle=settings.DB_POOL_RECYCLE,
+        )
+    return kwargs
+
+
+def build_engine(database_url: str | None = None) -> Engine:
+    """根据配置创建数据库引擎，支持 SQLite 与 MySQL"""
+    url = make_url(database_url or SQLALCHEMY_DATABASE_URL)
+    db_engine = create_engine(url, **_engine_kwargs(url))
+    if is_sqlite(url):
+        event.listen(db_engine, "connect", _set_sqlite_pragmas)
+    return db_engine
+
+
+def build_async_engine(database_url: str | None = None) -> AsyncEngine:
+    """创建异步数据库引擎（aiosqlite / aiomysql），连接池与 SQLite 调优参数与同步引擎一致"""
+    url = to_async_url(make_url(database_url or SQLALCHEMY_DATABASE_URL))
+    db_engine = create_async_engine(url, **_engine_kwargs(url))
+    if is_sqlite(url):
+        event.listen(db_engine.sync_engine, "connect", _set_sqlite_pragmas)
+    return db_engine
+
+
+engine = build_engine()
+async_engine = build_async_engine()
+async_session_maker = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+
+
+def get_pool_status() -> dict:
+    """连接池统计信息，用于监控"""
+    return {
+        "sync": _pool_status(engine),
+        "async": _pool_status(async_engine.sync_engine),
+    }
+
+
+def _pool_status(db_engine: Engine) -> dict:
+    pool = db_engine.pool
+    status = {
+        "dialect": db_engine.dialect.name,
+        "driver": db_engine.dialect.driver,
+        "pool_class": type(pool).__name__,
+        "status": pool.status(),
+    }
+    if isinstance(pool, QueuePool):
+        status.update(
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=pool.overflow(),
+            max_overflow=settings.DB_MAX_OVERFLOW,
+        )
+    return status
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
 
 def create_db_and_tables():
     """Creates all SQLModel tables in the database."""
     SQLModel.metadata.create_all(engine)
 
 
-def get_db() -> Generator[Session, None, None]: 
+def get_db() -> Generator[Session, None, None]:
     """Dependency to get a database session."""
     with Session(engine) as session:
         yield session
+
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """Dependency to get an async database session."""
+    async with async_session_maker() as session:
+        yield session
+
+
+async def begin_read_snapshot(session: AsyncSession):
+    """
+    在 session 上开始读事务，之后的查询都读到同一个快照，直到 session 提交、回滚或关闭。
+    pysqlite 只在写语句前自动 BEGIN，SELECT 不在事务中、每条语句各读各的，SQLite 上需要显式 BEGIN；
+    其他数据库 session 自动开始的事务已经是快照读（MySQL 默认 REPEATABLE READ）。
+    """
+    if is_sqlite(session.bind.url):
+        await session.exec(text("BEGIN"))
+
+
+async def dispose_engines():
+    """关闭连接池，应用退出时调用"""
+    await async_engine.dispose()
+    engine.dispose()
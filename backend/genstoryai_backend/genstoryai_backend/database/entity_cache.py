@@ -0,0 +1,62 @@
+"""
+故事与角色的读穿透缓存。
+
+get_story_async / get_character_async 先查缓存，未命中时查数据库并写入缓存；
+update_* / delete_* 以及批量接口在提交后使对应条目失效。
+缓存中保存的是整行的 JSON，命中时反序列化为脱离 session 的模型对象，只能用于读取。
+"""
+import json
+from typing import Iterable, Optional, Type, TypeVar
+
+from sqlmodel import SQLModel
+
+from ..config import settings
+from ..models.character import Character
+from ..models.story import Story
+from ..utils.cache import LRUCache, TieredCache, build_shared_backend
+
+ModelT = TypeVar("ModelT", bound=SQLModel)
+
+_shared_backend = build_shared_backend(settings.ENTITY_CACHE_SHARED_URL)
+
+
+def _build_cache(namespace: str) -> TieredCache:
+    return TieredCache(
+        namespace,
+        LRUCache(settings.ENTITY_CACHE_MAX_BYTES, settings.ENTITY_CACHE_TTL_SECONDS),
+        shared=_shared_backend,
+        shared_ttl_seconds=settings.ENTITY_CACHE_SHARED_TTL_SECONDS,
+    )
+
+
+story_cache = _build_cache("story")
+character_cache = _build_cache("character")
+
+
+async def get_cached(cache: TieredCache, model: Type[ModelT], entity_id: int) -> Optional[ModelT]:
+    if not settings.ENTITY_CACHE_ENABLED:
+        return None
+    value = await cache.get(entity_id)
+    if value is None:
+        return None
+    return model.model_validate(json.loads(value))
+
+
+async def set_cached(cache: TieredCache, entity_id: int, entity: SQLModel):
+    if settings.ENTITY_CACHE_ENABLED:
+        await cache.set(entity_id, entity.model_dump_json().encode())
+
+
+async def invalidate(cache: TieredCache, entity_ids: Iterable[int]):
+    if settings.ENTITY_CACHE_ENABLED:
+        await cache.invalidate(entity_ids)
+
+
+def get_entity_cache_stats() -> dict:
+    """故事/角色读缓存的统计；其他缓存的统计由 /system/cache 汇总"""
+    return {
+        "enabled": settings.ENTITY_CACHE_ENABLED,
+        "shared_backend": type(_shared_backend).__name__ if _shared_backend is not None else None,
+        "story": story_cache.stats(),
+        "character": character_cache.stats(),
+    }
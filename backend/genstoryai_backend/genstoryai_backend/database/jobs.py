@@ -0,0 +1,189 @@
+"""
+后台维护任务。
+
+- purge_deleted: 分批物理删除软删除超过保留期的行，每批一个短事务，避免长时间持有写锁
+- recompress_stories: 按 SSF_CODEC 重新编码已有故事的 ssf，可手动执行: poetry run recompress-ssf [codec]
+- compact_revisions: 每个故事只保留最近 STORY_REVISION_KEEP 个历史版本，可手动执行: poetry run compact-revisions
+"""
+import asyncio
+import json
+import logging
+import sys
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Type
+
+from anyio import to_thread
+from sqlalchemy import bindparam, delete, func, update
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, SQLModel, select
+
+from ..config import settings
+from ..models.character import Character
+from ..models.character_relationship import CharacterRelationship
+from ..models.event import Event
+from ..models.story import Story
+from ..models.story_block import StoryBlock
+from ..models.story_revision import StoryRevision
+from ..models.timeline import Timeline, TimelineEvent
+from ..models.user import User
+from ..ssf.codec import encode_ssf, recode_ssf
+from .crud.story_revision_crud import SNAPSHOT, materialize_revisions, revision_chain_statement
+from .db import engine
+
+logger = logging.getLogger(__name__)
+
+PURGEABLE_MODELS = [Story, Character, Timeline, Event, User]
+# 物理删除时需要一起删除的从属行: 模型 -> [(从属模型, 外键列)]
+DEPENDENT_ROWS = {
+    Story: [
+        (StoryBlock, StoryBlock.story_id),
+        (StoryRevision, StoryRevision.story_id),
+        (CharacterRelationship, CharacterRelationship.story_id),
+        (TimelineEvent, TimelineEvent.story_id),
+        (Event, Event.story_id),
+        (Timeline, Timeline.story_id),
+    ],
+    Character: [
+        (CharacterRelationship, CharacterRelationship.source_id),
+        (CharacterRelationship, CharacterRelationship.target_id),
+    ],
+    Timeline: [(TimelineEvent, TimelineEvent.timeline_id)],
+    Event: [(TimelineEvent, TimelineEvent.event_id)],
+}
+
+
+def purge_deleted(
+    model: Type[SQLModel],
+    older_than: datetime,
+    batch_size: int = settings.PURGE_BATCH_SIZE,
+    db_engine: Engine = engine,
+) -> int:
+    """物理删除 older_than 之前软删除的行，返回删除的行数"""
+    total = 0
+    while True:
+        with Session(db_engine) as session:
+            ids = list(session.exec(
+                select(model.id)
+                .where(model.is_deleted == True, model.update_time < older_than)
+                .limit(batch_size)
+            ).all())
+            if not ids:
+                break
+            for dependent, column in DEPENDENT_ROWS.get(model, []):
+                session.exec(delete(dependent).where(column.in_(ids)))
+            session.exec(delete(model).where(model.id.in_(ids)))
+            session.commit()
+        total += len(ids)
+        if len(ids) < batch_size:
+            break
+    return total
+
+
+def purge_all_deleted(retention_days: Optional[int] = None, db_engine: Engine = engine) -> Dict[str, int]:
+    days = settings.PURGE_RETENTION_DAYS if retention_days is None else retention_days
+    older_than = datetime.utcnow() - timedelta(days=days)
+    result = {}
+    for model in PURGEABLE_MODELS:
+        result[model.__tablename__] = purge_deleted(model, older_than, db_engine=db_engine)
+    return result
+
+
+async def run_purge_loop(interval_seconds: int = settings.PURGE_INTERVAL_SECONDS):
+    """定期执行 purge_all_deleted，在线程池中运行，不阻塞事件循环"""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            purged = await to_thread.run_sync(purge_all_deleted)
+            if any(purged.values()):
+                logger.info(f"[PURGE] Removed soft-deleted rows: {purged}")
+        except Exception as e:
+            logger.error(f"[PURGE] Failed: {e}")
+
+
+def recompress_stories(
+    codec: Optional[str] = None,
+    batch_size: int = settings.PURGE_BATCH_SIZE,
+    db_engine: Engine = engine,
+) -> int:
+    """按 id 分批将 ssf 重新编码为目标 codec（默认 SSF_CODEC），返回改写的行数；不改变 update_time"""
+    total, last_id = 0, 0
+    while True:
+        with Session(db_engine) as session:
+            rows = session.exec(
+                select(Story.id, Story.ssf)
+                .where(Story.id > last_id, Story.ssf != None)
+                .order_by(Story.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            changed = []
+            for story_id, stored in rows:
+                recoded = recode_ssf(stored, codec)
+                if recoded != stored:
+                    changed.append({"story_id": story_id, "stored": recoded})
+            if changed:
+                session.exec(
+                    update(Story.__table__)
+                    .where(Story.id == bindparam("story_id"))
+                    # 显式赋值 update_time，避免触发 onupdate
+                    .values(ssf=bindparam("stored"), update_time=Story.update_time),
+                    params=changed,
+                )
+                session.commit()
+        total += len(changed)
+        if len(rows) < batch_size:
+            break
+    return total
+
+
+def recompress_main():
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    codec = sys.argv[1] if len(sys.argv) > 1 else None
+    count = recompress_stories(codec)
+    logger.info(f"[RECOMPRESS] Re-encoded {count} stories with {codec or settings.SSF_CODEC}")
+
+
+def compact_revisions(keep: Optional[int] = None, db_engine: Engine = engine) -> int:
+    """
+    删除每个故事最近 keep 个版本之前的历史版本，返回删除的行数。
+    保留下来的最早一个版本如果是 delta，先改写为完整快照，保证剩余版本仍然可以还原。
+    """
+    keep = max(1, settings.STORY_REVISION_KEEP if keep is None else keep)
+    total = 0
+    with Session(db_engine) as session:
+        story_ids = list(session.exec(
+            select(StoryRevision.story_id).group_by(StoryRevision.story_id).having(func.count() > keep)
+        ).all())
+    for story_id in story_ids:
+        # 每个故事一个短事务
+        with Session(db_engine) as session:
+            oldest_kept = session.exec(
+                select(StoryRevision.revision)
+                .where(StoryRevision.story_id == story_id)
+                .order_by(StoryRevision.revision.desc())
+                .offset(keep - 1)
+                .limit(1)
+            ).one()
+            chain = list(session.exec(revision_chain_statement(story_id, oldest_kept)).all())
+            if chain[-1].kind != SNAPSHOT:
+                document, blocks = materialize_revisions(chain)
+                base = chain[-1]
+                base.kind = SNAPSHOT
+                base.document = encode_ssf(json.dumps(document, ensure_ascii=False))
+                base.payload = encode_ssf(json.dumps(blocks, ensure_ascii=False))
+                session.add(base)
+            result = session.exec(
+                delete(StoryRevision).where(StoryRevision.story_id == story_id, StoryRevision.revision < oldest_kept)
+            )
+            session.commit()
+            total += result.rowcount
+    return total
+
+
+def compact_main():
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    keep = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    count = compact_revisions(keep)
+    logger.info(f"[COMPACT] Removed {count} story revisions")
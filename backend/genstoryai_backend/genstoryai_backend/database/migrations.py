@@ -0,0 +1,174 @@
+"""
+数据库结构迁移。
+
+create_all 只会创建不存在的表，已有数据库中新增的列和索引需要在这里补建。
+应用启动时自动执行，也可以手动执行: poetry run migrate
+"""
+import logging
+from typing import List
+
+from sqlalchemy import String, cast, inspect, text, update
+from sqlalchemy.schema import Column
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError
+from sqlmodel import SQLModel
+
+from .db import engine
+from .search import ensure_search_index
+# 导入所有表模型，确保 metadata 完整
+from ..models import character, character_relationship, event, story, story_block, story_revision, timeline, user  # noqa: F401
+from ..models.user import DELETED_MARK, User
+
+logger = logging.getLogger(__name__)
+
+
+def _column_default(column: Column):
+    default = column.default
+    if default is None:
+        return None
+    if default.is_callable:
+        return default.arg(None)
+    return default.arg
+
+
+def ensure_columns(db_engine: Engine = engine) -> List[str]:
+    """
+    为已存在的表补充模型中新增的列，返回新增的 "表.列"。
+    新列以可空列添加（SQLite 不支持带非常量默认值的 ADD COLUMN），再用模型默认值回填。
+    """
+    inspector = inspect(db_engine)
+    added = []
+    for table in SQLModel.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            preparer = db_engine.dialect.identifier_preparer
+            column_type = column.type.compile(dialect=db_engine.dialect)
+            table_name = preparer.format_table(table)
+            column_name = preparer.format_column(column)
+            with db_engine.begin() as connection:
+                connection.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {column_type}"))
+                default = _column_default(column)
+                if default is not None:
+                    connection.execute(
+                        text(f"UPDATE {table_name} SET {column_name} = :value WHERE {column_name} IS NULL"),
+                        {"value": default},
+                    )
+            logger.info(f"[MIGRATION] Added column {table.name}.{column.name}")
+            added.append(f"{table.name}.{column.name}")
+    return added
+
+
+def _rebuild_sqlite_table(connection, table):
+    """SQLite 不能修改列约束，按新的表结构重建：旧表改名、建新表与索引、复制数据、删除旧表"""
+    preparer = connection.dialect.identifier_preparer
+    old_name = preparer.quote(f"{table.name}__old")
+    connection.execute(text(f"ALTER TABLE {preparer.format_table(table)} RENAME TO {old_name}"))
+    # 改名后的旧表仍占用原来的索引名
+    for index in inspect(connection).get_indexes(f"{table.name}__old"):
+        connection.execute(text(f"DROP INDEX {preparer.quote(index['name'])}"))
+    existing = {column["name"] for column in inspect(connection).get_columns(f"{table.name}__old")}
+    columns = ", ".join(preparer.format_column(column) for column in table.columns if column.name in existing)
+    table.create(connection)
+    connection.execute(text(f"INSERT INTO {preparer.format_table(table)} ({columns}) SELECT {columns} FROM {old_name}"))
+    connection.execute(text(f"DROP TABLE {old_name}"))
+
+
+def ensure_nullable_columns(db_engine: Engine = engine) -> List[str]:
+    """模型中改为可空、数据库中仍为 NOT NULL 的列去掉 NOT NULL 约束，返回修改的 "表.列" """
+    inspector = inspect(db_engine)
+    changed = []
+    for table in SQLModel.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"]: column for column in inspector.get_columns(table.name)}
+        columns = [
+            column for column in table.columns
+            if column.nullable and not column.primary_key
+            and column.name in existing and not existing[column.name]["nullable"]
+        ]
+        if not columns:
+            continue
+        preparer = db_engine.dialect.identifier_preparer
+        table_name = preparer.format_table(table)
+        with db_engine.begin() as connection:
+            if db_engine.dialect.name == "sqlite":
+                _rebuild_sqlite_table(connection, table)
+            for column in columns:
+                column_name = preparer.format_column(column)
+                if db_engine.dialect.name == "mysql":
+                    column_type = column.type.compile(dialect=db_engine.dialect)
+                    connection.execute(text(f"ALTER TABLE {table_name} MODIFY COLUMN {column_name} {column_type} NULL"))
+                elif db_engine.dialect.name != "sqlite":
+                    connection.execute(text(f"ALTER TABLE {table_name} ALTER COLUMN {column_name} DROP NOT NULL"))
+        for column in columns:
+            logger.info(f"[MIGRATION] Made column {table.name}.{column.name} nullable")
+            changed.append(f"{table.name}.{column.name}")
+    return changed
+
+
+def clear_blank_user_identifiers(db_engine: Engine = engine):
+    """旧版本把未填写的用户名、邮箱保存为空字符串，改为 NULL，避免唯一索引只允许一个空值"""
+    with db_engine.begin() as connection:
+        for column in (User.email, User.username):
+            connection.execute(
+                update(User).where(column == "").values({column.name: None, "update_time": User.update_time})
+            )
+
+
+def release_deleted_user_identifiers(db_engine: Engine = engine):
+    """旧版本软删除的用户仍占用用户名、邮箱，按 user_crud 中的方式加上删除标记"""
+    mark = DELETED_MARK + cast(User.id, String)
+    with db_engine.begin() as connection:
+        for column in (User.email, User.username):
+            connection.execute(
+                update(User)
+                .where(User.is_deleted == True, column.is_not(None), column.not_like(f"%{DELETED_MARK}%"))
+                .values({column.name: column + mark, "update_time": User.update_time})
+            )
+
+
+def ensure_indexes(db_engine: Engine = engine) -> List[str]:
+    """为已存在的表补建模型中声明但数据库中缺失的索引，返回新建的索引名"""
+    inspector = inspect(db_engine)
+    created = []
+    for table in SQLModel.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        existing |= {constraint["name"] for constraint in inspector.get_unique_constraints(table.name)}
+        for index in table.indexes:
+            if index.name in existing:
+                continue
+            try:
+                # 每个索引单独一个事务，某个索引失败（例如已有重复数据）不影响其他索引
+                with db_engine.begin() as connection:
+                    index.create(connection)
+            except DBAPIError as e:
+                logger.error(f"[MIGRATION] Failed to create index {index.name} on {table.name}: {e.orig}")
+                continue
+            logger.info(f"[MIGRATION] Created index {index.name} on {table.name}")
+            created.append(index.name)
+    return created
+
+
+def run_migrations(db_engine: Engine = engine):
+    SQLModel.metadata.create_all(db_engine)
+    ensure_columns(db_engine)
+    ensure_nullable_columns(db_engine)
+    clear_blank_user_identifiers(db_engine)
+    release_deleted_user_identifiers(db_engine)
+    ensure_indexes(db_engine)
+    ensure_search_index(db_engine)
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    run_migrations()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+游标（keyset）分页。
+
+游标是排序键（例如 (update_time, id) 或 id）的 base64 编码，对客户端不透明。
+翻页时用 WHERE 排序键 < 游标 代替 OFFSET，深度翻页的代价与第一页相同。
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Sequence
+
+from fastapi import HTTPException, status
+
+# 数据库整数列的范围（64 位有符号），超出时 SQLite 驱动会直接报错
+_INT_MIN, _INT_MAX = -2 ** 63, 2 ** 63 - 1
+
+
+def encode_cursor(values: List[Any]) -> str:
+    payload = [
+        {"dt": value.isoformat()} if isinstance(value, datetime) else value
+        for value in values
+    ]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_value(value: Any, expected: type) -> Any:
+    if expected is datetime:
+        # 数据库中保存不带时区的 UTC 时间
+        if not isinstance(value, dict) or not isinstance(value.get("dt"), str):
+            raise ValueError("cursor value is not a datetime")
+        decoded = datetime.fromisoformat(value["dt"])
+        if decoded.tzinfo is not None:
+            raise ValueError("cursor datetime must be naive")
+        return decoded
+    if expected is int:
+        if isinstance(value, bool) or not isinstance(value, int) or not _INT_MIN <= value <= _INT_MAX:
+            raise ValueError("cursor value is not an integer")
+        return value
+    if not isinstance(value, expected):
+        raise ValueError(f"cursor value is not {expected.__name__}")
+    return value
+
+
+def decode_cursor(cursor: Optional[str], types: Sequence[type]) -> Optional[List[Any]]:
+    """按排序键的类型（例如 (datetime, int)）解析游标，格式或类型不正确时返回 400"""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        if not isinstance(payload, list) or len(payload) != len(types):
+            raise ValueError("cursor size mismatch")
+        return [_decode_value(value, expected) for value, expected in zip(payload, types)]
+    except (ValueError, TypeError, KeyError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
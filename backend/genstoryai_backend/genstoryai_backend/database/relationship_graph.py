@@ -0,0 +1,210 @@
+"""
+人物关系图谱的内存索引。
+
+每个故事的关系边加载为一个 RelationshipGraph：角色 ID 映射为连续下标，邻接表保存边的下标，
+k 跳邻域与最短路径都是 BFS，连通分量用并查集在第一次查询时计算，整张图的导出结果也会缓存。
+RelationshipGraph 构建后不再修改，可以在多个请求之间共享。
+
+缓存键为故事 ID，同时保存边的指纹 (边数, 最大 ID, 最大更新时间)。
+每次查询前先用一条走索引的聚合查询取指纹，与缓存不一致时重新加载，多个 worker 之间也不会读到旧图。
+角色改名或删除时会刷新其关系的更新时间（见 character_relationship_crud）。
+"""
+import threading
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from ..config import settings
+from ..models.character_relationship import GraphExport
+from ..utils.cache import FingerprintCache
+
+# (关系 ID, 起点角色 ID, 终点角色 ID, 关系类型, 强度)
+EdgeRow = Tuple[int, int, int, str, float]
+
+
+class RelationshipGraph:
+    def __init__(self, names: Dict[int, str], edges: Iterable[EdgeRow]):
+        # 端点不在 names 中（角色已删除）的边不参与图查询
+        edges = [edge for edge in edges if edge[1] in names and edge[2] in names]
+        self.ids: List[int] = sorted({edge[1] for edge in edges} | {edge[2] for edge in edges})
+        self.index: Dict[int, int] = {character_id: i for i, character_id in enumerate(self.ids)}
+        self.names: List[str] = [names[character_id] for character_id in self.ids]
+        self.types: List[str] = sorted({edge[3] for edge in edges})
+        type_index = {relation_type: i for i, relation_type in enumerate(self.types)}
+
+        self.edge_ids: List[int] = []
+        self.sources: List[int] = []
+        self.targets: List[int] = []
+        self.edge_types: List[int] = []
+        self.weights: List[float] = []
+        self.adjacency: List[List[int]] = [[] for _ in self.ids]
+        for edge_id, source_id, target_id, relation_type, weight in edges:
+            k = len(self.edge_ids)
+            source, target = self.index[source_id], self.index[target_id]
+            self.edge_ids.append(edge_id)
+            self.sources.append(source)
+            self.targets.append(target)
+            self.edge_types.append(type_index[relation_type])
+            self.weights.append(weight)
+            self.adjacency[source].append(k)
+            if target != source:
+                self.adjacency[target].append(k)
+
+        self._components: Optional[List[List[int]]] = None
+        self._component_of: Optional[List[int]] = None
+        self._export: Optional[GraphExport] = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _node(self, character_id: int) -> Optional[int]:
+        return self.index.get(character_id)
+
+    def _type_filter(self, relation_types: Optional[Sequence[str]]) -> Optional[Set[int]]:
+        if not relation_types:
+            return None
+        return {i for i, relation_type in enumerate(self.types) if relation_type in relation_types}
+
+    def _other(self, k: int, node: int) -> int:
+        return self.targets[k] if self.sources[k] == node else self.sources[k]
+
+    def neighborhood(
+        self,
+        character_id: int,
+        depth: int,
+        relation_types: Optional[Sequence[str]] = None,
+        max_nodes: Optional[int] = None,
+    ) -> Tuple[List[int], List[int], List[int]]:
+        """depth 跳以内的角色，返回 (节点下标, 对应跳数, 节点之间的边下标)，按跳数升序"""
+        start = self._node(character_id)
+        if start is None:
+            return [], [], []
+        allowed = self._type_filter(relation_types)
+        distance = {start: 0}
+        order = [start]
+        queue = deque([start])
+        while queue and (max_nodes is None or len(order) < max_nodes):
+            node = queue.popleft()
+            if distance[node] >= depth:
+                continue
+            for k in self.adjacency[node]:
+                if allowed is not None and self.edge_types[k] not in allowed:
+                    continue
+                other = self._other(k, node)
+                if other in distance:
+                    continue
+                distance[other] = distance[node] + 1
+                order.append(other)
+                queue.append(other)
+                if max_nodes is not None and len(order) >= max_nodes:
+                    break
+        # 每条边只在起点处计入一次
+        edges = [
+            k for node in order for k in self.adjacency[node]
+            if self.sources[k] == node and self.targets[k] in distance
+            and (allowed is None or self.edge_types[k] in allowed)
+        ]
+        return order, [distance[node] for node in order], edges
+
+    def shortest_path(
+        self, source_id: int, target_id: int, relation_types: Optional[Sequence[str]] = None,
+    ) -> Tuple[List[int], List[int]]:
+        """跳数最少的路径，返回 (角色 ID 列表, 关系 ID 列表)；不连通时都为空"""
+        start, goal = self._node(source_id), self._node(target_id)
+        if start is None or goal is None:
+            return [], []
+        if start == goal:
+            return [source_id], []
+        allowed = self._type_filter(relation_types)
+        parent: Dict[int, Tuple[int, int]] = {start: (-1, -1)}
+        queue = deque([start])
+        while queue:
+            node = queue.popleft()
+            for k in self.adjacency[node]:
+                if allowed is not None and self.edge_types[k] not in allowed:
+                    continue
+                other = self._other(k, node)
+                if other in parent:
+                    continue
+                parent[other] = (node, k)
+                if other == goal:
+                    queue.clear()
+                    break
+                queue.append(other)
+        if goal not in parent:
+            return [], []
+        nodes, edges = [goal], []
+        while nodes[-1] != start:
+            previous, k = parent[nodes[-1]]
+            nodes.append(previous)
+            edges.append(k)
+        return [self.ids[node] for node in reversed(nodes)], [self.edge_ids[k] for k in reversed(edges)]
+
+    def _build_components(self):
+        parent = list(range(len(self.ids)))
+
+        def find(x: int) -> int:
+            while parent[x] != x:
+                parent[x] = parent[parent[x]]
+                x = parent[x]
+            return x
+
+        for source, target in zip(self.sources, self.targets):
+            a, b = find(source), find(target)
+            if a != b:
+                parent[max(a, b)] = min(a, b)
+        groups: Dict[int, List[int]] = {}
+        for node in range(len(self.ids)):
+            groups.setdefault(find(node), []).append(node)
+        components = sorted(groups.values(), key=lambda group: (-len(group), group[0]))
+        component_of = [0] * len(self.ids)
+        for i, group in enumerate(components):
+            for node in group:
+                component_of[node] = i
+        self._component_of = component_of
+        self._components = components
+
+    def components(self) -> List[List[int]]:
+        """连通分量（节点下标），按大小降序"""
+        if self._components is None:
+            with self._lock:
+                if self._components is None:
+                    self._build_components()
+        return self._components
+
+    def component_of(self, character_id: int) -> Optional[List[int]]:
+        node = self._node(character_id)
+        if node is None:
+            return None
+        components = self.components()
+        return components[self._component_of[node]]
+
+    def export(self, nodes: Optional[List[int]] = None, edges: Optional[List[int]] = None) -> GraphExport:
+        """导出整张图或子图（节点下标与边下标），下标按导出的 nodes/types 重新编号"""
+        if nodes is None:
+            if self._export is None:
+                self._export = self._export_subgraph(range(len(self.ids)), range(len(self.edge_ids)))
+            return self._export
+        return self._export_subgraph(nodes, edges or [])
+
+    def _export_subgraph(self, nodes: Iterable[int], edges: Iterable[int]) -> GraphExport:
+        node_position = {}
+        exported_nodes = []
+        for node in nodes:
+            node_position[node] = len(exported_nodes)
+            exported_nodes.append((self.ids[node], self.names[node]))
+        type_position: Dict[int, int] = {}
+        exported_types: List[str] = []
+        exported_edges = []
+        for k in edges:
+            type_k = self.edge_types[k]
+            if type_k not in type_position:
+                type_position[type_k] = len(exported_types)
+                exported_types.append(self.types[type_k])
+            exported_edges.append(
+                (node_position[self.sources[k]], node_position[self.targets[k]], type_position[type_k], self.weights[k])
+            )
+        return GraphExport(nodes=exported_nodes, types=exported_types, edges=exported_edges)
+
+
+relationship_graph_cache = FingerprintCache(settings.RELATIONSHIP_GRAPH_CACHE_SIZE)
@@ -0,0 +1,250 @@
+"""
+基于 SQLite FTS5 的全文检索。
+
+search_index 覆盖故事标题与简介、角色描述以及正文块，使用 trigram 分词，中文无需分词即可按子串检索。
+索引由触发器维护，任何写入路径（包括批量写入、软删除、清理任务）都会在同一事务中同步更新。
+rowid = 原表 id * 4 + 类型编号，更新和删除时可以直接定位到索引行。
+
+只支持 SQLite，其他数据库上 search_async 返回 501。
+"""
+import logging
+import string
+from typing import List, Optional
+
+from fastapi import HTTPException, status
+from pydantic import BaseModel
+from sqlalchemy import Column, Integer, MetaData, Table, Text, and_, func, inspect, literal_column, or_, select, text
+from sqlalchemy.engine import Engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from ..models.genre import Genre
+from ..models.story import Story
+from ..models.story_block import StoryBlock
+from .db import engine, is_sqlite
+
+logger = logging.getLogger(__name__)
+
+SEARCH_KINDS = ("story", "character", "block")
+# trigram 分词要求检索词至少 3 个字符，更短的词改用 LIKE（全表扫描）
+MIN_MATCH_LENGTH = 3
+# 只有短词时没有 MATCH，snippet() 不可用，摘要取命中位置前后的字符数
+LIKE_SNIPPET_CHARS = 16
+# 与 SQLite LIKE 一致，只对 ASCII 字母忽略大小写，转换后长度不变
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+# 独立的 metadata，不参与 create_all
+search_table = Table(
+    "search_index", MetaData(),
+    Column("rowid", Integer, primary_key=True),
+    Column("kind", Text),
+    Column("ref_id", Integer),
+    Column("story_id", Integer),
+    Column("title", Text),
+    Column("body", Text),
+)
+_fts = literal_column("search_index")
+
+_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+        kind UNINDEXED, ref_id UNINDEXED, story_id UNINDEXED, title, body, tokenize = 'trigram'
+    )
+    """,
+    # 故事: title, summary + author
+    """
+    CREATE TRIGGER IF NOT EXISTS search_story_ai AFTER INSERT ON story WHEN new.is_deleted = 0 BEGIN
+        INSERT INTO search_index(rowid, kind, ref_id, story_id, title, body)
+        VALUES (new.id * 4, 'story', new.id, new.id, new.title, coalesce(new.summary, '') || ' ' || coalesce(new.author, ''));
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_story_au AFTER UPDATE OF title, summary, author, is_deleted ON story BEGIN
+        DELETE FROM search_index WHERE rowid = old.id * 4;
+        INSERT INTO search_index(rowid, kind, ref_id, story_id, title, body)
+        SELECT new.id * 4, 'story', new.id, new.id, new.title, coalesce(new.summary, '') || ' ' || coalesce(new.author, '')
+        WHERE new.is_deleted = 0;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_story_ad AFTER DELETE ON story BEGIN
+        DELETE FROM search_index WHERE rowid = old.id * 4;
+    END
+    """,
+    # 角色: name, description + appearance + personality + backstory
+    """
+    CREATE TRIGGER IF NOT EXISTS search_character_ai AFTER INSERT ON character WHEN new.is_deleted = 0 BEGIN
+        INSERT INTO search_index(rowid, kind, ref_id, story_id, title, body)
+        VALUES (new.id * 4 + 1, 'character', new.id, NULL, new.name,
+                new.description || ' ' || new.appearance || ' ' || new.personality || ' ' || new.backstory);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_character_au
+    AFTER UPDATE OF name, description, appearance, personality, backstory, is_deleted ON character BEGIN
+        DELETE FROM search_index WHERE rowid = old.id * 4 + 1;
+        INSERT INTO search_index(rowid, kind, ref_id, story_id, title, body)
+        SELECT new.id * 4 + 1, 'character', new.id, NULL, new.name,
+               new.description || ' ' || new.appearance || ' ' || new.personality || ' ' || new.backstory
+        WHERE new.is_deleted = 0;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_character_ad AFTER DELETE ON character BEGIN
+        DELETE FROM search_index WHERE rowid = old.id * 4 + 1;
+    END
+    """,
+    # 正文块: 只索引内容，移动位置不需要更新；所属故事是否删除在查询时判断
+    """
+    CREATE TRIGGER IF NOT EXISTS search_block_ai AFTER INSERT ON story_block BEGIN
+        INSERT INTO search_index(rowid, kind, ref_id, story_id, title, body)
+        VALUES (new.id * 4 + 2, 'block', new.id, new.story_id, '', new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_block_au AFTER UPDATE OF content ON story_block BEGIN
+        DELETE FROM search_index WHERE rowid = old.id * 4 + 2;
+        INSERT INTO search_index(rowid, kind, ref_id, story_id, title, body)
+        VALUES (new.id * 4 + 2, 'block', new.id, new.story_id, '', new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_block_ad AFTER DELETE ON story_block BEGIN
+        DELETE FROM search_index WHERE rowid = old.id * 4 + 2;
+    END
+    """,
+]
+
+_REBUILD = [
+    "DELETE FROM search_index",
+    """
+    INSERT INTO search_index(rowid, kind, ref_id, story_id, title, body)
+    SELECT id * 4, 'story', id, id, title, coalesce(summary, '') || ' ' || coalesce(author, '') FROM story WHERE is_deleted = 0
+    """,
+    """
+    INSERT INTO search_index(rowid, kind, ref_id, story_id, title, body)
+    SELECT id * 4 + 1, 'character', id, NULL, name, description || ' ' || appearance || ' ' || personality || ' ' || backstory
+    FROM character WHERE is_deleted = 0
+    """,
+    """
+    INSERT INTO search_index(rowid, kind, ref_id, story_id, title, body)
+    SELECT id * 4 + 2, 'block', id, story_id, '', content FROM story_block
+    """,
+]
+
+
+class SearchHit(BaseModel):
+    kind: str
+    id: int
+    story_id: Optional[int] = None
+    block_index: Optional[int] = None
+    title: str
+    snippet: str
+    score: float
+
+
+def ensure_search_index(db_engine: Engine = engine) -> bool:
+    """创建全文索引与触发器，第一次创建时用现有数据填充；非 SQLite 数据库跳过"""
+    if not is_sqlite(db_engine.url):
+        return False
+    created = not inspect(db_engine).has_table("search_index")
+    with db_engine.begin() as connection:
+        for statement in _DDL:
+            connection.execute(text(statement))
+        if created:
+            for statement in _REBUILD:
+                connection.execute(text(statement))
+            logger.info("[MIGRATION] Built full-text search index")
+    return True
+
+
+def rebuild_search_index(db_engine: Engine = engine):
+    with db_engine.begin() as connection:
+        for statement in _REBUILD:
+            connection.execute(text(statement))
+
+
+def _like_pattern(term: str) -> str:
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def _like_snippet(texts: List[Optional[str]], term: str) -> str:
+    """没有 MATCH 时的摘要：第一个包含 term 的字段中命中位置附近的片段，与 snippet() 的格式一致"""
+    for value in texts:
+        if not value:
+            continue
+        position = value.translate(_ASCII_LOWER).find(term.translate(_ASCII_LOWER))
+        if position < 0:
+            continue
+        end = position + len(term)
+        start, stop = max(0, position - LIKE_SNIPPET_CHARS), min(len(value), end + LIKE_SNIPPET_CHARS)
+        return (
+            ("…" if start > 0 else "") + value[start:position]
+            + "<mark>" + value[position:end] + "</mark>"
+            + value[end:stop] + ("…" if stop < len(value) else "")
+        )
+    return ""
+
+
+async def search_async(
+    db: AsyncSession,
+    query: str,
+    kinds: Optional[List[str]] = None,
+    genre: Optional[Genre] = None,
+    limit: int = 20,
+    offset: int = 0,
+) -> List[SearchHit]:
+    """
+    按空白分隔的多个词检索（AND），结果按 bm25 排序，标题权重高于正文。
+    指定 genre 时只返回该类型故事及其正文块。
+    """
+    if not is_sqlite(db.bind.url):
+        raise HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED, detail="Full-text search requires SQLite")
+    terms = query.split()
+    if not terms:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Empty query")
+    match_terms = [term for term in terms if len(term) >= MIN_MATCH_LENGTH]
+    like_terms = [term for term in terms if len(term) < MIN_MATCH_LENGTH]
+
+    fts = search_table.c
+    score = func.bm25(_fts, 0.0, 0.0, 0.0, 5.0, 1.0) if match_terms else literal_column("0.0")
+    # snippet() 只能用于 MATCH 查询，只有短词时取回正文在 Python 中截取
+    snippet = func.snippet(_fts, -1, "<mark>", "</mark>", "…", 16) if match_terms else fts.body
+    statement = (
+        select(
+            fts.kind, fts.ref_id, fts.story_id, StoryBlock.block_index,
+            fts.title, Story.title.label("story_title"),
+            snippet.label("snippet"),
+            score.label("score"),
+        )
+        .select_from(
+            search_table
+            .outerjoin(Story, Story.id == fts.story_id)
+            .outerjoin(StoryBlock, and_(fts.kind == "block", StoryBlock.id == fts.ref_id))
+        )
+        # 角色没有所属故事，其余结果只保留未删除的故事
+        .where(or_(fts.kind == "character", Story.is_deleted == False))
+    )
+    if match_terms:
+        # 每个词作为短语检索，避免用户输入被解释为 FTS 查询语法
+        phrase = " AND ".join('"' + term.replace('"', '""') + '"' for term in match_terms)
+        statement = statement.where(_fts.op("MATCH")(phrase))
+    for term in like_terms:
+        pattern = _like_pattern(term)
+        statement = statement.where(or_(fts.title.like(pattern, escape="\\"), fts.body.like(pattern, escape="\\")))
+    if kinds:
+        statement = statement.where(fts.kind.in_(kinds))
+    if genre is not None:
+        statement = statement.where(Story.genre == genre)
+    statement = statement.order_by(score, fts.rowid).limit(limit).offset(offset)
+
+    rows = (await db.exec(statement)).all()
+    return [
+        SearchHit(
+            kind=row.kind, id=row.ref_id, story_id=row.story_id, block_index=row.block_index,
+            title=row.title or row.story_title or "",
+            snippet=(row.snippet or "") if match_terms else _like_snippet([row.snippet, row.title], like_terms[0]),
+            score=row.score,
+        )
+        for row in rows
+    ]
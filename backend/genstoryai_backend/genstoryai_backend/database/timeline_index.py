@@ -0,0 +1,108 @@
+"""
+时间线事件的内存区间索引。
+
+每个故事的事件按 (start_time, id) 排序，再在排序后的数组上建一棵保存区间 end_time 最大值的线段树。
+查询与 [start, end] 重叠的事件时，先二分找到 start_time <= end 的前缀，
+再只进入 end_time 最大值 >= start 的子树，代价为 O(log n + k log n)，k 为结果数。
+事件所属的故事线保存为位图，按多条故事线的并集过滤时只需要一次按位与。
+
+与人物关系图谱一样按故事缓存，查询前用事件与故事线的指纹判断是否需要重建。
+"""
+from bisect import bisect_right
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from ..config import settings
+from ..utils.cache import FingerprintCache
+
+# (事件 ID, 开始时间, 结束时间)，结束时间为空时等于开始时间
+EventRow = Tuple[int, datetime, Optional[datetime]]
+
+
+class IntervalIndex:
+    def __init__(self, events: Iterable[EventRow], links: Iterable[Tuple[int, int]] = ()):
+        rows = sorted(
+            (start, event_id, end if end is not None else start) for event_id, start, end in events if start is not None
+        )
+        self.ids: List[int] = [row[1] for row in rows]
+        self.starts: List[datetime] = [row[0] for row in rows]
+        self.ends: List[datetime] = [row[2] for row in rows]
+        self.keys: List[Tuple[datetime, int]] = [(row[0], row[1]) for row in rows]
+        self.position: Dict[int, int] = {event_id: i for i, event_id in enumerate(self.ids)}
+
+        # 每条故事线对应一个比特，masks[i] 为第 i 个事件所属故事线的位图
+        self.timeline_bits: Dict[int, int] = {}
+        self.masks: List[int] = [0] * len(self.ids)
+        for timeline_id, event_id in links:
+            i = self.position.get(event_id)
+            if i is None:
+                continue
+            bit = self.timeline_bits.setdefault(timeline_id, len(self.timeline_bits))
+            self.masks[i] |= 1 << bit
+
+        size = 1
+        while size < len(self.ids):
+            size *= 2
+        self._size = size
+        self._max_end: List[datetime] = [datetime.min] * (2 * size)
+        self._max_end[size:size + len(self.ends)] = self.ends
+        for node in range(size - 1, 0, -1):
+            self._max_end[node] = max(self._max_end[2 * node], self._max_end[2 * node + 1])
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _timeline_mask(self, timeline_ids: Sequence[int]) -> int:
+        mask = 0
+        for timeline_id in timeline_ids:
+            bit = self.timeline_bits.get(timeline_id)
+            if bit is not None:
+                mask |= 1 << bit
+        return mask
+
+    def overlapping(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        timeline_ids: Optional[Sequence[int]] = None,
+        after: Optional[Tuple[datetime, int]] = None,
+        limit: Optional[int] = None,
+    ) -> List[int]:
+        """
+        与 [start, end] 有交集的事件 ID（端点相接也算），按 (开始时间, ID) 排序。
+        timeline_ids 不为空时只保留属于其中任一故事线的事件；after 为上一页最后一个事件的 (开始时间, ID)。
+        """
+        first = 0 if after is None else bisect_right(self.keys, after)
+        count = len(self.ids) if end is None else bisect_right(self.starts, end)
+        mask = None if timeline_ids is None else self._timeline_mask(timeline_ids)
+        if first >= count or mask == 0:
+            return []
+        candidates = range(first, count) if start is None else self._search(start, first, count)
+        result: List[int] = []
+        for i in candidates:
+            if mask is None or self.masks[i] & mask:
+                result.append(self.ids[i])
+                if limit is not None and len(result) >= limit:
+                    break
+        return result
+
+    def key(self, event_id: int) -> Tuple[datetime, int]:
+        return self.keys[self.position[event_id]]
+
+    def _search(self, start: datetime, first: int, count: int) -> Iterator[int]:
+        """下标在 [first, count) 且 end_time >= start 的事件下标，升序"""
+        stack = [(1, 0, self._size)]
+        while stack:
+            node, lo, hi = stack.pop()
+            if lo >= count or hi <= first or self._max_end[node] < start:
+                continue
+            if node >= self._size:
+                yield lo
+                continue
+            middle = (lo + hi) // 2
+            # 先压右子树，保证按下标升序输出
+            stack.append((2 * node + 1, middle, hi))
+            stack.append((2 * node, lo, middle))
+
+
+timeline_index_cache = FingerprintCache(settings.TIMELINE_INDEX_CACHE_SIZE)
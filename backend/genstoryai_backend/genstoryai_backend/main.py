@@ -1,22 +1,44 @@
-from fastapi import FastAPI
-import uvicorn
-
-from genstoryai_backend.utils.i18n import compile_translations
-from contextlib import asynccontextmanager
-from genstoryai_backend.config import print_env_vars
-compile_translations()
-
-from genstoryai_backend.utils.middleware import add_middlewares
-from genstoryai_backend.utils.i18n import trans 
-from genstoryai_backend.database.db import create_db_and_tables
-from genstoryai_backend.router import story_router
-from genstoryai_backend.router import character_router
-from genstoryai_backend.router import user_router
+from genstoryai_backend.utils.startup import startup_phase, mark_ready
+
+with startup_phase("import"):
+    import asyncio
+    from fastapi import FastAPI
+    import uvicorn
+
+    from contextlib import asynccontextmanager
+    from genstoryai_backend.config import print_env_vars, settings
+    from genstoryai_backend.utils.i18n import compile_translations
+    from genstoryai_backend.utils.middleware import add_middlewares
+    from genstoryai_backend.utils.i18n import trans
+    from genstoryai_backend.database.db import dispose_engines
+    from genstoryai_backend.database.migrations import run_migrations
+    from genstoryai_backend.database.jobs import run_purge_loop
+    from genstoryai_backend.agent.generation_cache import generation_cache
+    from genstoryai_backend.agent.registry import close_http_client
+    from genstoryai_backend.router import story_router
+    from genstoryai_backend.router import character_router
+    from genstoryai_backend.router import user_router
+    from genstoryai_backend.router import system_router
+    from genstoryai_backend.router import search_router
+    from genstoryai_backend.router import timeline_router
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    create_db_and_tables()
+    if settings.I18N_COMPILE_ON_STARTUP:
+        with startup_phase("compile_translations"):
+            compile_translations()
+    with startup_phase("migrations"):
+        run_migrations()
+    purge_task = None
+    if settings.SOFT_DELETE and settings.PURGE_INTERVAL_SECONDS > 0:
+        purge_task = asyncio.create_task(run_purge_loop(settings.PURGE_INTERVAL_SECONDS))
+    mark_ready()
     yield
+    if purge_task is not None:
+        purge_task.cancel()
+    await dispose_engines()
+    generation_cache.close()
+    await close_http_client()
 
 app = FastAPI(title="GenStoryAI API", lifespan=lifespan)
 add_middlewares(app)
@@ -25,6 +47,9 @@ add_middlewares(app)
 app.include_router(character_router)
 app.include_router(story_router)
 app.include_router(user_router)
+app.include_router(system_router)
+app.include_router(search_router)
+app.include_router(timeline_router)
 
 @app.get("/")
 async def root():
@@ -33,4 +58,4 @@ async def root():
 
 if __name__ == "__main__":
     print_env_vars()
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -1,7 +1,64 @@
-from datetime import datetime
+from datetime import datetime, timezone
+from typing import Annotated, Generic, List, Optional, TypeVar
+from pydantic import AfterValidator, BaseModel
+from sqlalchemy import Index, text
 from sqlmodel import SQLModel, Field
 
+T = TypeVar("T")
+
 class CommonBase(SQLModel):
     create_time: datetime = Field(default_factory=datetime.utcnow, description="创建时间")
-    update_time: datetime = Field(default_factory=datetime.utcnow, description="更新时间")
-    is_deleted: bool = Field(default=False, description="是否删除")
\ No newline at end of file
+    update_time: datetime = Field(
+        default_factory=datetime.utcnow,
+        description="更新时间",
+        sa_column_kwargs={"onupdate": datetime.utcnow},
+    )
+    is_deleted: bool = Field(default=False, description="是否删除")
+
+
+# 由系统维护的公共字段，更新接口中忽略客户端传入的值
+COMMON_FIELDS = {"create_time", "update_time", "is_deleted"}
+
+
+def _naive_utc(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+# 数据库中统一保存不带时区的 UTC 时间，客户端传入带时区的时间时先转换
+UtcDatetime = Annotated[datetime, AfterValidator(_naive_utc)]
+
+
+def alive_index(name: str, *columns: str) -> Index:
+    """
+    只覆盖未删除行的索引。
+    SQLite 上是部分索引（WHERE is_deleted = 0），MySQL 不支持部分索引，
+    因此列中包含 is_deleted，按 is_deleted = 0 过滤时同样可以走索引。
+    """
+    return Index(name, *columns, sqlite_where=text("is_deleted = 0"))
+
+
+class Page(BaseModel, Generic[T]):
+    """游标分页结果，next_cursor 为空表示没有下一页"""
+    items: List[T]
+    next_cursor: Optional[str] = None
+
+
+class BulkItemResult(BaseModel):
+    """批量操作中单个元素的结果，index 为请求数组中的下标"""
+    index: int
+    id: Optional[int] = None
+    ok: bool
+    error: Optional[str] = None
+
+
+class BulkResult(BaseModel):
+    succeeded: int
+    failed: int
+    results: List[BulkItemResult]
+
+    @classmethod
+    def from_results(cls, results: List[BulkItemResult]) -> "BulkResult":
+        succeeded = sum(1 for result in results if result.ok)
+        return cls(succeeded=succeeded, failed=len(results) - succeeded, results=results)
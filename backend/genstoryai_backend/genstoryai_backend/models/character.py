@@ -1,6 +1,8 @@
-from typing import Optional
+from typing import List, Optional
+from pydantic import model_validator
 from sqlmodel import SQLModel, Field
-from . import CommonBase
+from ..config import settings
+from . import CommonBase, alive_index
 
 
 class CharacterBase(CommonBase, SQLModel):
@@ -13,7 +15,11 @@ class CharacterBase(CommonBase, SQLModel):
     backstory: str = Field(description="The backstory of the character", default="")
 
 class Character(CharacterBase,table=True):
-    id: int = Field(primary_key=True, index=True)
+    __table_args__ = (
+        alive_index("ix_character_alive_id", "is_deleted", "id"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True, index=True)
 
 class CharacterCreate(CharacterBase):
     pass
@@ -29,3 +35,36 @@ class CharacterUpdate(CommonBase, SQLModel):
     appearance: Optional[str] = None
     personality: Optional[str] = None
     backstory: Optional[str] = None
+
+class CharacterBulkUpdate(CharacterUpdate):
+    id: int
+
+class CharacterGenerateBatch(SQLModel):
+    """批量生成：给出 prompts 时逐条生成，否则用 prompt 生成 count 个角色"""
+    prompts: List[str] = Field(default_factory=list, max_length=settings.GENERATION_BATCH_MAX_ITEMS)
+    prompt: Optional[str] = None
+    count: int = Field(default=1, ge=1, le=settings.GENERATION_BATCH_MAX_ITEMS)
+    persist: bool = Field(default=False, description="生成成功的角色是否直接保存")
+    use_cache: bool = True
+
+    @model_validator(mode="after")
+    def _check_prompts(self):
+        if not self.prompts and not self.prompt:
+            raise ValueError("prompts or prompt is required")
+        return self
+
+    def expand(self) -> List[str]:
+        return list(self.prompts) if self.prompts else [self.prompt] * self.count
+
+class CharacterGenerateItem(SQLModel):
+    """单个提示词的生成结果，index 为展开后的提示词下标；persist 时 id 为保存后的角色 ID"""
+    index: int
+    ok: bool
+    character: Optional[CharacterCreate] = None
+    id: Optional[int] = None
+    error: Optional[str] = None
+
+class CharacterGenerateBatchResult(SQLModel):
+    succeeded: int
+    failed: int
+    results: List[CharacterGenerateItem]
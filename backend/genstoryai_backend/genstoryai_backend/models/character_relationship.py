@@ -0,0 +1,78 @@
+from datetime import datetime
+from typing import List, Optional, Tuple
+from pydantic import BaseModel
+from sqlalchemy import Index
+from sqlmodel import SQLModel, Field
+
+
+class CharacterRelationship(SQLModel, table=True):
+    """
+    故事中两个角色之间的关系（人物关系图谱的一条边）。
+    source -> target 表示关系的方向（例如 "父亲"），图查询时按无向边遍历。
+    """
+    __tablename__ = "character_relationship"
+    __table_args__ = (
+        Index("uq_character_relationship_edge", "story_id", "source_id", "target_id", "relation_type", unique=True),
+        Index("ix_character_relationship_source", "source_id"),
+        Index("ix_character_relationship_target", "target_id"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    story_id: int = Field(description="所属故事 ID")
+    source_id: int = Field(description="起点角色 ID")
+    target_id: int = Field(description="终点角色 ID")
+    relation_type: str = Field(max_length=32, description="关系类型，例如 friend、父亲")
+    weight: float = Field(default=1.0, description="关系强度")
+    description: str = Field(default="", description="关系说明")
+    create_time: datetime = Field(default_factory=datetime.utcnow, description="创建时间")
+    update_time: datetime = Field(
+        default_factory=datetime.utcnow,
+        description="更新时间",
+        sa_column_kwargs={"onupdate": datetime.utcnow},
+    )
+
+class CharacterRelationshipCreate(SQLModel):
+    source_id: int
+    target_id: int
+    relation_type: str = Field(min_length=1, max_length=32)
+    weight: float = 1.0
+    description: str = ""
+
+class CharacterRelationshipUpdate(SQLModel):
+    relation_type: Optional[str] = Field(default=None, min_length=1, max_length=32)
+    weight: Optional[float] = None
+    description: Optional[str] = None
+
+class CharacterRelationshipRead(SQLModel):
+    id: int
+    story_id: int
+    source_id: int
+    target_id: int
+    relation_type: str
+    weight: float
+    description: str
+
+
+class GraphExport(BaseModel):
+    """
+    紧凑的图谱格式，供前端直接渲染。
+    nodes 为 [角色 ID, 名字]；edges 为 [起点下标, 终点下标, 关系类型下标, 强度]，下标分别指向 nodes 与 types。
+    """
+    nodes: List[Tuple[int, str]]
+    types: List[str]
+    edges: List[Tuple[int, int, int, float]]
+
+class GraphNeighborhood(BaseModel):
+    """distances 与 nodes 一一对应，为到中心角色的跳数"""
+    center: int
+    distances: List[int]
+    graph: GraphExport
+
+class GraphPath(BaseModel):
+    """nodes 为途经的角色 ID，relationships 为相邻两个角色之间的关系 ID；不连通时两者都为空"""
+    nodes: List[int]
+    relationships: List[int]
+
+class GraphComponent(BaseModel):
+    size: int
+    nodes: List[int]
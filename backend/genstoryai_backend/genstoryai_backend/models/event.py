@@ -1,30 +1,45 @@
-from pydantic import BaseModel
-from typing import List
-from . import CommonBase
-from datetime import datetime
+from typing import List, Optional
+from pydantic import model_validator
+from sqlmodel import SQLModel, Field
+from . import CommonBase, UtcDatetime, alive_index
 
-class EventBase(CommonBase, BaseModel):
+
+class EventBase(CommonBase, SQLModel):
+    """没有 end_time 的事件视为发生在 start_time 这一时刻；没有 start_time 的事件不参与时间范围查询"""
     name: str
-    description: str | None = None
-    timeline_ids: List[int] | None = None
-    start_time: datetime | None = None
-    end_time: datetime | None = None
+    description: Optional[str] = None
+    start_time: Optional[UtcDatetime] = None
+    end_time: Optional[UtcDatetime] = None
 
-class Event(EventBase):
-    id: int
+    @model_validator(mode="after")
+    def _check_range(self):
+        if self.end_time is not None and (self.start_time is None or self.end_time < self.start_time):
+            raise ValueError("end_time requires start_time and must not be earlier than it")
+        return self
+
+class Event(EventBase, table=True):
+    __table_args__ = (
+        alive_index("ix_event_alive_story", "is_deleted", "story_id", "id"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    story_id: int = Field(description="所属故事 ID")
 
 
 class EventCreate(EventBase):
-    pass
+    story_id: int
+    timeline_ids: List[int] = []
 
 class EventRead(EventBase):
     id: int
+    story_id: int
+    timeline_ids: List[int] = []
 
 
 
-class EventUpdate(CommonBase, BaseModel):
-    name: str | None = None
-    description: str | None = None
-    timeline_ids: List[int] | None = None
-    start_time: datetime | None = None
-    end_time: datetime | None = None
+class EventUpdate(CommonBase, SQLModel):
+    name: Optional[str] = None
+    description: Optional[str] = None
+    timeline_ids: Optional[List[int]] = None
+    start_time: Optional[UtcDatetime] = None
+    end_time: Optional[UtcDatetime] = None
@@ -1,9 +1,16 @@
+import logging
+from datetime import datetime
 from typing import Optional, List
+from pydantic import field_validator
 from sqlmodel import SQLModel, Field
-from . import CommonBase
-from ..ssf.ssf import StorySchemaFormat
+from . import CommonBase, alive_index
+from ..ssf.codec import HEADER_PREFIX, decode_ssf, encode_ssf
+from ..ssf.parse_cache import ssf_parse_cache
+from ..ssf.ssf import LazyStorySchemaFormat, StorySchemaFormat
 from .genre import Genre
 
+logger = logging.getLogger(__name__)
+
 
 class StoryBase(CommonBase, SQLModel):
     title: str = Field(description="The title of the story")
@@ -14,39 +21,115 @@ class StoryBase(CommonBase, SQLModel):
     summary: str = Field(description="The summary of the story", default="")
     version: int = Field(default=1, description="版本号")
     story_template_id: Optional[int] = Field(description="关联的故事模板 ID")
+    # 数据库中可能是压缩后的存储格式，见 ssf/codec.py
     ssf: Optional[str] = Field(default=None, description="SSF 格式的故事")
 
     @property
     def ssf_obj(self) -> Optional[StorySchemaFormat]:
-        if self.ssf:
-            try:
-                return StorySchemaFormat.from_json(self.ssf)
-            except ValueError as e:
-                # 处理无效 JSON 的情况，例如记录日志或返回 None
-                print(f"Error parsing SSF JSON: {e}")
-                return None
-        return None
+        """
+        完整解析的 ssf 列，解析结果按 (id, ssf) 缓存，返回的对象只能读取。
+        正文保存在 story_block 中，这里的 content_blocks.blocks 为空（尚未迁移的旧故事除外），
+        包含正文的完整文档请使用 get_story_ssf_async。
+        """
+        lazy = self.ssf_lazy
+        if lazy is None:
+            return None
+        try:
+            return lazy.full()
+        except ValueError as e:
+            logger.warning("Error parsing SSF JSON of story %s: %s", getattr(self, "id", None), e)
+            return None
 
     @ssf_obj.setter
     def ssf_obj(self, value: Optional[StorySchemaFormat]):
+        """只写入正文以外的部分；修改正文请使用 story_block_crud 中的函数，否则故事会重新变成正文在 ssf 中的旧格式"""
+        if value and value.content_blocks.blocks:
+            raise ValueError("Content blocks are stored in story_block, set ssf_obj without blocks")
+        if self.ssf:
+            ssf_parse_cache.discard(getattr(self, "id", None), self.ssf)
         if value:
-            self.ssf = value.to_json()
+            json_str = value.to_json()
+            self.ssf = encode_ssf(json_str)
+            ssf_parse_cache.prime(getattr(self, "id", None), self.ssf, value, len(json_str))
         else:
             self.ssf = None
 
+    @property
+    def ssf_lazy(self) -> Optional[LazyStorySchemaFormat]:
+        """只校验 metadata 的 SSF，访问 content_blocks 等部分时才解析其余内容"""
+        if self.ssf:
+            try:
+                return ssf_parse_cache.get(getattr(self, "id", None), self.ssf)
+            except ValueError as e:
+                # 无效 JSON、不是对象或 metadata 校验失败
+                logger.warning("Error parsing SSF JSON of story %s: %s", getattr(self, "id", None), e)
+                return None
+        return None
+
+
+def _plain_ssf(value: Optional[str]) -> Optional[str]:
+    # 请求中的 ssf 只接受明文 JSON，不在校验请求时解压客户端提交的数据
+    if value and value.startswith(HEADER_PREFIX):
+        raise ValueError("ssf must be SSF JSON")
+    return value
+
 class Story(StoryBase, table=True):
+    # 与列表分页的排序键 (update_time, id) 以及过滤条件对应的复合索引，只包含未删除的行
+    __table_args__ = (
+        alive_index("ix_story_alive_update_time_id", "is_deleted", "update_time", "id"),
+        alive_index("ix_story_alive_creator_update_time_id", "creator_user_id", "is_deleted", "update_time", "id"),
+        alive_index("ix_story_alive_genre_update_time_id", "genre", "is_deleted", "update_time", "id"),
+    )
+
     id: int = Field(primary_key=True, index=True)
 
+    @field_validator("ssf", mode="before")
+    @classmethod
+    def decode_stored_ssf(cls, value: Optional[str]) -> Optional[str]:
+        # 缓存反序列化时还原为明文 JSON；直接构造时不经过校验，保持存储格式
+        return decode_ssf(value)
+
 class StoryCreate(StoryBase):
-    pass
+    @field_validator("ssf", mode="before")
+    @classmethod
+    def check_plain_ssf(cls, value: Optional[str]) -> Optional[str]:
+        return _plain_ssf(value)
 
 class StoryRead(StoryBase):
     id: int
 
+    @field_validator("ssf", mode="before")
+    @classmethod
+    def decode_stored_ssf(cls, value: Optional[str]) -> Optional[str]:
+        # 接口输出时还原为明文 JSON
+        return decode_ssf(value)
+
+class StorySummary(SQLModel):
+    """列表使用的精简视图，不包含 ssf 正文"""
+    id: int
+    title: str
+    creator_user_id: int
+    author: str
+    genre: Genre
+    summary: str
+    version: int
+    create_time: datetime
+    update_time: datetime
+
 class StoryUpdate(CommonBase, SQLModel):
     title: Optional[str] = None
     author: Optional[str] = None
     genre: Optional[Genre] = None
     summary: Optional[str] = None
-    version: int = Field(default=1, description="版本号")
-    content_generation_ids: Optional[List[int]] = None
\ No newline at end of file
+    # 完整的 SSF JSON；其中带有 content_blocks.blocks 时正文替换为这些块，没有 blocks 时正文保持不变
+    ssf: Optional[str] = None
+    # version 由服务端维护，每次更新加一；并发控制请使用 If-Match 头
+    content_generation_ids: Optional[List[int]] = None
+
+    @field_validator("ssf", mode="before")
+    @classmethod
+    def check_plain_ssf(cls, value: Optional[str]) -> Optional[str]:
+        return _plain_ssf(value)
+
+class StoryBulkUpdate(StoryUpdate):
+    id: int
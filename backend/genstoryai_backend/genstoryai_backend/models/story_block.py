@@ -0,0 +1,36 @@
+from datetime import datetime
+from typing import List, Optional
+from sqlalchemy import Index
+from sqlmodel import SQLModel, Field
+
+
+class StoryBlock(SQLModel, table=True):
+    """
+    故事正文的内容块，对应 SSF 中 content_blocks.blocks 的一个元素。
+    (story_id, block_index) 唯一，block_index 从 0 开始连续编号；块随故事物理删除，不做软删除。
+    """
+    __tablename__ = "story_block"
+    __table_args__ = (
+        Index("uq_story_block_story_index", "story_id", "block_index", unique=True),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    story_id: int = Field(description="所属故事 ID")
+    block_index: int = Field(description="块在故事中的位置，从 0 开始")
+    content: str = Field(default="", description="块内容")
+    update_time: datetime = Field(
+        default_factory=datetime.utcnow,
+        description="更新时间",
+        sa_column_kwargs={"onupdate": datetime.utcnow},
+    )
+
+class StoryBlockRead(SQLModel):
+    block_index: int
+    content: str
+    update_time: datetime
+
+class StoryBlockWrite(SQLModel):
+    content: str = Field(default="", description="块内容")
+
+class StoryBlockReorder(SQLModel):
+    order: List[int] = Field(description="新的顺序，元素为原 block_index，必须覆盖全部块")
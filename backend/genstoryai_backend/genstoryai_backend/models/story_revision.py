@@ -0,0 +1,45 @@
+from datetime import datetime
+from typing import Any, List, Optional
+from sqlalchemy import Column, Index, Text
+from sqlmodel import SQLModel, Field
+
+
+class StoryRevision(SQLModel, table=True):
+    """
+    故事的历史版本。
+    snapshot 保存全部正文块；delta 只保存相对上一个版本的块级差异（见 ssf/delta.py）。
+    document 为不含正文的 SSF，与上一个版本相同时为空。
+    payload 与 document 都按 SSF_CODEC 压缩保存。
+    """
+    __tablename__ = "story_revision"
+    __table_args__ = (
+        Index("uq_story_revision_story_revision", "story_id", "revision", unique=True),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    story_id: int = Field(description="所属故事 ID")
+    revision: int = Field(description="版本序号，每个故事从 1 开始")
+    story_version: int = Field(description="创建时故事的 version")
+    kind: str = Field(description="snapshot 或 delta")
+    document: Optional[str] = Field(default=None, sa_column=Column(Text, nullable=True), description="不含正文的 SSF")
+    payload: str = Field(sa_column=Column(Text, nullable=False), description="snapshot 为块列表，delta 为差异操作")
+    block_count: int = Field(default=0, description="该版本的块数")
+    message: str = Field(default="", description="版本说明")
+    create_time: datetime = Field(default_factory=datetime.utcnow, description="创建时间")
+
+class StoryRevisionCreate(SQLModel):
+    message: str = Field(default="", description="版本说明")
+
+class StoryRevisionRead(SQLModel):
+    revision: int
+    story_version: int
+    kind: str
+    block_count: int
+    message: str
+    create_time: datetime
+
+class StoryRevisionDelta(SQLModel):
+    revision: int
+    base_revision: Optional[int] = Field(description="delta 的基准版本，snapshot 为空")
+    document_changed: bool
+    ops: List[Any] = Field(description="相对基准版本的块级差异，格式见 ssf/delta.py")
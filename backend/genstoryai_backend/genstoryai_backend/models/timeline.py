@@ -1,33 +1,57 @@
-from pydantic import BaseModel
-from typing import List
-from . import CommonBase
-from datetime import datetime
+from typing import List, Optional
+from pydantic import model_validator
+from sqlmodel import SQLModel, Field
+from . import CommonBase, UtcDatetime, alive_index
 
-class TimelineBase(CommonBase, BaseModel):
+
+class TimelineBase(CommonBase, SQLModel):
     name: str
-    start_time: datetime
-    end_time: datetime
-    description: str | None = None
+    start_time: UtcDatetime
+    end_time: UtcDatetime
+    description: Optional[str] = None
 
-class Timeline(TimelineBase):
-    id: int
-    events: List[int] = []
+    @model_validator(mode="after")
+    def _check_range(self):
+        if self.end_time < self.start_time:
+            raise ValueError("end_time must not be earlier than start_time")
+        return self
+
+class Timeline(TimelineBase, table=True):
+    """故事线，同一个故事可以有多条并行的故事线，事件通过 TimelineEvent 关联到故事线"""
+    __table_args__ = (
+        alive_index("ix_timeline_alive_story", "is_deleted", "story_id", "start_time"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    story_id: int = Field(description="所属故事 ID")
+
+class TimelineEvent(SQLModel, table=True):
+    """故事线与事件的多对多关联，story_id 冗余保存，便于按故事清理"""
+    __tablename__ = "timeline_event"
+
+    timeline_id: int = Field(primary_key=True)
+    event_id: int = Field(primary_key=True, index=True)
+    story_id: int = Field(index=True)
 
 class TimelineCreate(TimelineBase):
-    pass
+    story_id: int
 
 class TimelineRead(TimelineBase):
     id: int
+    story_id: int
 
-    class Config:
-        orm_mode = True
+class TimelineUpdate(CommonBase, SQLModel):
+    name: Optional[str] = None
+    start_time: Optional[UtcDatetime] = None
+    end_time: Optional[UtcDatetime] = None
+    description: Optional[str] = None
 
-class TimelineUpdate(CommonBase, BaseModel):
-    name: str | None = None
-    start_time: datetime | None = None
-    end_time: datetime | None = None
-    description: str | None = None
-    events: List[int] | None = None
+class TimelineSplit(SQLModel):
+    """在 at 处把故事线一分为二，at 及之后开始的事件移到新故事线"""
+    at: UtcDatetime
+    name: str
 
-    class Config:
-        orm_mode = True
\ No newline at end of file
+class TimelineMerge(SQLModel):
+    """把 source_ids 中的故事线合并到 target_id，合并后的时间范围覆盖所有故事线"""
+    target_id: int
+    source_ids: List[int] = Field(min_length=1)
@@ -1,13 +1,27 @@
+from sqlalchemy import Index
 from sqlmodel import SQLModel, Field
 from typing import Optional
 from sqlmodel import Field
 from datetime import datetime
+from . import CommonBase, alive_index
 
 class UserBase(SQLModel, table=False):
-    username: str = Field(default="")
-    email: str = Field(default="")
+    # 未填写时保存为 NULL，唯一索引不约束 NULL，多个用户可以都不填
+    username: Optional[str] = Field(default=None)
+    email: Optional[str] = Field(default=None)
+
+# 软删除的用户在用户名、邮箱后追加该标记与用户 ID，释放唯一索引，同一邮箱可以重新注册
+DELETED_MARK = "#deleted-"
+
+class User(UserBase, CommonBase, table=True):
+    # 登录、注册查重以及邮箱验证都按这些列查找
+    __table_args__ = (
+        Index("uq_user_email", "email", unique=True),
+        Index("uq_user_username", "username", unique=True),
+        Index("uq_user_verification_token", "verification_token", unique=True),
+        alive_index("ix_user_alive_id", "is_deleted", "id"),
+    )
 
-class User(UserBase, table=True):
     id: int = Field(default=None, primary_key=True)
     is_active: bool = Field(default=True)
     password: str = Field(default="")
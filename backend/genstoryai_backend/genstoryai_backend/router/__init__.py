@@ -1,3 +1,6 @@
 from genstoryai_backend.router.character_router import character_router
 from genstoryai_backend.router.story_router import story_router
-from genstoryai_backend.router.user_router import user_router
\ No newline at end of file
+from genstoryai_backend.router.user_router import user_router
+from genstoryai_backend.router.system_router import system_router
+from genstoryai_backend.router.search_router import search_router
+from genstoryai_backend.router.timeline_router import timeline_router
\ No newline at end of file
@@ -1,11 +1,23 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlmodel import Session
+from typing import List, Optional
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from genstoryai_backend.database.db import get_db
-from genstoryai_backend.models.character import CharacterCreate,CharacterRead,CharacterUpdate
-from genstoryai_backend.database.crud import create_character, get_character, get_characters, update_character, delete_character
-from genstoryai_backend.agent.character_agent import generate_character
+from genstoryai_backend.database.db import get_async_db
+from genstoryai_backend.models import BulkResult, Page
+from genstoryai_backend.models.character import (
+    CharacterCreate, CharacterRead, CharacterUpdate, CharacterBulkUpdate,
+    CharacterGenerateBatch, CharacterGenerateBatchResult, CharacterGenerateItem,
+)
+from genstoryai_backend.database.crud import (
+    create_character_async, get_character_async, get_characters_async,
+    update_character_async, delete_character_async,
+    create_characters_async, update_characters_async, delete_characters_async,
+)
+from genstoryai_backend.agent.character_agent import generate_character, generate_characters, stream_character
+from genstoryai_backend.config import settings
+from genstoryai_backend.utils.http_cache import is_not_modified, timestamp_etag, validator_headers
+from genstoryai_backend.utils.sse import SSE_HEADERS, SSE_MEDIA_TYPE, sse_stream
 
 character_router = APIRouter(
     prefix="/character",
@@ -14,41 +26,98 @@ character_router = APIRouter(
 )
 
 @character_router.post("/generate/",response_model=CharacterCreate)
-async def generate_character_endpoint(user_prompt: str = Query(None)):
-    """generate character by user_prompt"""
-    return await generate_character(user_prompt)
+async def generate_character_endpoint(user_prompt: str = Query(None), use_cache: bool = True):
+    """generate character by user_prompt, pass use_cache=false to bypass the generation cache"""
+    return await generate_character(user_prompt, use_cache=use_cache)
+
+@character_router.api_route("/generate/stream", methods=["GET", "POST"])
+async def stream_character_endpoint(request: Request, user_prompt: str = Query(..., min_length=1), use_cache: bool = True):
+    """
+    generate character by user_prompt and stream it as Server-Sent Events:
+    "partial" events carry the fields generated so far, a final "result" event carries the validated character,
+    an "error" event is sent if generation fails. GET is supported for EventSource clients.
+    """
+    return StreamingResponse(
+        sse_stream(request, stream_character(user_prompt, use_cache=use_cache), heartbeat=settings.SSE_HEARTBEAT_SECONDS),
+        media_type=SSE_MEDIA_TYPE,
+        headers=SSE_HEADERS,
+    )
+
+@character_router.post("/generate/batch", response_model=CharacterGenerateBatchResult)
+async def generate_characters_endpoint(batch: CharacterGenerateBatch, db: AsyncSession = Depends(get_async_db)):
+    """
+    generate characters for every prompt (or count characters for one prompt) concurrently,
+    failed prompts are reported per item; with persist=true the generated characters are created in one transaction
+    """
+    prompts = batch.expand()
+    outputs = await generate_characters(prompts, use_cache=batch.use_cache)
+    items = [
+        CharacterGenerateItem(index=index, ok=False, error=str(output) or type(output).__name__)
+        if isinstance(output, BaseException) else CharacterGenerateItem(index=index, ok=True, character=output)
+        for index, output in enumerate(outputs)
+    ]
+    generated = [item for item in items if item.ok]
+    if batch.persist and generated:
+        created = await create_characters_async(db, [item.character for item in generated])
+        for result in created:
+            item = generated[result.index]
+            item.ok, item.id, item.error = result.ok, result.id, result.error
+    succeeded = sum(1 for item in items if item.ok)
+    return CharacterGenerateBatchResult(succeeded=succeeded, failed=len(items) - succeeded, results=items)
 
 @character_router.post("/create/",response_model=CharacterCreate)
-async def create_character_endpoint(character: CharacterCreate, db: Session = Depends(get_db)):
+async def create_character_endpoint(character: CharacterCreate, db: AsyncSession = Depends(get_async_db)):
     """create character by character"""
-    return create_character(db, character)
+    return await create_character_async(db, character)
+
+@character_router.post("/bulk", response_model=BulkResult)
+async def create_characters_endpoint(characters: List[CharacterCreate], db: AsyncSession = Depends(get_async_db)):
+    """create characters in one transaction"""
+    return BulkResult.from_results(await create_characters_async(db, characters))
+
+@character_router.patch("/bulk", response_model=BulkResult)
+async def update_characters_endpoint(characters: List[CharacterBulkUpdate], db: AsyncSession = Depends(get_async_db)):
+    """update characters by id in one transaction"""
+    return BulkResult.from_results(await update_characters_async(db, characters))
+
+@character_router.delete("/bulk", response_model=BulkResult)
+async def delete_characters_endpoint(character_ids: List[int] = Body(...), db: AsyncSession = Depends(get_async_db)):
+    """delete characters by ids in one transaction"""
+    return BulkResult.from_results(await delete_characters_async(db, character_ids))
 
 @character_router.get("/{character_id}", response_model=CharacterRead)
-async def read_character_endpoint(character_id: int, db: Session = Depends(get_db)):
-    """get character by id"""
-    db_character = get_character(db, character_id=character_id)
+async def read_character_endpoint(character_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_async_db)):
+    """get character by id, answers 304 to a matching If-None-Match / If-Modified-Since"""
+    db_character = await get_character_async(db, character_id=character_id)
     if db_character is None:
         raise HTTPException(status_code=404, detail="Character not found")
+    headers = validator_headers(timestamp_etag(db_character.id, db_character.update_time), db_character.update_time)
+    if is_not_modified(request, headers["ETag"], db_character.update_time):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
     return db_character
     
-@character_router.get("/", response_model=List[CharacterRead])
-async def read_characters_endpoint(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    """get characters by skip and limit"""
-    characters = get_characters(db, skip=skip, limit=limit)
-    return characters
+@character_router.get("/", response_model=Page[CharacterRead])
+async def read_characters_endpoint(
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """get characters page by page, pass next_cursor of the previous page as cursor"""
+    characters, next_cursor = await get_characters_async(db, limit=limit, cursor=cursor)
+    return {"items": characters, "next_cursor": next_cursor}
 
 @character_router.put("/{character_id}", response_model=CharacterRead)
-async def update_character_endpoint(character_id: int, character: CharacterUpdate, db: Session = Depends(get_db)):
+async def update_character_endpoint(character_id: int, character: CharacterUpdate, db: AsyncSession = Depends(get_async_db)):
     """update character by character_id and character"""
-    db_character = update_character(db, character_id=character_id, character=character)
+    db_character = await update_character_async(db, character_id=character_id, character=character)
     if db_character is None:
         raise HTTPException(status_code=404, detail="Character not found")
     return db_character
 
 @character_router.delete("/{character_id}")
-async def delete_character_endpoint(character_id: int, db: Session = Depends(get_db)):
+async def delete_character_endpoint(character_id: int, db: AsyncSession = Depends(get_async_db)):
     """delete character by character_id"""
-    if delete_character(db, character_id=character_id) is None:
-        raise HTTPException(status_code=404, detail="Character not found")
+    await delete_character_async(db, character_id=character_id)
     return {"message": "Character deleted"}
 
@@ -0,0 +1,26 @@
+from typing import List, Literal, Optional
+from fastapi import APIRouter, Depends, Query
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from genstoryai_backend.database.db import get_async_db
+from genstoryai_backend.database.search import SearchHit, search_async
+from genstoryai_backend.models.genre import Genre
+
+search_router = APIRouter(
+    prefix="/search",
+    tags=["search/搜索"],
+    responses={404: {"description": "Not found"}},
+)
+
+
+@search_router.get("/", response_model=List[SearchHit])
+async def search_endpoint(
+    q: str = Query(..., min_length=1, max_length=200),
+    kind: Optional[List[Literal["story", "character", "block"]]] = Query(None),
+    genre: Optional[Genre] = None,
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0, le=1000),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """全文检索故事标题/简介、角色和正文块，多个词用空格分隔，按相关度排序"""
+    return await search_async(db, q, kinds=kind, genre=genre, limit=limit, offset=offset)
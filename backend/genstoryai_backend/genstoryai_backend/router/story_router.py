@@ -1,10 +1,37 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session
-from typing import List
+from fastapi import APIRouter, Body, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import List, Literal, Optional
 
-from ..database.db import get_db
-from ..models.story import Story, StoryCreate, StoryRead, StoryUpdate
-from ..database.crud import create_story, get_story, get_stories, update_story, delete_story
+from ..config import settings
+from ..database.db import async_session_maker, begin_read_snapshot, get_async_db
+from ..ssf.container import MEDIA_TYPE as CONTAINER_MEDIA_TYPE
+from ..ssf.stream import NDJSON_MEDIA_TYPE, buffered, iter_container, iter_json, iter_lines, iter_ndjson
+from ..utils.http_cache import if_match_versions, is_not_modified, validator_headers, version_etag
+from ..models import BulkResult, Page
+from ..models.genre import Genre
+from ..models.story import Story, StoryCreate, StoryRead, StorySummary, StoryUpdate, StoryBulkUpdate
+from ..models.story_block import StoryBlockRead, StoryBlockReorder, StoryBlockWrite
+from ..models.story_revision import StoryRevisionCreate, StoryRevisionDelta, StoryRevisionRead
+from ..models.character_relationship import (
+    CharacterRelationshipCreate, CharacterRelationshipRead, CharacterRelationshipUpdate,
+    GraphComponent, GraphExport, GraphNeighborhood, GraphPath,
+)
+from ..database.crud import (
+    create_story_async, get_story_async, get_stories_async, get_story_ssf_async,
+    update_story_async, delete_story_async,
+    create_stories_async, update_stories_async, delete_stories_async,
+    get_blocks_async, get_block_async, insert_block_async, update_block_async,
+    delete_block_async, reorder_blocks_async,
+    ensure_story_blocks_async, get_export_header_async, iter_block_contents_async, import_story_async,
+    create_revision_async, get_revisions_async, get_revision_ssf_async, get_revision_delta_async,
+    restore_revision_async,
+    create_relationship_async, get_relationships_async, update_relationship_async, delete_relationship_async,
+    get_relationship_graph_async,
+)
+
+# 单次区间读取的最大块数
+MAX_BLOCK_RANGE = 1000
 
 
 story_router = APIRouter(
@@ -13,28 +40,280 @@ story_router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
-@story_router.post("/stories/", response_model=StoryCreate)
-def create_story_endpoint(story: StoryCreate, db: Session = Depends(get_db)):
+@story_router.post("/stories/", response_model=StoryRead)
+async def create_story_endpoint(story: StoryCreate, db: AsyncSession = Depends(get_async_db)):
     """创建新故事"""
-    return create_story(db, story)
+    return await create_story_async(db, story)
+
+@story_router.post("/stories/bulk", response_model=BulkResult)
+async def create_stories_endpoint(stories: List[StoryCreate], db: AsyncSession = Depends(get_async_db)):
+    """批量创建故事，单个事务写入"""
+    return BulkResult.from_results(await create_stories_async(db, stories))
 
-@story_router.get("/stories/", response_model=List[StoryRead])
-def get_stories_endpoint(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    """获取故事列表"""
-    return get_stories(db, skip=skip, limit=limit)
+@story_router.patch("/stories/bulk", response_model=BulkResult)
+async def update_stories_endpoint(stories: List[StoryBulkUpdate], db: AsyncSession = Depends(get_async_db)):
+    """按 id 批量更新故事，单个事务写入"""
+    return BulkResult.from_results(await update_stories_async(db, stories))
+
+@story_router.delete("/stories/bulk", response_model=BulkResult)
+async def delete_stories_endpoint(story_ids: List[int] = Body(...), db: AsyncSession = Depends(get_async_db)):
+    """按 id 批量删除故事"""
+    return BulkResult.from_results(await delete_stories_async(db, story_ids))
+
+@story_router.post("/stories/import", response_model=StoryRead)
+async def import_story_endpoint(request: Request, db: AsyncSession = Depends(get_async_db)):
+    """流式导入 NDJSON 格式的故事（格式见 ssf/stream.py），请求体逐行解析，不会整体读入内存"""
+    lines = iter_lines(request.stream(), settings.SSF_IMPORT_MAX_LINE_BYTES)
+    return await import_story_async(db, lines)
+
+@story_router.get("/stories/", response_model=Page[StorySummary])
+async def get_stories_endpoint(
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500),
+    creator_user_id: Optional[int] = None,
+    genre: Optional[Genre] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """获取故事列表（不含 ssf 正文），按更新时间倒序，使用上一页返回的 next_cursor 翻页"""
+    stories, next_cursor = await get_stories_async(
+        db, limit=limit, cursor=cursor, creator_user_id=creator_user_id, genre=genre
+    )
+    return {"items": stories, "next_cursor": next_cursor}
 
 @story_router.get("/stories/{story_id}", response_model=StoryRead)
-def get_story_endpoint(story_id: int, db: Session = Depends(get_db)):
-    """获取单个故事详情"""
-    return get_story(db, story_id)
+async def get_story_endpoint(story_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_async_db)):
+    """
+    获取单个故事详情，支持 If-None-Match / If-Modified-Since 条件请求。
+    正文保存在 story_block 中，返回的 ssf 中 content_blocks.blocks 为空；
+    完整文档请使用 /ssf 或 /export，正文请使用 /blocks
+    """
+    story = await get_story_async(db, story_id)
+    headers = validator_headers(version_etag(story.id, story.version), story.update_time)
+    if is_not_modified(request, headers["ETag"], story.update_time):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return story
+
+@story_router.get("/stories/{story_id}/ssf")
+async def get_story_ssf_endpoint(story_id: int, db: AsyncSession = Depends(get_async_db)):
+    """导出完整的 SSF（包含 story_block 中的正文）"""
+    ssf = await get_story_ssf_async(db, story_id)
+    if ssf is None:
+        raise HTTPException(status_code=404, detail="SSF not found")
+    return Response(content=ssf, media_type="application/json")
+
+@story_router.get("/stories/{story_id}/export")
+async def export_story_endpoint(
+    story_id: int,
+    format: Literal["ndjson", "json", "ssfb"] = Query("ndjson"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """流式导出故事，正文块分批从数据库读出后立即写出；ssfb 为可随机读取的二进制容器"""
+    # 在开始发送响应之前确认故事存在，旧故事的正文先迁移到 story_block
+    await ensure_story_blocks_async(db, story_id)
+    media_type = {"ndjson": NDJSON_MEDIA_TYPE, "json": "application/json", "ssfb": CONTAINER_MEDIA_TYPE}[format]
+    return StreamingResponse(
+        buffered(_export_chunks(story_id, format)),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="story-{story_id}.{format}"'},
+    )
+
+async def _export_chunks(story_id: int, format: str):
+    # 响应开始发送后请求的 session 可能已经关闭，这里使用独立的 session。
+    # header 与所有批次在同一个显式的读事务中，导出期间其他请求插入、重排块不会导致重复或遗漏
+    async with async_session_maker() as db:
+        await begin_read_snapshot(db)
+        header = await get_export_header_async(db, story_id)
+        blocks = iter_block_contents_async(db, story_id)
+        if format == "ndjson":
+            chunks = iter_ndjson(header, blocks)
+        elif format == "json":
+            chunks = iter_json(header["ssf"], blocks)
+        else:
+            chunks = iter_container(header["ssf"], blocks)
+        async for chunk in chunks:
+            yield chunk
+
+@story_router.get("/stories/{story_id}/blocks", response_model=List[StoryBlockRead])
+async def get_blocks_endpoint(
+    story_id: int,
+    start: int = Query(0, ge=0),
+    end: Optional[int] = Query(None, ge=0),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """按区间 [start, end) 读取正文块，end 为空时读取 start 之后的 MAX_BLOCK_RANGE 个块"""
+    end = start + MAX_BLOCK_RANGE if end is None else end
+    if end - start > MAX_BLOCK_RANGE:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BLOCK_RANGE} blocks per request")
+    return await get_blocks_async(db, story_id, start, end)
+
+@story_router.post("/stories/{story_id}/blocks", response_model=StoryBlockRead)
+async def insert_block_endpoint(
+    story_id: int,
+    block: StoryBlockWrite,
+    index: Optional[int] = Query(None, ge=0),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """在 index 处插入正文块，index 为空时追加到末尾"""
+    return await insert_block_async(db, story_id, block.content, index)
+
+@story_router.post("/stories/{story_id}/blocks/reorder", response_model=List[StoryBlockRead])
+async def reorder_blocks_endpoint(story_id: int, reorder: StoryBlockReorder, db: AsyncSession = Depends(get_async_db)):
+    """重排正文块"""
+    return await reorder_blocks_async(db, story_id, reorder.order)
+
+@story_router.get("/stories/{story_id}/blocks/{block_index}", response_model=StoryBlockRead)
+async def get_block_endpoint(story_id: int, block_index: int, db: AsyncSession = Depends(get_async_db)):
+    """读取单个正文块"""
+    return await get_block_async(db, story_id, block_index)
+
+@story_router.put("/stories/{story_id}/blocks/{block_index}", response_model=StoryBlockRead)
+async def update_block_endpoint(story_id: int, block_index: int, block: StoryBlockWrite, db: AsyncSession = Depends(get_async_db)):
+    """修改单个正文块，只写这一行"""
+    return await update_block_async(db, story_id, block_index, block.content)
+
+@story_router.delete("/stories/{story_id}/blocks/{block_index}")
+async def delete_block_endpoint(story_id: int, block_index: int, db: AsyncSession = Depends(get_async_db)):
+    """删除正文块，其后的块前移"""
+    await delete_block_async(db, story_id, block_index)
+    return {"message": "Block deleted successfully"}
+
+@story_router.post("/stories/{story_id}/revisions", response_model=StoryRevisionRead)
+async def create_revision_endpoint(story_id: int, revision: StoryRevisionCreate, db: AsyncSession = Depends(get_async_db)):
+    """
+    把故事当前状态保存为带说明的历史版本；每次修改故事都会自动记录版本，
+    内容没有变化时返回最新版本（没有说明时补上 message）
+    """
+    return await create_revision_async(db, story_id, revision.message)
+
+@story_router.get("/stories/{story_id}/revisions", response_model=List[StoryRevisionRead])
+async def get_revisions_endpoint(
+    story_id: int,
+    before: Optional[int] = None,
+    limit: int = Query(50, ge=1, le=500),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """按版本号倒序列出历史版本，翻页时传入上一页最后一个版本号作为 before"""
+    return await get_revisions_async(db, story_id, limit=limit, before=before)
+
+@story_router.get("/stories/{story_id}/revisions/{revision}")
+async def get_revision_endpoint(story_id: int, revision: int, db: AsyncSession = Depends(get_async_db)):
+    """还原指定版本的完整 SSF"""
+    return Response(content=await get_revision_ssf_async(db, story_id, revision), media_type="application/json")
+
+@story_router.get("/stories/{story_id}/revisions/{revision}/delta", response_model=StoryRevisionDelta)
+async def get_revision_delta_endpoint(story_id: int, revision: int, db: AsyncSession = Depends(get_async_db)):
+    """指定版本相对上一个版本的块级差异"""
+    return await get_revision_delta_async(db, story_id, revision)
+
+@story_router.post("/stories/{story_id}/revisions/{revision}/restore", response_model=StoryRevisionRead)
+async def restore_revision_endpoint(story_id: int, revision: int, db: AsyncSession = Depends(get_async_db)):
+    """恢复到指定版本，恢复后的状态记录为新版本"""
+    return await restore_revision_async(db, story_id, revision)
+
+@story_router.post("/stories/{story_id}/relationships", response_model=CharacterRelationshipRead)
+async def create_relationship_endpoint(
+    story_id: int, relationship: CharacterRelationshipCreate, db: AsyncSession = Depends(get_async_db),
+):
+    """添加两个角色之间的关系，同一对角色的同类关系只能有一条"""
+    return await create_relationship_async(db, story_id, relationship)
+
+@story_router.get("/stories/{story_id}/relationships", response_model=Page[CharacterRelationshipRead])
+async def get_relationships_endpoint(
+    story_id: int,
+    character_id: Optional[int] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """分页列出故事中的关系，传入 character_id 时只列出与该角色相连的关系"""
+    relationships, next_cursor = await get_relationships_async(
+        db, story_id, character_id=character_id, limit=limit, cursor=cursor,
+    )
+    return {"items": relationships, "next_cursor": next_cursor}
+
+@story_router.put("/stories/{story_id}/relationships/{relationship_id}", response_model=CharacterRelationshipRead)
+async def update_relationship_endpoint(
+    story_id: int, relationship_id: int, relationship: CharacterRelationshipUpdate,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """修改关系类型、强度或说明"""
+    return await update_relationship_async(db, story_id, relationship_id, relationship)
+
+@story_router.delete("/stories/{story_id}/relationships/{relationship_id}")
+async def delete_relationship_endpoint(story_id: int, relationship_id: int, db: AsyncSession = Depends(get_async_db)):
+    """删除关系"""
+    await delete_relationship_async(db, story_id, relationship_id)
+    return {"message": "Relationship deleted successfully"}
+
+@story_router.get("/stories/{story_id}/graph", response_model=GraphExport)
+async def get_graph_endpoint(story_id: int, db: AsyncSession = Depends(get_async_db)):
+    """导出故事的完整人物关系图谱（紧凑格式）"""
+    graph = await get_relationship_graph_async(db, story_id)
+    return graph.export()
+
+@story_router.get("/stories/{story_id}/graph/neighbors/{character_id}", response_model=GraphNeighborhood)
+async def get_graph_neighbors_endpoint(
+    story_id: int,
+    character_id: int,
+    depth: int = Query(1, ge=1, le=settings.RELATIONSHIP_GRAPH_MAX_DEPTH),
+    relation_type: Optional[List[str]] = Query(None),
+    limit: int = Query(settings.RELATIONSHIP_GRAPH_MAX_NODES, ge=1, le=settings.RELATIONSHIP_GRAPH_MAX_NODES),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """角色 depth 跳以内的关系子图，可以按关系类型过滤"""
+    graph = await get_relationship_graph_async(db, story_id)
+    nodes, distances, edges = graph.neighborhood(character_id, depth, relation_types=relation_type, max_nodes=limit)
+    if not nodes:
+        raise HTTPException(status_code=404, detail="Character has no relationships in this story")
+    return GraphNeighborhood(center=character_id, distances=distances, graph=graph.export(nodes, edges))
+
+@story_router.get("/stories/{story_id}/graph/path", response_model=GraphPath)
+async def get_graph_path_endpoint(
+    story_id: int,
+    source_id: int,
+    target_id: int,
+    relation_type: Optional[List[str]] = Query(None),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """两个角色之间跳数最少的关系路径，不连通时返回空路径"""
+    graph = await get_relationship_graph_async(db, story_id)
+    nodes, relationships = graph.shortest_path(source_id, target_id, relation_types=relation_type)
+    return GraphPath(nodes=nodes, relationships=relationships)
+
+@story_router.get("/stories/{story_id}/graph/components", response_model=List[GraphComponent])
+async def get_graph_components_endpoint(
+    story_id: int,
+    character_id: Optional[int] = None,
+    limit: int = Query(100, ge=1, le=10000),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """连通分量按大小降序；传入 character_id 时只返回该角色所在的分量"""
+    graph = await get_relationship_graph_async(db, story_id)
+    if character_id is not None:
+        component = graph.component_of(character_id)
+        if component is None:
+            raise HTTPException(status_code=404, detail="Character has no relationships in this story")
+        components = [component]
+    else:
+        components = graph.components()[:limit]
+    return [GraphComponent(size=len(nodes), nodes=[graph.ids[node] for node in nodes]) for nodes in components]
 
 @story_router.put("/stories/{story_id}", response_model=StoryRead)
-def update_story_endpoint(story_id: int, story: StoryUpdate, db: Session = Depends(get_db)):
-    """更新故事信息"""
-    return update_story(db, story_id, story)
+async def update_story_endpoint(
+    story_id: int,
+    story: StoryUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """更新故事信息，带 If-Match 时只有版本一致才会写入，否则返回 412"""
+    db_story = await update_story_async(db, story_id, story, expected_versions=if_match_versions(if_match, story_id))
+    response.headers.update(validator_headers(version_etag(db_story.id, db_story.version), db_story.update_time))
+    return db_story
 
 @story_router.delete("/stories/{story_id}")
-def delete_story_endpoint(story_id: int, db: Session = Depends(get_db)):
+async def delete_story_endpoint(story_id: int, db: AsyncSession = Depends(get_async_db)):
     """删除故事"""
-    delete_story(db, story_id)
+    await delete_story_async(db, story_id)
     return {"message": "Story deleted successfully"}
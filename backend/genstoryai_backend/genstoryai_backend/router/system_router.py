@@ -0,0 +1,54 @@
+import subprocess
+
+from fastapi import APIRouter, HTTPException, Query, status
+
+from ..agent.generation_cache import generation_cache
+from ..config import settings
+from ..database.db import get_pool_status
+from ..database.entity_cache import get_entity_cache_stats
+from ..database.relationship_graph import relationship_graph_cache
+from ..database.timeline_index import timeline_index_cache
+from ..ssf.parse_cache import ssf_parse_cache
+from ..utils.startup import get_startup_report, importtime_report
+
+
+system_router = APIRouter(
+    prefix="/system",
+    tags=["system/系统"],
+    responses={404: {"description": "Not found"}},
+)
+
+
+@system_router.get("/startup")
+def startup_report_endpoint(importtime: bool = False, top: int = Query(20, ge=1, le=200)) -> dict:
+    """
+    启动耗时报告，importtime=true 时额外返回模块导入耗时（会启动子进程，较慢），
+    需要设置 STARTUP_IMPORTTIME_ENABLED=true
+    """
+    report = get_startup_report()
+    if importtime:
+        if not settings.STARTUP_IMPORTTIME_ENABLED:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="importtime report is disabled")
+        try:
+            report["imports"] = importtime_report(top=top, timeout=settings.STARTUP_IMPORTTIME_TIMEOUT_SECONDS)
+        except subprocess.TimeoutExpired:
+            raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail="importtime report timed out")
+    return report
+
+
+@system_router.get("/db-pool")
+def db_pool_endpoint() -> dict:
+    """数据库连接池统计"""
+    return get_pool_status()
+
+
+@system_router.get("/cache")
+def cache_stats_endpoint() -> dict:
+    """各缓存的命中率统计：故事/角色读缓存、SSF 解析、人物关系图、时间线索引、生成结果"""
+    return {
+        **get_entity_cache_stats(),
+        "ssf_parse": ssf_parse_cache.stats(),
+        "relationship_graph": relationship_graph_cache.stats(),
+        "timeline_index": timeline_index_cache.stats(),
+        "generation": generation_cache.stats(),
+    }
@@ -0,0 +1,92 @@
+from typing import List, Optional
+from fastapi import APIRouter, Depends, Query
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from ..database.db import get_async_db
+from ..models import Page, UtcDatetime
+from ..models.event import EventCreate, EventRead, EventUpdate
+from ..models.timeline import TimelineCreate, TimelineMerge, TimelineRead, TimelineSplit, TimelineUpdate
+from ..database.crud import (
+    create_timeline_async, get_timelines_async, get_timeline_async, update_timeline_async, delete_timeline_async,
+    split_timeline_async, merge_timelines_async,
+    create_event_async, get_event_async, update_event_async, delete_event_async, query_events_async,
+)
+
+timeline_router = APIRouter(
+    prefix="/timeline",
+    tags=["timeline/时间线"],
+    responses={404: {"description": "Not found"}},
+)
+
+@timeline_router.post("/timelines/", response_model=TimelineRead)
+async def create_timeline_endpoint(timeline: TimelineCreate, db: AsyncSession = Depends(get_async_db)):
+    """创建故事线"""
+    return await create_timeline_async(db, timeline)
+
+@timeline_router.get("/timelines/", response_model=List[TimelineRead])
+async def get_timelines_endpoint(story_id: int, db: AsyncSession = Depends(get_async_db)):
+    """故事的全部故事线，按开始时间排序"""
+    return await get_timelines_async(db, story_id)
+
+@timeline_router.post("/timelines/merge", response_model=TimelineRead)
+async def merge_timelines_endpoint(merge: TimelineMerge, db: AsyncSession = Depends(get_async_db)):
+    """合并故事线：source_ids 的事件并入 target_id，原故事线被删除"""
+    return await merge_timelines_async(db, merge)
+
+@timeline_router.get("/timelines/{timeline_id}", response_model=TimelineRead)
+async def get_timeline_endpoint(timeline_id: int, db: AsyncSession = Depends(get_async_db)):
+    """根据 ID 获取故事线"""
+    return await get_timeline_async(db, timeline_id)
+
+@timeline_router.put("/timelines/{timeline_id}", response_model=TimelineRead)
+async def update_timeline_endpoint(timeline_id: int, timeline: TimelineUpdate, db: AsyncSession = Depends(get_async_db)):
+    """更新故事线"""
+    return await update_timeline_async(db, timeline_id, timeline)
+
+@timeline_router.delete("/timelines/{timeline_id}")
+async def delete_timeline_endpoint(timeline_id: int, db: AsyncSession = Depends(get_async_db)):
+    """删除故事线，事件本身保留"""
+    await delete_timeline_async(db, timeline_id)
+    return {"message": "Timeline deleted successfully"}
+
+@timeline_router.post("/timelines/{timeline_id}/split", response_model=List[TimelineRead])
+async def split_timeline_endpoint(timeline_id: int, split: TimelineSplit, db: AsyncSession = Depends(get_async_db)):
+    """在 at 处拆分故事线，返回 [原故事线, 新故事线]"""
+    return list(await split_timeline_async(db, timeline_id, split))
+
+@timeline_router.post("/events/", response_model=EventRead)
+async def create_event_endpoint(event: EventCreate, db: AsyncSession = Depends(get_async_db)):
+    """创建事件，timeline_ids 为所属的故事线"""
+    return await create_event_async(db, event)
+
+@timeline_router.get("/events/", response_model=Page[EventRead])
+async def query_events_endpoint(
+    story_id: int,
+    start: Optional[UtcDatetime] = None,
+    end: Optional[UtcDatetime] = None,
+    timeline_id: Optional[List[int]] = Query(None),
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """与 [start, end] 重叠的事件，按开始时间排序；传入多个 timeline_id 时返回属于其中任一故事线的事件"""
+    events, next_cursor = await query_events_async(
+        db, story_id, start=start, end=end, timeline_ids=timeline_id, limit=limit, cursor=cursor,
+    )
+    return {"items": events, "next_cursor": next_cursor}
+
+@timeline_router.get("/events/{event_id}", response_model=EventRead)
+async def get_event_endpoint(event_id: int, db: AsyncSession = Depends(get_async_db)):
+    """根据 ID 获取事件"""
+    return await get_event_async(db, event_id)
+
+@timeline_router.put("/events/{event_id}", response_model=EventRead)
+async def update_event_endpoint(event_id: int, event: EventUpdate, db: AsyncSession = Depends(get_async_db)):
+    """更新事件，传入 timeline_ids 时替换所属的故事线"""
+    return await update_event_async(db, event_id, event)
+
+@timeline_router.delete("/events/{event_id}")
+async def delete_event_endpoint(event_id: int, db: AsyncSession = Depends(get_async_db)):
+    """删除事件"""
+    await delete_event_async(db, event_id)
+    return {"message": "Event deleted successfully"}
@@ -1,6 +1,7 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from sqlmodel import Session, Field
+from fastapi.concurrency import run_in_threadpool
+from sqlmodel.ext.asyncio.session import AsyncSession
 from pydantic import BaseModel
 from typing import Optional
 from datetime import datetime, timedelta
@@ -11,15 +12,16 @@ from email.mime.multipart import MIMEMultipart
 import logging
 from sqlalchemy import select
 
+from ..models import Page
 from ..models.user import UserCreate, UserRead, UserLogin, UserUpdate
-from ..database.db import get_db
+from ..database.db import get_async_db
 from ..database.crud import (
-    create_user, get_user_by_email, login_user,
-    get_users, update_user, delete_user, verify_user_email
+    create_user_async, get_user_by_email_async, login_user_async,
+    get_users_async, update_user_async, delete_user_async, verify_user_email_async,
+    set_user_verification_token_async,
 )
 from ..config import settings
 from ..utils.email_templates import get_verification_email_content
-from ..database.crud import set_user_verification_token
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
@@ -80,7 +82,7 @@ def send_verification_email(email: str, token: str, username: str, language: str
 
 
 @user_router.post("/register", response_model=UserRead)
-def register_endpoint(user: UserCreate, db: Session = Depends(get_db)) -> UserRead:
+async def register_endpoint(user: UserCreate, db: AsyncSession = Depends(get_async_db)) -> UserRead:
     """
     用户注册接口。
     - 创建新用户并发送邮箱验证邮件。
@@ -90,19 +92,21 @@ def register_endpoint(user: UserCreate, db: Session = Depends(get_db)) -> UserRe
         import secrets
         verification_token = secrets.token_urlsafe(32)
         token_created_at = datetime.utcnow()
-        # create_user 需支持 token/token_created_at 参数
-        db_user = create_user(db, user, verification_token=verification_token, token_created_at=token_created_at)
+        # create_user_async 需支持 token/token_created_at 参数
+        db_user = await create_user_async(db, user, verification_token=verification_token, token_created_at=token_created_at)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"[REGISTER_FAIL] DB error: {str(e)}")
         raise HTTPException(status_code=500, detail="注册失败，请稍后重试")
     if db_user.verification_token is None:
-        db.delete(db_user)
-        db.commit()
+        await db.delete(db_user)
+        await db.commit()
         logger.error(f"[REGISTER_FAIL] Token creation failed for {user.email}")
         raise HTTPException(status_code=500, detail="注册失败，请稍后重试")
-    if not send_verification_email(user.email, str(db_user.verification_token), user.username, language='zh'):
-        db.delete(db_user)
-        db.commit()
+    if not await run_in_threadpool(send_verification_email, user.email, str(db_user.verification_token), user.username, language='zh'):
+        await db.delete(db_user)
+        await db.commit()
         logger.error(f"[REGISTER_FAIL] Send mail failed for {user.email}")
         raise HTTPException(status_code=500, detail="注册失败，请稍后重试")
     logger.info(f"[REGISTER] User registered: {user.email}")
@@ -110,12 +114,12 @@ def register_endpoint(user: UserCreate, db: Session = Depends(get_db)) -> UserRe
 
 
 @user_router.post("/token", response_model=dict)
-def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
     """用户登录"""
     print(f"[ROUTER_DEBUG] 收到登录请求: {form_data.username}")
     logger.info(f"[LOGIN_ATTEMPT] Username: {form_data.username}")
     try:
-        user = login_user(db, form_data.username, form_data.password)
+        user = await login_user_async(db, form_data.username, form_data.password)
     except HTTPException as e:
         print(f"[ROUTER_DEBUG] 登录失败: {str(e.detail)}")
         logger.warning(f"[LOGIN_FAIL] {str(e.detail)} for: {form_data.username}")
@@ -131,13 +135,13 @@ def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db:
 
 
 @user_router.post("/logout")
-def logout():
+async def logout():
     """用户登出"""
     return {"message": "Logout successful"}
 
 
 @user_router.get("/users/me/", response_model=UserRead)
-def read_users_me(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def read_users_me(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
     """获取当前用户信息"""
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
@@ -147,7 +151,7 @@ def read_users_me(token: str = Depends(oauth2_scheme), db: Session = Depends(get
         token_data = {"email": email}
     except jwt.InvalidTokenError:
         raise credentials_exception
-    user = get_user_by_email(db, email=token_data["email"])
+    user = await get_user_by_email_async(db, email=token_data["email"])
     if user is None:
         raise credentials_exception
     return user
@@ -161,7 +165,7 @@ credentials_exception = HTTPException(
 
 
 @user_router.get("/verify-email")
-def verify_email_endpoint(token: str, db: Session = Depends(get_db)) -> dict:
+async def verify_email_endpoint(token: str, db: AsyncSession = Depends(get_async_db)) -> dict:
     """
     邮箱验证接口。
     - 根据邮箱验证令牌激活用户。
@@ -170,7 +174,7 @@ def verify_email_endpoint(token: str, db: Session = Depends(get_db)) -> dict:
     """
     logger.info(f"[VERIFY_EMAIL] Token: {token}")
     try:
-        user = verify_user_email(db, token, expire_hours=24)
+        user = await verify_user_email_async(db, token, expire_hours=24)
     except HTTPException as e:
         logger.error(f"[VERIFY_EMAIL_FAIL] {str(e.detail)}")
         raise
@@ -182,42 +186,47 @@ class ResendVerificationRequest(BaseModel):
     email: str
 
 @user_router.post("/resend-verification")
-def resend_verification_endpoint(request: ResendVerificationRequest, db: Session = Depends(get_db)) -> dict:
+async def resend_verification_endpoint(request: ResendVerificationRequest, db: AsyncSession = Depends(get_async_db)) -> dict:
     """
     重新发送邮箱验证邮件接口。
     - 仅对未验证用户有效。
     - 生成新令牌并发送邮件。
     - 新令牌有效期24小时。
     """
-    user = get_user_by_email(db, request.email)
+    user = await get_user_by_email_async(db, request.email)
     if not user:
         logger.error(f"[RESEND_FAIL] User not found: {request.email}")
         raise HTTPException(status_code=404, detail="用户不存在")
     if user.is_verified:
         logger.warning(f"[RESEND_FAIL] Already verified: {request.email}")
         raise HTTPException(status_code=400, detail="邮箱已经验证")
-    user = set_user_verification_token(db, user)
-    if not send_verification_email(user.email, str(user.verification_token), user.username, language='zh'):
+    user = await set_user_verification_token_async(db, user)
+    if not await run_in_threadpool(send_verification_email, user.email, str(user.verification_token), user.username, language='zh'):
         logger.error(f"[RESEND_FAIL] Send mail failed: {user.email}")
         raise HTTPException(status_code=500, detail="发送验证邮件失败，请稍后重试")
     logger.info(f"[RESEND] Verification mail resent to: {user.email}")
     return {"message": "验证邮件已重新发送"}
 
 
-@user_router.get("/users/", response_model=list[UserRead])
-def get_all_users(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    """获取用户列表"""
-    return get_users(db, skip=skip, limit=limit)
+@user_router.get("/users/", response_model=Page[UserRead])
+async def get_all_users(
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """获取用户列表，使用上一页返回的 next_cursor 翻页"""
+    users, next_cursor = await get_users_async(db, limit=limit, cursor=cursor)
+    return {"items": users, "next_cursor": next_cursor}
 
 
 @user_router.put("/users/{user_id}", response_model=UserRead)
-def update_user_info(user_id: int, user: UserUpdate, db: Session = Depends(get_db)):
+async def update_user_info(user_id: int, user: UserUpdate, db: AsyncSession = Depends(get_async_db)):
     """更新用户信息"""
-    return update_user(db, user_id, user)
+    return await update_user_async(db, user_id, user)
 
 
 @user_router.delete("/users/{user_id}")
-def delete_user_info(user_id: int, db: Session = Depends(get_db)):
+async def delete_user_info(user_id: int, db: AsyncSession = Depends(get_async_db)):
     """删除用户"""
-    delete_user(db, user_id)
+    await delete_user_async(db, user_id)
     return {"message": "User deleted successfully"}
\ No newline at end of file
@@ -0,0 +1,109 @@
+"""
+SSF 持久化编码。
+
+Story.ssf 列中保存的文本有两种形式：
+- 明文 JSON（codec 为 none，以及引入压缩之前写入的旧数据）
+- "ssf:<codec>:" + base64(压缩后的 JSON)，codec 为 zlib / zstd / lz4
+
+zstd 与 lz4 为可选依赖（pip install zstandard lz4），只有用到时才导入。
+"""
+import base64
+import zlib
+from typing import Callable, Dict, Optional, Tuple
+
+from ..config import settings
+
+HEADER_PREFIX = "ssf:"
+PLAIN_CODEC = "none"
+
+
+def _zstd() -> Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]:
+    try:
+        import zstandard
+    except ImportError:
+        raise RuntimeError("zstandard is not installed, run `pip install zstandard` to use the zstd codec")
+    return zstandard.ZstdCompressor(level=3).compress, zstandard.ZstdDecompressor().decompress
+
+
+def _lz4() -> Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]:
+    try:
+        import lz4.frame
+    except ImportError:
+        raise RuntimeError("lz4 is not installed, run `pip install lz4` to use the lz4 codec")
+    return lz4.frame.compress, lz4.frame.decompress
+
+
+def _zlib() -> Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]:
+    return (lambda data: zlib.compress(data, 6)), zlib.decompress
+
+
+# codec 名称 -> 返回 (compress, decompress) 的工厂，第一次使用时才调用
+_CODEC_FACTORIES: Dict[str, Callable[[], Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]]] = {
+    "zlib": _zlib,
+    "zstd": _zstd,
+    "lz4": _lz4,
+}
+_codecs: Dict[str, Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]] = {}
+
+
+def register_codec(name: str, compress: Callable[[bytes], bytes], decompress: Callable[[bytes], bytes]):
+    _CODEC_FACTORIES[name] = lambda: (compress, decompress)
+    _codecs.pop(name, None)
+
+
+def _get_codec(name: str) -> Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]:
+    codec = _codecs.get(name)
+    if codec is None:
+        factory = _CODEC_FACTORIES.get(name)
+        if factory is None:
+            raise ValueError(f"Unknown SSF codec: {name}")
+        codec = _codecs[name] = factory()
+    return codec
+
+
+def get_codec(name: str) -> Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]:
+    """返回 codec 的 (compress, decompress)，none 为原样返回"""
+    if name == PLAIN_CODEC:
+        return bytes, bytes
+    return _get_codec(name)
+
+
+def codec_of(stored: Optional[str]) -> Optional[str]:
+    """返回存储文本使用的 codec，空值返回 None"""
+    if not stored:
+        return None
+    if stored.startswith(HEADER_PREFIX):
+        return stored[len(HEADER_PREFIX):].split(":", 1)[0]
+    return PLAIN_CODEC
+
+
+def encode_ssf(json_text: Optional[str], codec: Optional[str] = None) -> Optional[str]:
+    """
+    将 SSF JSON 编码为存储格式；已经编码过的文本原样返回。
+    小于 SSF_COMPRESS_MIN_BYTES 的文本不压缩，压缩后没有变小的也保留明文。
+    """
+    if not json_text or json_text.startswith(HEADER_PREFIX):
+        return json_text
+    codec = codec or settings.SSF_CODEC
+    raw = json_text.encode("utf-8")
+    if codec == PLAIN_CODEC or len(raw) < settings.SSF_COMPRESS_MIN_BYTES:
+        return json_text
+    compress, _ = _get_codec(codec)
+    encoded = f"{HEADER_PREFIX}{codec}:{base64.b64encode(compress(raw)).decode('ascii')}"
+    return encoded if len(encoded) < len(json_text) else json_text
+
+
+def decode_ssf(stored: Optional[str]) -> Optional[str]:
+    """将存储格式还原为 SSF JSON，明文原样返回"""
+    if not stored or not stored.startswith(HEADER_PREFIX):
+        return stored
+    codec, _, payload = stored[len(HEADER_PREFIX):].partition(":")
+    _, decompress = _get_codec(codec)
+    return decompress(base64.b64decode(payload)).decode("utf-8")
+
+
+def recode_ssf(stored: Optional[str], codec: Optional[str] = None) -> Optional[str]:
+    """按目标 codec 重新编码，已经是目标格式时原样返回"""
+    if codec_of(stored) == (codec or settings.SSF_CODEC):
+        return stored
+    return encode_ssf(decode_ssf(stored), codec)
@@ -0,0 +1,207 @@
+"""
+SSF 二进制容器（.ssfb）。
+
+文件按顺序写出，不需要回写，因此可以边从数据库读块边输出：
+
+    header    magic "SSFB" | version u16 | codec 8 字节 ASCII
+    metadata  压缩后的 JSON：完整 SSF 去掉 content_blocks.blocks（保留其他所有字段，转换无损）
+    blocks    每个块单独压缩后的 UTF-8 文本，依次排列
+    index     每个块一项: offset u64 | length u32 | crc32 u32
+    footer    metadata offset u64 | metadata length u32 | index offset u64 | block count u32 | magic "SSFE"
+
+读取时从文件末尾的 footer 找到 index，第 N 个块的位置可以直接计算，
+配合 mmap 只解压需要的块，读取 metadata 也不需要解析正文。
+所有整数为小端序。
+"""
+import json
+import mmap
+import struct
+import zlib
+from typing import Any, BinaryIO, Dict, Iterable, List, Optional, Union
+
+from ..config import settings
+from .codec import PLAIN_CODEC, get_codec
+from .ssf import StorySchemaFormat
+
+MAGIC = b"SSFB"
+END_MAGIC = b"SSFE"
+FORMAT_VERSION = 1
+MEDIA_TYPE = "application/x-ssf-container"
+
+HEADER = struct.Struct("<4sH8s")
+INDEX_ENTRY = struct.Struct("<QII")
+FOOTER = struct.Struct("<QIQI4s")
+
+
+class ContainerError(ValueError):
+    pass
+
+
+def split_document(document: Union[StorySchemaFormat, Dict[str, Any]]) -> tuple:
+    """拆成 (不含正文的文档, 正文块列表)"""
+    # 只复制外层，不修改调用方的对象
+    data = document.model_dump(mode="json") if isinstance(document, StorySchemaFormat) else dict(document)
+    content_blocks = data.get("content_blocks")
+    content_blocks = dict(content_blocks) if isinstance(content_blocks, dict) else {}
+    blocks = content_blocks.pop("blocks", None) or []
+    data["content_blocks"] = content_blocks
+    return data, [str(block) for block in blocks]
+
+
+class ContainerEncoder:
+    """按顺序产生容器的字节片段：begin() -> block() * N -> end()"""
+
+    def __init__(self, codec: Optional[str] = None):
+        self.codec = codec or settings.SSF_CODEC
+        if len(self.codec.encode("ascii")) > 8:
+            raise ContainerError(f"Codec name too long: {self.codec}")
+        self._compress, _ = get_codec(self.codec)
+        self._offset = 0
+        self._meta = (0, 0)
+        self._index: List[tuple] = []
+
+    def _emit(self, data: bytes) -> bytes:
+        self._offset += len(data)
+        return data
+
+    def begin(self, document: Dict[str, Any]) -> bytes:
+        header = HEADER.pack(MAGIC, FORMAT_VERSION, self.codec.encode("ascii"))
+        meta = self._compress(json.dumps(document, ensure_ascii=False).encode("utf-8"))
+        self._meta = (len(header), len(meta))
+        return self._emit(header) + self._emit(meta)
+
+    def block(self, content: str) -> bytes:
+        payload = self._compress(content.encode("utf-8"))
+        self._index.append((self._offset, len(payload), zlib.crc32(payload)))
+        return self._emit(payload)
+
+    def end(self) -> bytes:
+        index_offset = self._offset
+        index = b"".join(INDEX_ENTRY.pack(*entry) for entry in self._index)
+        footer = FOOTER.pack(self._meta[0], self._meta[1], index_offset, len(self._index), END_MAGIC)
+        return self._emit(index) + self._emit(footer)
+
+
+def write_container(document: Union[StorySchemaFormat, Dict[str, Any]], fp: BinaryIO, codec: Optional[str] = None):
+    data, blocks = split_document(document)
+    encoder = ContainerEncoder(codec)
+    fp.write(encoder.begin(data))
+    for content in blocks:
+        fp.write(encoder.block(content))
+    fp.write(encoder.end())
+
+
+def encode_container(document: Union[StorySchemaFormat, Dict[str, Any]], codec: Optional[str] = None) -> bytes:
+    data, blocks = split_document(document)
+    encoder = ContainerEncoder(codec)
+    return b"".join([encoder.begin(data), *(encoder.block(content) for content in blocks), encoder.end()])
+
+
+class ContainerReader:
+    """
+    随机读取容器。source 可以是 bytes 或 mmap；用 ContainerReader.open(path) 打开文件时使用 mmap，
+    只有被访问的块会从磁盘读入并解压。
+    """
+
+    def __init__(self, source: Union[bytes, bytearray, memoryview, mmap.mmap]):
+        self._source = source
+        self._view = memoryview(source)
+        self._file = None
+        if len(self._view) < HEADER.size + FOOTER.size:
+            raise ContainerError("Not an SSF container")
+        magic, version, codec = HEADER.unpack_from(self._view, 0)
+        if magic != MAGIC:
+            raise ContainerError("Not an SSF container")
+        if version != FORMAT_VERSION:
+            raise ContainerError(f"Unsupported SSF container version: {version}")
+        self.codec = codec.rstrip(b"\0").decode("ascii") or PLAIN_CODEC
+        _, self._decompress = get_codec(self.codec)
+        meta_offset, meta_length, index_offset, block_count, end_magic = FOOTER.unpack_from(
+            self._view, len(self._view) - FOOTER.size
+        )
+        if end_magic != END_MAGIC or index_offset + block_count * INDEX_ENTRY.size != len(self._view) - FOOTER.size:
+            raise ContainerError("Corrupted SSF container")
+        self._meta = (meta_offset, meta_length)
+        self._index_offset = index_offset
+        self.block_count = block_count
+
+    @classmethod
+    def open(cls, path: str) -> "ContainerReader":
+        fp = open(path, "rb")
+        try:
+            reader = cls(mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ))
+        except Exception:
+            fp.close()
+            raise
+        reader._file = fp
+        return reader
+
+    def close(self):
+        self._view.release()
+        if isinstance(self._source, mmap.mmap):
+            self._source.close()
+        if self._file is not None:
+            self._file.close()
+
+    def __enter__(self) -> "ContainerReader":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self) -> int:
+        return self.block_count
+
+    def metadata(self) -> Dict[str, Any]:
+        """不含正文的文档（metadata、characters、timeline 等）"""
+        offset, length = self._meta
+        return json.loads(self._decompress(self._view[offset:offset + length]))
+
+    def block(self, index: int) -> str:
+        if not 0 <= index < self.block_count:
+            raise IndexError(index)
+        offset, length, checksum = INDEX_ENTRY.unpack_from(self._view, self._index_offset + index * INDEX_ENTRY.size)
+        payload = self._view[offset:offset + length]
+        if zlib.crc32(payload) != checksum:
+            raise ContainerError(f"Checksum mismatch in block {index}")
+        return self._decompress(payload).decode("utf-8")
+
+    def blocks(self, start: int = 0, end: Optional[int] = None) -> Iterable[str]:
+        end = self.block_count if end is None else min(end, self.block_count)
+        for index in range(start, end):
+            yield self.block(index)
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = self.metadata()
+        data.setdefault("content_blocks", {})["blocks"] = list(self.blocks())
+        return data
+
+    def to_document(self) -> StorySchemaFormat:
+        return StorySchemaFormat.model_validate(self.to_dict())
+
+
+def json_to_container(json_text: str, codec: Optional[str] = None) -> bytes:
+    """SSF JSON -> 容器，JSON 中的所有字段都会保留"""
+    return encode_container(json.loads(json_text), codec)
+
+
+def container_to_json(data: Union[bytes, bytearray, memoryview]) -> str:
+    with ContainerReader(data) as reader:
+        return json.dumps(reader.to_dict(), ensure_ascii=False)
+
+
+def main():
+    """在 JSON 与 .ssfb 之间转换: poetry run ssf-convert <input> <output>，按输出文件扩展名决定方向"""
+    import sys
+
+    source, target = sys.argv[1], sys.argv[2]
+    if target.endswith(".ssfb"):
+        with open(source, encoding="utf-8") as fp_in, open(target, "wb") as fp_out:
+            write_container(json.load(fp_in), fp_out)
+    else:
+        with ContainerReader.open(source) as reader, open(target, "w", encoding="utf-8") as fp_out:
+            json.dump(reader.to_dict(), fp_out, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+正文块列表之间的差异。
+
+delta 是一组按顺序执行的操作，执行结果依次拼接得到新版本的块列表：
+- ["c", start, end]: 复制旧版本的 blocks[start:end]
+- ["i", [block, ...]]: 插入新内容
+
+未修改的块只记录区间，delta 的大小与修改量成正比，与全文长度无关。
+"""
+from difflib import SequenceMatcher
+from typing import List, Sequence, Union
+
+DeltaOp = List[Union[str, int, List[str]]]
+
+
+def compute_delta(base: Sequence[str], target: Sequence[str]) -> List[DeltaOp]:
+    # 块级比较，关闭 autojunk，避免重复出现的空行等短块被当作噪声
+    matcher = SequenceMatcher(None, base, target, autojunk=False)
+    delta: List[DeltaOp] = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            delta.append(["c", i1, i2])
+        elif j2 > j1:
+            delta.append(["i", list(target[j1:j2])])
+    return delta
+
+
+def apply_delta(base: Sequence[str], delta: List[DeltaOp]) -> List[str]:
+    result: List[str] = []
+    for op in delta:
+        if op[0] == "c":
+            result.extend(base[op[1]:op[2]])
+        elif op[0] == "i":
+            result.extend(op[1])
+        else:
+            raise ValueError(f"Unknown delta op: {op[0]}")
+    return result
+
+
+def is_identity(delta: List[DeltaOp], base_length: int) -> bool:
+    """delta 是否完全复制旧版本"""
+    if base_length == 0:
+        return not delta
+    return len(delta) == 1 and delta[0] == ["c", 0, base_length]
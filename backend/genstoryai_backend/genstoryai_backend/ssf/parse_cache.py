@@ -0,0 +1,88 @@
+"""
+SSF 解析结果缓存。
+
+键为 (故事 id, ssf 存储文本的 blake2b 摘要)，ssf 内容变化后自然不会命中旧条目。
+缓存按解压后的 JSON 长度估算占用，超过 SSF_PARSE_CACHE_MAX_BYTES 时按 LRU 淘汰。
+缓存中的对象在多个调用方之间共享，只能读取；修改后请通过 Story.ssf_obj 赋值写回。
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from ..config import settings
+from .codec import decode_ssf
+from .ssf import LazyStorySchemaFormat, StorySchemaFormat
+
+CacheKey = Tuple[Optional[int], bytes]
+
+
+def cache_key(entity_id: Optional[int], stored: str) -> CacheKey:
+    return entity_id, hashlib.blake2b(stored.encode("utf-8"), digest_size=16).digest()
+
+
+class SSFParseCache:
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._data: "OrderedDict[CacheKey, Tuple[int, LazyStorySchemaFormat]]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, entity_id: Optional[int], stored: str) -> LazyStorySchemaFormat:
+        """返回缓存的解析结果，未命中时只校验 metadata 并写入缓存"""
+        key = cache_key(entity_id, stored)
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return item[1]
+            self.misses += 1
+        json_str = decode_ssf(stored)
+        parsed = LazyStorySchemaFormat(json_str)
+        self._put(key, len(json_str), parsed)
+        return parsed
+
+    def prime(self, entity_id: Optional[int], stored: str, value: StorySchemaFormat, size: int):
+        """写入刚序列化的对象，下次读取同样的 ssf 时不再解析"""
+        self._put(cache_key(entity_id, stored), size, LazyStorySchemaFormat.from_model(value))
+
+    def discard(self, entity_id: Optional[int], stored: str):
+        with self._lock:
+            self._remove(cache_key(entity_id, stored))
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._size = 0
+
+    def _put(self, key: CacheKey, size: int, value: LazyStorySchemaFormat):
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._remove(key)
+            self._data[key] = (size, value)
+            self._size += size
+            while self._size > self.max_bytes:
+                self._remove(next(iter(self._data)))
+
+    def _remove(self, key: CacheKey):
+        item = self._data.pop(key, None)
+        if item is not None:
+            self._size -= item[0]
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "entries": len(self._data),
+            "size_bytes": self._size,
+            "max_bytes": self.max_bytes,
+        }
+
+
+ssf_parse_cache = SSFParseCache(settings.SSF_PARSE_CACHE_MAX_BYTES)
@@ -10,8 +10,10 @@ SSF StorySchema Format is a file protocol which contains following part:
 tips
 - 对content_blocks中的文本使用 LZ4 或 Zstandard 压缩，压缩比可达 1:5~1:10
 """
+import json
+import threading
 from pydantic import BaseModel,Field
-from typing import List
+from typing import Any, Dict, List, Optional
 
 from ..models.genre import Genre
 
@@ -47,3 +49,64 @@ class StorySchemaFormat(BaseModel):
     @classmethod
     def from_json(cls, json_str: str) -> 'StorySchemaFormat':
         return cls.model_validate_json(json_str)
+
+
+class LazyStorySchemaFormat:
+    """
+    只校验 metadata 的 SSF 视图。
+    第一次访问 content_blocks 等其他部分时才校验剩余部分，结果保存在 full() 中。
+    解析出的原始文档保留在 document() 中，整篇读取（导出、版本记录）不再重复解析 JSON。
+    缓存中的实例会被多个线程共享，校验剩余部分时加锁。
+    """
+    _LAZY_PARTS = ("content_blocks", "characters", "timeline", "extended_metadata")
+
+    def __init__(self, json_str: str):
+        self._data: Optional[Dict[str, Any]] = json.loads(json_str)
+        if not isinstance(self._data, dict):
+            raise ValueError("SSF JSON must be an object")
+        self.metadata = _Metadata.model_validate(self._data.get("metadata"))
+        self._full: Optional[StorySchemaFormat] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_model(cls, value: StorySchemaFormat) -> 'LazyStorySchemaFormat':
+        lazy = cls.__new__(cls)
+        lazy._data, lazy.metadata, lazy._full = None, value.metadata, value
+        lazy._lock = threading.Lock()
+        return lazy
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._full is not None
+
+    def full(self) -> StorySchemaFormat:
+        if self._full is None:
+            with self._lock:
+                if self._full is None:
+                    # metadata 已经校验过，只校验其余部分
+                    parts = {
+                        name: StorySchemaFormat.model_fields[name].annotation.model_validate(self._data.get(name))
+                        for name in self._LAZY_PARTS
+                    }
+                    self._full = StorySchemaFormat.model_construct(metadata=self.metadata, **parts)
+        return self._full
+
+    def document(self) -> Dict[str, Any]:
+        """
+        原始 JSON 文档，保留模型中没有定义的字段。
+        顶层与 content_blocks 是副本，可以替换其中的 blocks；其余部分与缓存共享，只能读取。
+        """
+        if self._data is None:
+            with self._lock:
+                if self._data is None:
+                    # from_model 创建的实例，存储的 ssf 就是该模型序列化的结果
+                    self._data = self._full.model_dump(mode="json")
+        document = dict(self._data)
+        if isinstance(document.get("content_blocks"), dict):
+            document["content_blocks"] = dict(document["content_blocks"])
+        return document
+
+    def __getattr__(self, name: str):
+        if name in self._LAZY_PARTS:
+            return getattr(self.full(), name)
+        raise AttributeError(name)
@@ -0,0 +1,130 @@
+"""
+SSF 的流式导入导出格式。
+
+导出不在内存中拼出整个文档，正文块逐批从数据库读出后立即写出：
+- json: 与 StorySchemaFormat.to_json 结构相同的完整 JSON，content_blocks.blocks 逐个写出
+- ndjson: 每行一个 JSON 对象，第一行为 header，之后每行一个 block，可以逐行导入
+- ssfb: 二进制容器，见 ssf/container.py
+
+    {"type": "header", "story": {"title": ..., ...}, "ssf": {"metadata": ..., "characters": ..., ...}}
+    {"type": "block", "content": "..."}
+"""
+import json
+from typing import Any, AsyncIterator, Dict, Literal, Optional, Union
+
+from fastapi import HTTPException, status
+from pydantic import BaseModel, Field, ValidationError
+
+from ..models.genre import Genre
+from .container import ContainerEncoder
+from .ssf import StorySchemaFormat
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+# header 中导出的故事字段
+STORY_FIELDS = ("title", "author", "genre", "summary", "creator_user_id", "story_template_id")
+
+
+class StreamStory(BaseModel):
+    title: str
+    creator_user_id: int
+    author: str = ""
+    genre: Genre = Genre.FANTASY
+    summary: str = ""
+    story_template_id: Optional[int] = None
+
+
+class StreamHeader(BaseModel):
+    type: Literal["header"]
+    story: StreamStory
+    ssf: Dict[str, Any] = Field(default_factory=dict, description="不含 content_blocks.blocks 的 SSF")
+
+
+class StreamBlock(BaseModel):
+    type: Literal["block"]
+    content: str
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False)
+
+
+async def iter_ndjson(header: Dict[str, Any], blocks: AsyncIterator[str]) -> AsyncIterator[str]:
+    yield _dumps({"type": "header", **header}) + "\n"
+    async for content in blocks:
+        yield _dumps({"type": "block", "content": content}) + "\n"
+
+
+async def iter_json(document: Dict[str, Any], blocks: AsyncIterator[str]) -> AsyncIterator[str]:
+    """逐块写出 SSF JSON，document 中的 content_blocks.blocks 会被 blocks 替换"""
+    content_blocks = {key: value for key, value in (document.get("content_blocks") or {}).items() if key != "blocks"}
+    rest = {key: value for key, value in document.items() if key != "content_blocks"}
+    head = _dumps(rest)[:-1]
+    yield head + (", " if rest else "") + '"content_blocks": '
+    inner = _dumps(content_blocks)[:-1]
+    yield inner + (", " if content_blocks else "") + '"blocks": ['
+    first = True
+    async for content in blocks:
+        yield ("" if first else ", ") + _dumps(content)
+        first = False
+    yield "]}}"
+
+
+async def buffered(chunks: AsyncIterator[Union[str, bytes]], size: int = 64 * 1024) -> AsyncIterator[bytes]:
+    """合并小块输出，减少响应写入次数"""
+    buffer, length = [], 0
+    async for chunk in chunks:
+        data = chunk.encode("utf-8") if isinstance(chunk, str) else chunk
+        buffer.append(data)
+        length += len(data)
+        if length >= size:
+            yield b"".join(buffer)
+            buffer, length = [], 0
+    if buffer:
+        yield b"".join(buffer)
+
+
+async def iter_container(document: Dict[str, Any], blocks: AsyncIterator[str]) -> AsyncIterator[bytes]:
+    """逐块写出二进制容器，格式见 ssf/container.py"""
+    encoder = ContainerEncoder()
+    yield encoder.begin(document)
+    async for content in blocks:
+        yield encoder.block(content)
+    yield encoder.end()
+
+
+async def iter_lines(chunks: AsyncIterator[bytes], max_line_bytes: int) -> AsyncIterator[bytes]:
+    """把请求体按行切分，单行超过 max_line_bytes 时返回 413"""
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        while True:
+            newline = buffer.find(b"\n")
+            if newline < 0:
+                break
+            line, buffer = buffer[:newline], buffer[newline + 1:]
+            if line.strip():
+                yield line
+        if len(buffer) > max_line_bytes:
+            raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="NDJSON line too long")
+    if buffer.strip():
+        yield buffer
+
+
+def parse_header(line: bytes) -> StreamHeader:
+    try:
+        header = StreamHeader.model_validate_json(line)
+        if header.ssf:
+            # 校验除正文以外的 SSF 结构，缺少的空白部分按空对象处理
+            StorySchemaFormat.model_validate({
+                "characters": {}, "timeline": {}, "extended_metadata": {}, **header.ssf, "content_blocks": {},
+            })
+    except ValidationError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid header on line 1: {e.errors()[0]['msg']}")
+    return header
+
+
+def parse_block(line: bytes, line_number: int) -> str:
+    try:
+        return StreamBlock.model_validate_json(line).content
+    except ValidationError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid block on line {line_number}: {e.errors()[0]['msg']}")
@@ -0,0 +1,242 @@
+"""
+进程内缓存以及可插拔的共享缓存后端。
+
+- LRUCache: 按字节数限制大小、带 TTL 的进程内 LRU 缓存，值为 bytes
+- SharedCacheBackend: 多 worker 共享的缓存后端接口（异步）
+  - MemorySharedBackend: 进程内实现，用于测试或单 worker 部署
+  - RedisSharedBackend: 基于 redis 的实现，需要安装可选依赖 redis
+- TieredCache: 本地 LRU + 可选共享后端的两级缓存，并统计命中率
+- FingerprintCache: 按故事缓存内存索引，指纹与数据库不一致时视为未命中
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Generic, Iterable, Optional, Protocol, Sized, Tuple, TypeVar
+
+
+class LRUCache:
+    def __init__(self, max_bytes: int, ttl_seconds: float):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._data: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                self._remove(key)
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes):
+        # 单个值超过容量时不缓存
+        if len(value) > self.max_bytes:
+            self.delete(key)
+            return
+        with self._lock:
+            self._remove(key)
+            self._data[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._size += len(value)
+            while self._size > self.max_bytes:
+                oldest = next(iter(self._data))
+                self._remove(oldest)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._size = 0
+
+    def _remove(self, key: str):
+        item = self._data.pop(key, None)
+        if item is not None:
+            self._size -= len(item[1])
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._size
+
+
+class SharedCacheBackend(Protocol):
+    async def get(self, key: str) -> Optional[bytes]: ...
+
+    async def set(self, key: str, value: bytes, ttl_seconds: float): ...
+
+    async def delete(self, *keys: str): ...
+
+
+class MemorySharedBackend:
+    """进程内的共享后端替身，行为与 redis 后端一致"""
+
+    def __init__(self):
+        self._data: Dict[str, Tuple[float, bytes]] = {}
+
+    async def get(self, key: str) -> Optional[bytes]:
+        item = self._data.get(key)
+        if item is None or item[0] < time.monotonic():
+            self._data.pop(key, None)
+            return None
+        return item[1]
+
+    async def set(self, key: str, value: bytes, ttl_seconds: float):
+        self._data[key] = (time.monotonic() + ttl_seconds, value)
+
+    async def delete(self, *keys: str):
+        for key in keys:
+            self._data.pop(key, None)
+
+
+class RedisSharedBackend:
+    def __init__(self, url: str):
+        try:
+            from redis import asyncio as redis_asyncio
+        except ImportError:
+            raise RuntimeError("redis is not installed, run `pip install redis` to use a redis cache backend")
+        self._client = redis_asyncio.from_url(url)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self._client.get(key)
+
+    async def set(self, key: str, value: bytes, ttl_seconds: float):
+        await self._client.set(key, value, px=int(ttl_seconds * 1000))
+
+    async def delete(self, *keys: str):
+        if keys:
+            await self._client.delete(*keys)
+
+
+def build_shared_backend(url: str) -> Optional[SharedCacheBackend]:
+    """根据配置创建共享后端：空字符串表示不使用，memory:// 为进程内替身，redis:// 为 redis"""
+    if not url:
+        return None
+    if url.startswith("memory://"):
+        return MemorySharedBackend()
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisSharedBackend(url)
+    raise ValueError(f"Unsupported cache backend: {url}")
+
+
+class TieredCache:
+    """先查本地 LRU，再查共享后端；写入与失效同时作用于两级"""
+
+    def __init__(self, namespace: str, local: LRUCache, shared: Optional[SharedCacheBackend] = None,
+                 shared_ttl_seconds: Optional[float] = None):
+        self.namespace = namespace
+        self.local = local
+        self.shared = shared
+        self.shared_ttl_seconds = shared_ttl_seconds or local.ttl_seconds
+        self.local_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    def _key(self, key) -> str:
+        return f"{self.namespace}:{key}"
+
+    async def get(self, key) -> Optional[bytes]:
+        full_key = self._key(key)
+        value = self.local.get(full_key)
+        if value is not None:
+            self.local_hits += 1
+            return value
+        if self.shared is not None:
+            value = await self.shared.get(full_key)
+            if value is not None:
+                self.shared_hits += 1
+                self.local.set(full_key, value)
+                return value
+        self.misses += 1
+        return None
+
+    async def set(self, key, value: bytes):
+        full_key = self._key(key)
+        self.local.set(full_key, value)
+        if self.shared is not None:
+            await self.shared.set(full_key, value, self.shared_ttl_seconds)
+
+    async def invalidate(self, keys: Iterable):
+        full_keys = [self._key(key) for key in keys]
+        for full_key in full_keys:
+            self.local.delete(full_key)
+        if self.shared is not None and full_keys:
+            await self.shared.delete(*full_keys)
+
+    def stats(self) -> dict:
+        lookups = self.local_hits + self.shared_hits + self.misses
+        return {
+            "local_hits": self.local_hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.local_hits + self.shared_hits) / lookups, 4) if lookups else None,
+            "entries": len(self.local),
+            "size_bytes": self.local.size_bytes,
+            "max_bytes": self.local.max_bytes,
+        }
+
+
+IndexT = TypeVar("IndexT", bound=Sized)
+Fingerprint = Tuple[Any, ...]
+
+
+class FingerprintCache(Generic[IndexT]):
+    """
+    按 ID 缓存构建好的只读索引（例如人物关系图谱、时间线区间索引），超过 max_entries 个时按 LRU 淘汰。
+    调用方每次读取前从数据库取一个廉价的指纹（例如行数、最大 ID、最大更新时间），指纹变化即视为未命中。
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[int, Tuple[Fingerprint, IndexT]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: int, fingerprint: Fingerprint) -> Optional[IndexT]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and item[0] == fingerprint:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return item[1]
+            self.misses += 1
+            return None
+
+    def put(self, key: int, fingerprint: Fingerprint, value: IndexT):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._data[key] = (fingerprint, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def discard(self, keys: Iterable[int]):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "entries": len(self._data),
+            "max_entries": self.max_entries,
+            "items": sum(len(value) for _, value in self._data.values()),
+        }
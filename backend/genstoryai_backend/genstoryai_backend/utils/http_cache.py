@@ -0,0 +1,91 @@
+"""
+HTTP 条件请求工具：ETag / Last-Modified 的生成与校验。
+
+- 故事带有 version 字段，使用强 ETag "<id>-<version>"，可用于 If-Match 乐观并发控制
+- 角色没有版本号，使用基于 update_time 的弱 ETag，只用于 If-None-Match
+"""
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, List, Optional
+
+from fastapi import Request
+
+
+def version_etag(entity_id: int, version: int) -> str:
+    return f'"{entity_id}-{version}"'
+
+
+def timestamp_etag(entity_id: int, timestamp: datetime) -> str:
+    return f'W/"{entity_id}-{int(timestamp.timestamp() * 1_000_000)}"'
+
+
+def format_http_date(value: datetime) -> str:
+    """数据库中的时间为 UTC 的 naive datetime"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+
+def parse_http_date(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        parsed = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def parse_etags(header: Optional[str]) -> List[str]:
+    """解析 If-Match / If-None-Match 中逗号分隔的 ETag 列表"""
+    if not header:
+        return []
+    return [tag.strip() for tag in header.split(",") if tag.strip()]
+
+
+def _opaque(tag: str) -> str:
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def validator_headers(etag: str, last_modified: datetime) -> Dict[str, str]:
+    # no-cache: 客户端可以缓存，但每次使用前需要用条件请求重新验证
+    return {
+        "ETag": etag,
+        "Last-Modified": format_http_date(last_modified),
+        "Cache-Control": "no-cache",
+    }
+
+
+def is_not_modified(request: Request, etag: str, last_modified: datetime) -> bool:
+    """
+    按 RFC 9110 判断是否可以返回 304：
+    有 If-None-Match 时只按 ETag 弱比较，否则比较 If-Modified-Since（秒级精度）
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = parse_etags(if_none_match)
+        return "*" in tags or _opaque(etag) in {_opaque(tag) for tag in tags}
+    since = parse_http_date(request.headers.get("if-modified-since"))
+    if since is None:
+        return False
+    return last_modified.replace(microsecond=0, tzinfo=None) <= since
+
+
+def if_match_versions(header: Optional[str], entity_id: int) -> Optional[List[int]]:
+    """
+    从 If-Match 中取出当前实体可接受的版本号。
+    未提供或为 * 时返回 None（不做版本校验）；弱 ETag 与其他实体的 ETag 不参与匹配。
+    """
+    tags = parse_etags(header)
+    if not tags or "*" in tags:
+        return None
+    versions = []
+    for tag in tags:
+        if tag.startswith("W/") or len(tag) < 2 or not (tag[0] == tag[-1] == '"'):
+            continue
+        tag_id, _, version = tag[1:-1].partition("-")
+        if tag_id == str(entity_id) and version.isdigit():
+            versions.append(int(version))
+    return versions
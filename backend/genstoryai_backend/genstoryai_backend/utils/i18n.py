@@ -1,29 +1,123 @@
 import gettext
-import os 
+import logging
+import os
+import shutil
 import subprocess
+import sys
+import threading
+from contextvars import ContextVar, Token
+from typing import Dict, List, Optional, Tuple
 
 
-_default_lang = None
 DEFAULT_LANGUAGE = "en"
 SUPPORTED_LANGUAGE = ["zh", "en"]
+LOCALES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'locales')
+DOMAIN = "base"
 
+logger = logging.getLogger(__name__)
 
-def active_translation(lang: str):
-    global _default_lang
-    _default_lang = (
+# 当前请求的语言，每个请求（asyncio task）独立，避免并发请求互相覆盖
+_current_lang: ContextVar[str] = ContextVar("current_lang", default=DEFAULT_LANGUAGE)
+
+# 已加载的翻译目录缓存，每种语言只读取一次 .mo 文件
+_catalogs: Dict[str, gettext.NullTranslations] = {}
+_catalogs_lock = threading.Lock()
+
+
+def get_translation(lang: str) -> gettext.NullTranslations:
+    """获取某种语言的翻译目录，首次使用时加载并缓存"""
+    catalog = _catalogs.get(lang)
+    if catalog is not None:
+        return catalog
+    with _catalogs_lock:
+        catalog = _catalogs.get(lang)
+        if catalog is None:
+            catalog = gettext.translation(DOMAIN, localedir=LOCALES_DIR, languages=[lang], fallback=True)
+            _catalogs[lang] = catalog
+    return catalog
+
+
+def clear_translation_cache():
+    """清空翻译目录缓存，重新编译 .mo 文件后调用"""
+    with _catalogs_lock:
+        _catalogs.clear()
+
+
+def parse_accept_language(header: str) -> List[Tuple[str, float]]:
+    """
+    解析 Accept-Language 请求头，按权重从高到低返回 (语言标签, q 值) 列表。
+    例如 "zh-CN,zh;q=0.9,en;q=0.8" -> [("zh-cn", 1.0), ("zh", 0.9), ("en", 0.8)]
+    """
+    languages = []
+    for position, part in enumerate((header or "").split(",")):
+        pieces = part.strip().split(";")
+        tag = pieces[0].strip().lower().replace("_", "-")
+        if not tag:
+            continue
+        quality = 1.0
+        for param in pieces[1:]:
+            name, _, value = param.strip().partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality <= 0:
+            continue
+        languages.append((position, tag, min(quality, 1.0)))
+    # q 值相同时保持请求头中的原始顺序
+    languages.sort(key=lambda item: (-item[2], item[0]))
+    return [(tag, quality) for _, tag, quality in languages]
+
+
+def negotiate_language(header: str) -> str:
+    """根据 Accept-Language 选出支持的语言，支持地区回退（zh-CN -> zh），无匹配时返回默认语言"""
+    for tag, _ in parse_accept_language(header):
+        if tag == "*":
+            return DEFAULT_LANGUAGE
+        if tag in SUPPORTED_LANGUAGE:
+            return tag
+        primary = tag.split("-", 1)[0]
+        if primary in SUPPORTED_LANGUAGE:
+            return primary
+    return DEFAULT_LANGUAGE
+
+
+def active_translation(lang: str) -> Token:
+    """设置当前上下文的语言，返回的 token 可用于 reset_translation 恢复"""
+    return _current_lang.set(
         DEFAULT_LANGUAGE if lang not in SUPPORTED_LANGUAGE else lang
     )
 
 
-def trans(message: str) -> str:
-    lang = _default_lang if _default_lang is not None else DEFAULT_LANGUAGE
-    return gettext.translation(
-        "base", localedir=os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'locales'), languages=[lang]
-    ).gettext(message)
+def reset_translation(token: Token):
+    _current_lang.reset(token)
 
 
-def compile_translations():
-    locales_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'locales')
+def get_language() -> str:
+    """获取当前上下文的语言"""
+    return _current_lang.get()
+
+
+def trans(message: str, lang: Optional[str] = None) -> str:
+    return get_translation(lang or get_language()).gettext(message)
+
+
+def _is_stale(po_file: str, mo_file: str) -> bool:
+    """.mo 文件不存在或比 .po 文件旧时需要重新编译"""
+    if not os.path.exists(mo_file):
+        return True
+    return os.path.getmtime(mo_file) < os.path.getmtime(po_file)
+
+
+def compile_translations(force: bool = False) -> List[str]:
+    """
+    将 locales 下的 .po 文件编译为 .mo 文件。
+    - 默认只编译过期的文件（.mo 不存在或比 .po 旧），force=True 时全部重新编译。
+    - 返回本次编译的 .po 文件列表。
+    """
+    locales_dir = LOCALES_DIR
+    stale = []
     for lang in os.listdir(locales_dir):
         lang_dir = os.path.join(locales_dir, lang)
         if os.path.isdir(lang_dir):
@@ -31,6 +125,26 @@ def compile_translations():
             if os.path.isdir(lc_messages_dir):
                 po_file = os.path.join(lc_messages_dir, 'base.po')
                 mo_file = os.path.join(lc_messages_dir, 'base.mo')
-                if os.path.exists(po_file):
-                    subprocess.run(['msgfmt', po_file, '-o', mo_file], check=True)
-                    print(f"Compiled {po_file} to {mo_file}")
\ No newline at end of file
+                if os.path.exists(po_file) and (force or _is_stale(po_file, mo_file)):
+                    stale.append((po_file, mo_file))
+    if not stale:
+        return []
+    if shutil.which('msgfmt') is None:
+        logger.warning("msgfmt not found, skip compiling %d translation file(s)", len(stale))
+        return []
+    for po_file, mo_file in stale:
+        subprocess.run(['msgfmt', po_file, '-o', mo_file], check=True)
+        logger.info(f"Compiled {po_file} to {mo_file}")
+    clear_translation_cache()
+    return [po_file for po_file, _ in stale]
+
+
+def main():
+    """构建时编译翻译文件: poetry run compile-translations"""
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    compiled = compile_translations(force="--force" in sys.argv[1:])
+    print(f"Compiled {len(compiled)} translation file(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,6 @@
 from fastapi import Request
 from fastapi.middleware.cors import CORSMiddleware
-from genstoryai_backend.utils.i18n import active_translation
+from genstoryai_backend.utils.i18n import active_translation, negotiate_language, reset_translation
 
 
 def add_middlewares(app):
@@ -11,11 +11,17 @@ def add_middlewares(app):
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        # 前端需要读取 ETag 以便在 If-Match 中回传
+        expose_headers=["ETag", "Last-Modified"],
     )
-    
+
     @app.middleware("http")
     async def get_accept_language(request: Request, call_next):
-        lang = request.headers.get("accept-language") or ""
-        active_translation(lang)
-        response = await call_next(request)
-        return response
\ No newline at end of file
+        lang = negotiate_language(request.headers.get("accept-language") or "")
+        token = active_translation(lang)
+        try:
+            response = await call_next(request)
+        finally:
+            reset_translation(token)
+        response.headers.setdefault("Content-Language", lang)
+        return response
@@ -0,0 +1,148 @@
+"""
+调用模型接口时的并发与速率限制。
+
+- TokenBucket: 按分钟速率连续补充的令牌桶，预留令牌时允许透支，透支部分换算为等待时间，
+  先预留的请求先放行，不需要锁
+- RateLimiter: 信号量限制并发数，再按服务商的 RPM（每分钟请求数）与 TPM（每分钟 token 数）两个令牌桶排队；
+  收到 429 后所有请求暂停到 Retry-After 指定的时间
+- retry_async: 对可重试的错误（429）按指数退避加随机抖动重试
+"""
+import asyncio
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS_CODES = {429}
+
+
+class TokenBucket:
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        self.rate = per_minute / 60
+        self.capacity = capacity if capacity is not None else per_minute
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, amount: float) -> float:
+        """预留 amount 个令牌，返回需要等待的秒数；超过桶容量的请求按容量计算，否则永远无法放行"""
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def adjust(self, amount: float):
+        """按实际用量修正之前的预留，amount 为负数时退还令牌"""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+
+class RateLimiter:
+    def __init__(self, concurrency: int, requests_per_minute: float = 0, tokens_per_minute: float = 0):
+        """requests_per_minute、tokens_per_minute 为 0 表示不限制"""
+        self.concurrency = concurrency
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute > 0 else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._paused_until = 0.0
+        self.active = 0
+        self.waiting = 0
+        self.throttled = 0
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # 在事件循环中第一次使用时才创建
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._semaphore
+
+    @asynccontextmanager
+    async def slot(self, tokens: int = 0) -> AsyncIterator[None]:
+        """占用一个并发名额，并等待速率限制放行；tokens 为本次调用预计消耗的 token 数"""
+        async with self._get_semaphore():
+            delay = self._paused_until - time.monotonic()
+            if self.requests is not None:
+                delay = max(delay, self.requests.reserve(1))
+            if self.tokens is not None and tokens:
+                delay = max(delay, self.tokens.reserve(tokens))
+            if delay > 0:
+                self.waiting += 1
+                try:
+                    await asyncio.sleep(delay)
+                finally:
+                    self.waiting -= 1
+            self.active += 1
+            try:
+                yield
+            finally:
+                self.active -= 1
+
+    def record_usage(self, estimated: int, actual: Optional[int]):
+        if self.tokens is not None and actual is not None:
+            self.tokens.adjust(actual - estimated)
+
+    def pause(self, seconds: float):
+        """服务商返回 429 时调用，之后的请求至少等待 seconds 秒"""
+        self.throttled += 1
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def stats(self) -> dict:
+        return {
+            "concurrency": self.concurrency,
+            "active": self.active,
+            "waiting": self.waiting,
+            "throttled": self.throttled,
+            "requests_available": round(self.requests.tokens, 2) if self.requests is not None else None,
+            "tokens_available": round(self.tokens.tokens, 2) if self.tokens is not None else None,
+        }
+
+
+def status_code_of(error: BaseException) -> Optional[int]:
+    """openai 与 pydantic_ai 的 HTTP 错误都带有 status_code"""
+    code = getattr(error, "status_code", None)
+    return code if isinstance(code, int) else None
+
+
+def retry_after_of(error: BaseException) -> Optional[float]:
+    """读取错误响应的 Retry-After 头（秒数形式），没有时返回 None"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        return max(0.0, float(headers.get("retry-after")))
+    except (TypeError, ValueError):
+        return None
+
+
+async def retry_async(
+    func: Callable[[], Awaitable[T]],
+    *,
+    retries: int,
+    base_delay: float,
+    max_delay: float,
+    limiter: Optional[RateLimiter] = None,
+) -> T:
+    """
+    调用 func，遇到 429 时重试最多 retries 次。
+    等待时间优先使用 Retry-After，否则为 [0, min(max_delay, base_delay * 2^attempt)] 内的随机值；
+    给出 limiter 时同时暂停其他请求，避免它们继续撞上限制。
+    """
+    attempt = 0
+    while True:
+        try:
+            return await func()
+        except Exception as e:
+            if attempt >= retries or status_code_of(e) not in RETRYABLE_STATUS_CODES:
+                raise
+            delay = retry_after_of(e)
+            if delay is None:
+                delay = random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+            if limiter is not None:
+                limiter.pause(delay)
+            attempt += 1
+            await asyncio.sleep(delay)
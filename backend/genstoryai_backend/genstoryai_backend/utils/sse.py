@@ -0,0 +1,86 @@
+"""
+Server-Sent Events。
+
+sse_stream 把 (事件名, 数据) 的异步迭代器转换为 text/event-stream 格式：
+- 等待下一个事件时每隔 heartbeat 秒发送一次注释行，防止代理因空闲断开连接，同时检查客户端是否已断开
+- 客户端断开后取消产生事件的 task，上游（例如模型的流式请求）随之关闭，不再继续消耗 token
+- 响应头已经发出，迭代器抛出的异常转换为 error 事件后结束
+"""
+import asyncio
+import json
+import logging
+from typing import Any, AsyncIterator, Optional, Protocol, Tuple
+
+logger = logging.getLogger(__name__)
+
+SSE_MEDIA_TYPE = "text/event-stream"
+# 禁止缓存与代理缓冲（nginx），事件生成后立即到达客户端
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+class DisconnectAware(Protocol):
+    async def is_disconnected(self) -> bool: ...
+
+
+def format_sse(data: Any, event: Optional[str] = None, event_id: Optional[str] = None) -> str:
+    """格式化一个事件，data 不是字符串时序列化为 JSON；多行数据拆成多个 data 行"""
+    text = data if isinstance(data, str) else json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event is not None:
+        lines.append(f"event: {event}")
+    lines.extend(f"data: {line}" for line in text.split("\n"))
+    return "\n".join(lines) + "\n\n"
+
+
+async def sse_stream(
+    request: DisconnectAware,
+    events: AsyncIterator[Tuple[str, Any]],
+    heartbeat: float = 15.0,
+) -> AsyncIterator[str]:
+    # 迭代器在单独的 task 中从头到尾运行，其中的 async with（例如 httpx 流）在同一个 task 中进入和退出。
+    # 取消该 task 时迭代器可能停在 yield 处（队列已满，阻塞在 queue.put），async for 不会关闭它，
+    # 因此在 finally 中显式 aclose，让上游在同一个 task 中关闭，而不是等垃圾回收时在其他 task 中关闭
+    queue: asyncio.Queue = asyncio.Queue(maxsize=16)
+
+    async def produce():
+        try:
+            async for item in events:
+                await queue.put((True, item))
+        except Exception as e:
+            await queue.put((False, e))
+        else:
+            await queue.put((False, None))
+        finally:
+            aclose = getattr(events, "aclose", None)
+            if aclose is not None:
+                await aclose()
+
+    producer = asyncio.create_task(produce())
+    try:
+        while True:
+            try:
+                ok, value = await asyncio.wait_for(queue.get(), timeout=heartbeat)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    return
+                yield ": ping\n\n"
+                continue
+            if await request.is_disconnected():
+                return
+            if ok:
+                event, data = value
+                yield format_sse(data, event=event)
+            elif value is None:
+                return
+            else:
+                logger.error("SSE stream failed", exc_info=value)
+                yield format_sse({"detail": str(value)}, event="error")
+                return
+    finally:
+        producer.cancel()
+        try:
+            await producer
+        except asyncio.CancelledError:
+            pass
@@ -0,0 +1,83 @@
+"""
+启动耗时统计。
+
+- startup_phase: 记录启动各阶段（导入、编译翻译、建表等）的耗时
+- get_startup_report: 返回各阶段耗时以及从进程导入到可以提供服务的总耗时
+- importtime_report: 以 `python -X importtime` 的方式统计模块导入耗时，
+  命令行用法: python -m genstoryai_backend.utils.startup [module] [top]
+"""
+import re
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+_started_at = time.perf_counter()
+_phases: List[Dict] = []
+_ready_at: Optional[float] = None
+
+_IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$")
+
+
+@contextmanager
+def startup_phase(name: str):
+    """记录一个启动阶段的耗时"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _phases.append({"name": name, "duration_ms": round((time.perf_counter() - start) * 1000, 3)})
+
+
+def mark_ready():
+    """标记应用已可以提供服务"""
+    global _ready_at
+    _ready_at = time.perf_counter()
+
+
+def get_startup_report() -> Dict:
+    return {
+        "phases": list(_phases),
+        "ready": _ready_at is not None,
+        "total_ms": round((_ready_at - _started_at) * 1000, 3) if _ready_at is not None else None,
+    }
+
+
+def importtime_report(module: str = "genstoryai_backend.main", top: int = 20, timeout: Optional[float] = None) -> List[Dict]:
+    """
+    在子进程中以 -X importtime 导入模块，按累计耗时返回最慢的 top 个模块。
+    子进程超过 timeout 秒时被终止并抛出 subprocess.TimeoutExpired。
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        timeout=timeout,
+    )
+    entries = []
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match is None:
+            continue
+        self_us, cumulative_us, indent, name = match.groups()
+        entries.append({
+            "module": name,
+            "self_ms": int(self_us) / 1000,
+            "cumulative_ms": int(cumulative_us) / 1000,
+            "depth": len(indent) // 2,
+        })
+    entries.sort(key=lambda entry: entry["cumulative_ms"], reverse=True)
+    return entries[:top]
+
+
+def main():
+    module = sys.argv[1] if len(sys.argv) > 1 else "genstoryai_backend.main"
+    top = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    print(f"{'cumulative(ms)':>15} {'self(ms)':>10}  module")
+    for entry in importtime_report(module, top):
+        print(f"{entry['cumulative_ms']:>15.1f} {entry['self_ms']:>10.1f}  {entry['module']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,20 @@
+import os
+import tempfile
+
+import pytest
+
+# 测试使用临时数据库，必须在导入应用之前设置
+_tmp_dir = tempfile.mkdtemp(prefix="genstoryai-test-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp_dir, 'test.db')}"
+os.environ["GENERATION_CACHE_PATH"] = os.path.join(_tmp_dir, "generation_cache.db")
+os.environ.setdefault("I18N_COMPILE_ON_STARTUP", "false")
+os.environ.setdefault("MAIL_SIMULATE", "true")
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+    from genstoryai_backend.main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
@@ -0,0 +1,53 @@
+import asyncio
+
+import pytest
+
+from genstoryai_backend.agent import registry
+
+
+def test_shared_http_client_is_reused_until_closed():
+    async def main():
+        client = registry.get_http_client()
+        assert registry.get_http_client() is client
+        assert client.timeout.connect == registry.settings.GENERATION_HTTP_CONNECT_TIMEOUT_SECONDS
+        await registry.close_http_client()
+        assert client.is_closed
+        reopened = registry.get_http_client()
+        assert reopened is not client and not reopened.is_closed
+        await registry.close_http_client()
+
+    asyncio.run(main())
+
+
+def test_model_config_defaults_and_validation(monkeypatch):
+    config = registry.ModelConfig.from_settings(model="other-model")
+    assert config.model == "other-model"
+    assert config.base_url == registry.settings.OPENAI_BASE_URL
+    assert config == registry.ModelConfig.from_settings(model="other-model")
+    monkeypatch.setattr(registry.settings, "OPENAI_API_KEY", "")
+    with pytest.raises(ValueError):
+        registry.ModelConfig.from_settings()
+
+
+def test_system_prompt_follows_request_language(monkeypatch):
+    from genstoryai_backend.agent import character_agent
+    from genstoryai_backend.agent.prompts import SYSTEM_PROMPTS, get_system_prompt
+    from genstoryai_backend.utils.i18n import active_translation, reset_translation
+
+    assert get_system_prompt("character", "en") == SYSTEM_PROMPTS["character"]
+    assert get_system_prompt("character", "zh") != SYSTEM_PROMPTS["character"]
+    assert get_system_prompt("character", "fr") == SYSTEM_PROMPTS["character"]
+
+    calls, keys = [], []
+    monkeypatch.setattr(character_agent, "get_agent", lambda *args: calls.append(args))
+    for language in ("zh", "en"):
+        token = active_translation(language)
+        try:
+            character_agent.get_character_agent()
+            keys.append(character_agent._cache_key("x"))
+        finally:
+            reset_translation(token)
+    assert [call[2] for call in calls] == ["zh", "en"]
+    assert keys[0] != keys[1]
+    assert calls[0][1] == get_system_prompt("character", "zh")
+    assert calls[1][1] == SYSTEM_PROMPTS["character"]
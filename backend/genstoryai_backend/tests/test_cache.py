@@ -0,0 +1,41 @@
+import asyncio
+
+from genstoryai_backend.utils.cache import LRUCache, MemorySharedBackend, TieredCache
+
+
+def test_lru_cache_is_bounded_by_bytes():
+    cache = LRUCache(max_bytes=10, ttl_seconds=60)
+    cache.set("a", b"12345")
+    cache.set("b", b"12345")
+    assert cache.get("a") == b"12345"  # a 变为最近使用
+    cache.set("c", b"123")
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.size_bytes == 8
+
+    cache.set("huge", b"x" * 11)
+    assert cache.get("huge") is None
+
+
+def test_lru_cache_expires_entries():
+    cache = LRUCache(max_bytes=100, ttl_seconds=-1)
+    cache.set("a", b"1")
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_tiered_cache_falls_back_to_shared_backend():
+    shared = MemorySharedBackend()
+    writer = TieredCache("story", LRUCache(100, 60), shared=shared)
+    reader = TieredCache("story", LRUCache(100, 60), shared=shared)
+
+    async def scenario():
+        await writer.set(1, b"payload")
+        assert await reader.get(1) == b"payload"
+        assert await reader.get(1) == b"payload"
+        await writer.invalidate([1])
+        reader.local.clear()
+        assert await reader.get(1) is None
+
+    asyncio.run(scenario())
+    assert (reader.shared_hits, reader.local_hits, reader.misses) == (1, 1, 1)
@@ -0,0 +1,48 @@
+def test_character_crud_roundtrip(client):
+    created = client.post("/character/create/", json={"name": "Alice", "age": 20})
+    assert created.status_code == 200
+
+    listed = client.get("/character/").json()["items"]
+    character_id = next(item["id"] for item in listed if item["name"] == "Alice")
+
+    updated = client.put(f"/character/{character_id}", json={"personality": "brave"})
+    assert updated.status_code == 200
+    assert updated.json()["personality"] == "brave"
+
+    read = client.get(f"/character/{character_id}")
+    assert read.json()["name"] == "Alice"
+    assert client.get(f"/character/{character_id}", headers={"If-None-Match": read.headers["etag"]}).status_code == 304
+    assert client.delete(f"/character/{character_id}").status_code == 200
+    assert client.get(f"/character/{character_id}").status_code == 404
+
+
+def test_character_bulk_endpoints(client):
+    created = client.post("/character/bulk", json=[{"name": f"cast-{index}"} for index in range(3)]).json()
+    assert created["succeeded"] == 3
+    ids = [result["id"] for result in created["results"]]
+
+    updated = client.patch("/character/bulk", json=[
+        {"id": ids[0], "age": 30},
+        {"id": 999999, "age": 1},
+    ]).json()
+    assert [result["ok"] for result in updated["results"]] == [True, False]
+    assert client.get(f"/character/{ids[0]}").json()["age"] == 30
+
+    deleted = client.request("DELETE", "/character/bulk", json=ids[1:]).json()
+    assert deleted["succeeded"] == 2
+    assert client.get(f"/character/{ids[1]}").status_code == 404
+
+
+def test_bulk_create_without_returning(client, monkeypatch):
+    from genstoryai_backend.database.db import async_engine
+
+    # MySQL 没有 INSERT ... RETURNING，走逐行插入
+    monkeypatch.setattr(async_engine.dialect, "insert_executemany_returning_sort_by_parameter_order", False)
+    created = client.post("/character/bulk", json=[
+        {"name": "row-0", "is_deleted": True}, {"name": "row-1"},
+    ]).json()
+    assert created["succeeded"] == 2
+    ids = [result["id"] for result in created["results"]]
+    assert ids[1] == ids[0] + 1
+    # 客户端传入的 is_deleted 被忽略
+    assert [client.get(f"/character/{row_id}").json()["name"] for row_id in ids] == ["row-0", "row-1"]
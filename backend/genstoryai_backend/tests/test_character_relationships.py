@@ -0,0 +1,64 @@
+import json
+
+from genstoryai_backend.database.relationship_graph import RelationshipGraph
+
+
+def _story(client, creator_user_id):
+    client.post("/story/stories/", json={
+        "title": "graph", "creator_user_id": creator_user_id, "story_template_id": None,
+        "ssf": json.dumps({"metadata": {"title": "graph"}, "content_blocks": {"blocks": []},
+                           "characters": {}, "timeline": {}, "extended_metadata": {}}),
+    })
+    return client.get("/story/stories/", params={"creator_user_id": creator_user_id}).json()["items"][0]["id"]
+
+
+def test_relationship_graph_queries(client):
+    story_id = _story(client, 18)
+    results = client.post("/character/bulk", json=[{"name": name} for name in ["A", "B", "C", "D", "E"]]).json()["results"]
+    a, b, c, d, e = [result["id"] for result in results]
+    base = f"/story/stories/{story_id}"
+
+    for source, target, relation_type in [(a, b, "friend"), (b, c, "friend"), (c, d, "rival"), (a, c, "sibling")]:
+        assert client.post(f"{base}/relationships", json={
+            "source_id": source, "target_id": target, "relation_type": relation_type,
+        }).status_code == 200
+    assert client.post(f"{base}/relationships", json={"source_id": a, "target_id": b, "relation_type": "friend"}).status_code == 409
+    assert client.post(f"{base}/relationships", json={"source_id": a, "target_id": a, "relation_type": "self"}).status_code == 400
+
+    graph = client.get(f"{base}/graph").json()
+    assert [node[0] for node in graph["nodes"]] == [a, b, c, d]
+    assert sorted(graph["types"]) == ["friend", "rival", "sibling"]
+    assert len(graph["edges"]) == 4
+
+    neighbors = client.get(f"{base}/graph/neighbors/{a}", params={"depth": 1}).json()
+    assert sorted(node[0] for node in neighbors["graph"]["nodes"]) == [a, b, c]
+    assert neighbors["distances"][0] == 0
+    only_friends = client.get(f"{base}/graph/neighbors/{a}", params={"depth": 2, "relation_type": "friend"}).json()
+    assert sorted(node[0] for node in only_friends["graph"]["nodes"]) == [a, b, c]
+
+    path = client.get(f"{base}/graph/path", params={"source_id": a, "target_id": d}).json()
+    assert path["nodes"] == [a, c, d]
+    assert client.get(f"{base}/graph/path", params={"source_id": a, "target_id": e}).json() == {"nodes": [], "relationships": []}
+
+    assert client.post(f"{base}/relationships", json={"source_id": e, "target_id": d, "relation_type": "friend"}).status_code == 200
+    assert client.get(f"{base}/graph/components").json() == [{"size": 5, "nodes": [a, b, c, d, e]}]
+
+    client.put(f"/character/{b}", json={"name": "B2"})
+    assert [b, "B2"] in client.get(f"{base}/graph").json()["nodes"]
+    client.delete(f"/character/{c}")
+    path = client.get(f"{base}/graph/path", params={"source_id": a, "target_id": d}).json()
+    assert path["nodes"] == []
+    assert len(client.get(f"{base}/relationships", params={"character_id": a}).json()["items"]) == 2
+
+
+def test_relationship_graph_large_cast():
+    count = 5000
+    names = {i: f"c{i}" for i in range(count)}
+    edges = [(i, i, i + 1, "next", 1.0) for i in range(count - 1)]
+    graph = RelationshipGraph(names, edges)
+    nodes, _ = graph.shortest_path(0, count - 1)
+    assert len(nodes) == count
+    order, distances, neighborhood_edges = graph.neighborhood(100, 3)
+    assert sorted(graph.ids[node] for node in order) == list(range(97, 104))
+    assert len(neighborhood_edges) == 6
+    assert len(graph.components()) == 1
@@ -0,0 +1,39 @@
+import time
+
+from genstoryai_backend.agent.generation_cache import GenerationCache, make_key
+from genstoryai_backend.models.character import CharacterCreate
+
+
+def _key(user_prompt, **overrides):
+    params = dict(
+        model="m", base_url="http://host/v1/", system_prompt="sys", language="en",
+        user_prompt=user_prompt, output_type=CharacterCreate,
+    )
+    params.update(overrides)
+    return make_key(**params)
+
+
+def test_key_normalization():
+    assert _key("a  brave\n knight ") == _key("a brave knight")
+    assert _key("x", base_url="HTTP://host/v1") == _key("x")
+    assert _key("x", language="zh") != _key("x")
+    assert _key("x", model="other") != _key("x")
+
+
+def test_ttl_and_lru_eviction(tmp_path):
+    cache = GenerationCache(str(tmp_path / "cache.db"), ttl_seconds=3600, max_entries=10, max_bytes=1 << 20)
+    for index in range(10):
+        cache.set_sync(f"k{index}", f"v{index}")
+    assert cache.get_sync("k0") == "v0"
+    cache.set_sync("k10", "v10")
+    # 超过上限后按访问时间淘汰到 90%，刚访问过的 k0 保留
+    assert cache.get_sync("k0") == "v0"
+    assert cache.get_sync("k1") is None
+    assert cache.stats()["entries"] == 9
+
+    cache.ttl_seconds = 0
+    time.sleep(0.01)
+    assert cache.get_sync("k0") is None
+    stats = cache.stats()
+    assert stats["hits"] == 2 and stats["expired"] == 1
+    cache.close()
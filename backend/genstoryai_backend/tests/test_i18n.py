@@ -0,0 +1,30 @@
+from genstoryai_backend.utils.i18n import (
+    DEFAULT_LANGUAGE,
+    active_translation,
+    get_language,
+    negotiate_language,
+    parse_accept_language,
+    reset_translation,
+)
+
+
+def test_parse_accept_language_orders_by_quality():
+    assert parse_accept_language("en;q=0.5, zh-CN, zh;q=0.9, fr;q=0") == [
+        ("zh-cn", 1.0),
+        ("zh", 0.9),
+        ("en", 0.5),
+    ]
+
+
+def test_negotiate_language_region_fallback():
+    assert negotiate_language("zh-CN,en;q=0.8") == "zh"
+    assert negotiate_language("fr-FR, en-US;q=0.7") == "en"
+    assert negotiate_language("fr") == DEFAULT_LANGUAGE
+    assert negotiate_language("") == DEFAULT_LANGUAGE
+
+
+def test_active_translation_is_context_local():
+    token = active_translation("zh")
+    assert get_language() == "zh"
+    reset_translation(token)
+    assert get_language() == DEFAULT_LANGUAGE
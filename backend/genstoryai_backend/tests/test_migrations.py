@@ -0,0 +1,76 @@
+from sqlalchemy import create_engine, inspect, text
+
+from genstoryai_backend.database.migrations import ensure_columns, ensure_indexes
+
+
+def test_ensure_indexes_adds_missing_indexes(tmp_path):
+    db_engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with db_engine.begin() as connection:
+        # 旧版本创建的 user 表，没有任何索引
+        connection.execute(text(
+            'CREATE TABLE "user" (id INTEGER PRIMARY KEY, username VARCHAR, email VARCHAR, '
+            'is_active BOOLEAN, password VARCHAR, is_verified BOOLEAN, '
+            'verification_token VARCHAR, token_created_at DATETIME)'
+        ))
+
+        connection.execute(text("INSERT INTO \"user\" (id, username, email) VALUES (1, 'old', 'old@example.com')"))
+
+    added = ensure_columns(db_engine)
+    created = ensure_indexes(db_engine)
+
+    assert {"user.create_time", "user.update_time", "user.is_deleted"} <= set(added)
+    with db_engine.connect() as connection:
+        assert connection.execute(text('SELECT is_deleted FROM "user"')).scalar() == 0
+
+    assert {"uq_user_email", "uq_user_username", "uq_user_verification_token", "ix_user_alive_id"} <= set(created)
+    indexes = {index["name"]: index for index in inspect(db_engine).get_indexes("user")}
+    assert indexes["uq_user_email"]["unique"]
+    assert ensure_indexes(db_engine) == []
+
+
+def test_ensure_nullable_columns_rebuilds_sqlite_table(tmp_path):
+    from genstoryai_backend.database.migrations import clear_blank_user_identifiers, ensure_nullable_columns
+
+    db_engine = create_engine(f"sqlite:///{tmp_path / 'not-null.db'}")
+    with db_engine.begin() as connection:
+        # 旧版本的 user 表：用户名、邮箱为 NOT NULL，未填写时保存为空字符串
+        connection.execute(text(
+            'CREATE TABLE "user" (id INTEGER PRIMARY KEY, username VARCHAR NOT NULL, email VARCHAR NOT NULL, '
+            'is_active BOOLEAN, password VARCHAR, is_verified BOOLEAN, verification_token VARCHAR, '
+            'token_created_at DATETIME, create_time DATETIME, update_time DATETIME, is_deleted BOOLEAN)'
+        ))
+        connection.execute(text('CREATE UNIQUE INDEX uq_user_email ON "user" (email)'))
+        connection.execute(text(
+            "INSERT INTO \"user\" (id, username, email, is_active, password, is_verified, create_time, update_time, is_deleted) "
+            "VALUES (1, 'old', '', 1, '', 0, '2025-01-01', '2025-01-01', 0), (2, '', 'b@example.com', 1, '', 0, '2025-01-01', '2025-01-01', 0)"
+        ))
+
+    assert ensure_nullable_columns(db_engine) == ["user.username", "user.email"]
+    clear_blank_user_identifiers(db_engine)
+    columns = {column["name"]: column for column in inspect(db_engine).get_columns("user")}
+    assert columns["email"]["nullable"] and columns["username"]["nullable"]
+    with db_engine.connect() as connection:
+        rows = connection.execute(text('SELECT id, username, email FROM "user" ORDER BY id')).all()
+    assert [tuple(row) for row in rows] == [(1, "old", None), (2, None, "b@example.com")]
+    assert "uq_user_email" in {index["name"] for index in inspect(db_engine).get_indexes("user")}
+    assert ensure_nullable_columns(db_engine) == []
+
+
+def test_release_deleted_user_identifiers(tmp_path):
+    from genstoryai_backend.database.migrations import release_deleted_user_identifiers, run_migrations
+
+    db_engine = create_engine(f"sqlite:///{tmp_path / 'deleted.db'}")
+    run_migrations(db_engine)
+    with db_engine.begin() as connection:
+        connection.execute(text(
+            "INSERT INTO \"user\" (id, username, email, is_active, password, is_verified, create_time, update_time, is_deleted) "
+            "VALUES (7, 'gone', 'gone@example.com', 1, '', 0, '2025-01-01', '2025-01-01', 1), "
+            "(8, 'alive', 'alive@example.com', 1, '', 0, '2025-01-01', '2025-01-01', 0)"
+        ))
+    release_deleted_user_identifiers(db_engine)
+    release_deleted_user_identifiers(db_engine)
+    with db_engine.connect() as connection:
+        rows = connection.execute(text('SELECT username, email FROM "user" ORDER BY id')).all()
+    assert [tuple(row) for row in rows] == [
+        ("gone#deleted-7", "gone@example.com#deleted-7"), ("alive", "alive@example.com"),
+    ]
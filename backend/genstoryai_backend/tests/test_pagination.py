@@ -0,0 +1,28 @@
+import pytest
+
+from genstoryai_backend.database.pagination import encode_cursor
+
+# 类型不对的游标：嵌套列表、字符串、布尔值、超出整数范围、带时区的时间
+_FORGED_ID_CURSORS = [[[1]], ["x"], [True], [2 ** 70], [{"dt": "2000-01-01T00:00:00"}]]
+_FORGED_TIME_ID_CURSORS = [
+    [[1], "x"], [1, 2], [{"dt": 5}, 1], [{"dt": "2000-01-01T00:00:00+08:00"}, 1], [{"dt": "2000-01-01T00:00:00"}, "x"],
+]
+
+
+def _story_id(client):
+    response = client.post("/story/stories/", json={"title": "cursor", "creator_user_id": 21, "story_template_id": None})
+    return response.json()["id"]
+
+
+@pytest.mark.parametrize("path, forged", [
+    ("/character/", _FORGED_ID_CURSORS),
+    ("/user/users/", _FORGED_ID_CURSORS),
+    ("/story/stories/", _FORGED_TIME_ID_CURSORS),
+    ("/story/stories/{story_id}/relationships", _FORGED_ID_CURSORS),
+    ("/timeline/events/", _FORGED_TIME_ID_CURSORS),
+])
+def test_forged_cursors_are_rejected(client, path, forged):
+    story_id = _story_id(client)
+    for values in forged:
+        params = {"story_id": story_id, "cursor": encode_cursor(values)}
+        assert client.get(path.format(story_id=story_id), params=params).status_code == 400, values
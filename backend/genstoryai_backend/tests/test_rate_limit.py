@@ -0,0 +1,89 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from genstoryai_backend.agent import character_agent
+from genstoryai_backend.models.character import CharacterCreate
+from genstoryai_backend.utils.rate_limit import RateLimiter, TokenBucket, retry_async
+
+
+class RateLimited(Exception):
+    status_code = 429
+
+
+def test_token_bucket_reserve_and_adjust():
+    bucket = TokenBucket(per_minute=60)
+    assert bucket.reserve(60) == 0
+    # 透支 3 个令牌，按每秒 1 个补充需要等待约 3 秒
+    assert bucket.reserve(3) == pytest.approx(3, abs=0.1)
+    bucket.adjust(-63)
+    assert bucket.tokens == pytest.approx(60, abs=0.1)
+
+
+async def always_limited():
+    raise RateLimited()
+
+
+def test_limiter_concurrency_and_retry():
+    async def main():
+        limiter = RateLimiter(2)
+        peak = 0
+
+        async def call():
+            nonlocal peak
+            async with limiter.slot():
+                peak = max(peak, limiter.active)
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(*(call() for _ in range(6)))
+        assert peak == 2
+
+        attempts = []
+
+        async def flaky():
+            attempts.append(time.monotonic())
+            if len(attempts) < 3:
+                raise RateLimited()
+            return "ok"
+
+        assert await retry_async(flaky, retries=3, base_delay=0.01, max_delay=0.02, limiter=limiter) == "ok"
+        assert limiter.throttled == 2
+        with pytest.raises(RateLimited):
+            await retry_async(always_limited, retries=1, base_delay=0, max_delay=0)
+
+    asyncio.run(main())
+
+
+def test_generate_batch_partial_results(client, monkeypatch):
+    class FakeAgent:
+        async def run(self, user_prompt):
+            if user_prompt == "broken":
+                raise ValueError("model failed")
+            return SimpleNamespace(
+                output=CharacterCreate(name=user_prompt), usage=lambda: SimpleNamespace(total_tokens=10),
+            )
+
+    monkeypatch.setattr(character_agent, "get_character_agent", lambda: FakeAgent())
+    monkeypatch.setattr(character_agent, "generation_limiter", RateLimiter(4))
+    response = client.post("/character/generate/batch", json={
+        "prompts": ["Alice", "broken", "Bob"], "persist": True, "use_cache": False,
+    })
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["succeeded"], body["failed"]) == (2, 1)
+    results = body["results"]
+    assert [item["ok"] for item in results] == [True, False, True]
+    assert results[1]["error"] == "model failed"
+    assert client.get(f"/character/{results[2]['id']}").json()["name"] == "Bob"
+
+    response = client.post("/character/generate/batch", json={"prompt": "Carol", "count": 3, "use_cache": False})
+    assert [item["character"]["name"] for item in response.json()["results"]] == ["Carol"] * 3
+    assert client.post("/character/generate/batch", json={"count": 2}).status_code == 422
+    # 数量上限在展开提示词之前校验
+    from genstoryai_backend.config import settings
+
+    too_many = settings.GENERATION_BATCH_MAX_ITEMS + 1
+    assert client.post("/character/generate/batch", json={"prompt": "x", "count": too_many}).status_code == 422
+    assert client.post("/character/generate/batch", json={"prompts": ["x"] * too_many}).status_code == 422
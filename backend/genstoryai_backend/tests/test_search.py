@@ -0,0 +1,66 @@
+import json
+
+
+def _ssf(blocks):
+    return json.dumps({
+        "metadata": {"title": "search"}, "content_blocks": {"blocks": blocks},
+        "characters": {}, "timeline": {}, "extended_metadata": {},
+    })
+
+
+def _search(client, q, **params):
+    response = client.get("/search/", params={"q": q, **params})
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_search_stays_in_sync_with_writes(client):
+    client.post("/story/stories/", json={
+        "title": "星海迷航记", "summary": "一艘飞船穿越银河", "creator_user_id": 17, "genre": "science_fiction",
+        "story_template_id": None, "ssf": _ssf(["很久很久以前有个王子", "他住在城堡里"]),
+    })
+    story_id = client.get("/story/stories/", params={"creator_user_id": 17}).json()["items"][0]["id"]
+
+    hits = _search(client, "星海迷航")
+    assert [(hit["kind"], hit["id"]) for hit in hits] == [("story", story_id)]
+    assert "<mark>" in hits[0]["snippet"]
+
+    hits = _search(client, "以前有 王子", kind="block")
+    assert [(hit["story_id"], hit["block_index"]) for hit in hits] == [(story_id, 0)]
+    assert _search(client, "以前有", genre="science_fiction")
+    assert not _search(client, "以前有", genre="horror")
+
+    client.put(f"/story/stories/{story_id}/blocks/0", json={"content": "从前有座山"})
+    assert not _search(client, "以前有")
+    assert _search(client, "从前有座", kind="block")
+
+    client.delete(f"/story/stories/{story_id}")
+    assert not _search(client, "星海迷航")
+    assert not _search(client, "从前有座")
+
+
+def test_search_characters_and_special_characters(client):
+    client.post("/character/create/", json={"name": "艾莉丝", "description": "来自北方的剑士, 100% loyal"})
+    hits = _search(client, "北方的剑士", kind="character")
+    assert [hit["title"] for hit in hits] == ["艾莉丝"]
+    assert _search(client, "100%", kind="character")
+    assert _search(client, 'loyal" OR', kind="character") == []
+    assert not _search(client, "%%", kind="character")
+
+
+def test_short_terms_return_like_snippets(client):
+    client.post("/story/stories/", json={
+        "title": "短词", "creator_user_id": 18, "story_template_id": None,
+        "ssf": _ssf(["第一章 " + "铺垫" * 20 + "公主醒来了，窗外下着雨" + "尾声" * 20, "Go west"]),
+    })
+    story_id = client.get("/story/stories/", params={"creator_user_id": 18}).json()["items"][0]["id"]
+
+    hits = _search(client, "公主", kind="block")
+    assert [(hit["story_id"], hit["block_index"]) for hit in hits] == [(story_id, 0)]
+    snippet = hits[0]["snippet"]
+    assert "<mark>公主</mark>醒来了" in snippet
+    assert snippet.startswith("…") and snippet.endswith("…")
+    assert snippet != "block"
+
+    hits = _search(client, "GO", kind="block")
+    assert [hit["snippet"] for hit in hits if hit["story_id"] == story_id] == ["<mark>Go</mark> west"]
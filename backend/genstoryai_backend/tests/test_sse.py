@@ -0,0 +1,77 @@
+import asyncio
+
+from genstoryai_backend.utils.sse import format_sse, sse_stream
+
+
+class _Request:
+    def __init__(self):
+        self.disconnected = False
+
+    async def is_disconnected(self):
+        return self.disconnected
+
+
+def test_format_sse():
+    assert format_sse({"name": "艾莉丝"}, event="partial") == 'event: partial\ndata: {"name":"艾莉丝"}\n\n'
+    assert format_sse("a\nb") == "data: a\ndata: b\n\n"
+
+
+def test_sse_stream_heartbeat_error_and_disconnect():
+    async def scenario():
+        closed = []
+
+        async def events():
+            try:
+                yield "partial", {"name": "A"}
+                await asyncio.sleep(0.05)
+                yield "result", {"name": "Alice"}
+                await asyncio.sleep(10)
+            finally:
+                closed.append(True)
+
+        request = _Request()
+        chunks = []
+        async for chunk in sse_stream(request, events(), heartbeat=0.01):
+            chunks.append(chunk)
+            if chunk.startswith("event: result"):
+                request.disconnected = True
+        assert chunks[0].startswith("event: partial")
+        assert ": ping\n\n" in chunks
+        assert closed == [True]
+
+        async def failing():
+            yield "partial", {}
+            raise RuntimeError("model unavailable")
+
+        chunks = [chunk async for chunk in sse_stream(_Request(), failing())]
+        assert chunks[-1] == 'event: error\ndata: {"detail":"model unavailable"}\n\n'
+
+    asyncio.run(scenario())
+
+
+def test_sse_stream_closes_upstream_when_queue_is_full():
+    async def scenario():
+        closed = []
+
+        async def events():
+            try:
+                for index in range(100):
+                    yield "partial", {"index": index}
+            finally:
+                closed.append(asyncio.current_task())
+
+        upstream = events()
+        request = _Request()
+        stream = sse_stream(request, upstream, heartbeat=1)
+        assert (await stream.__anext__()).startswith("event: partial")
+        # 生产者填满队列后阻塞在 queue.put，此时客户端断开
+        await asyncio.sleep(0.01)
+        request.disconnected = True
+        async for _ in stream:
+            pass
+        # upstream 仍被引用，不会被垃圾回收；上游必须在生产者 task 中已经关闭
+        assert len(closed) == 1
+        assert closed[0] is not asyncio.current_task()
+        assert upstream.ag_frame is None
+
+    asyncio.run(scenario())
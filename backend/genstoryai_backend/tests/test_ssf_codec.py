@@ -0,0 +1,148 @@
+import json
+
+import pytest
+
+from genstoryai_backend.ssf.codec import codec_of, decode_ssf, encode_ssf, recode_ssf
+
+
+def _document(blocks: int) -> str:
+    return json.dumps({
+        "metadata": {"title": "codec", "summary": "简介" * 500},
+        "content_blocks": {"blocks": [f"第{index}章 很久很久以前……" * 20 for index in range(blocks)]},
+        "characters": {}, "timeline": {}, "extended_metadata": {},
+    }, ensure_ascii=False)
+
+
+def test_encode_roundtrip_and_legacy_plain_text():
+    document = _document(50)
+    encoded = encode_ssf(document, "zlib")
+    assert codec_of(encoded) == "zlib"
+    assert len(encoded) < len(document) // 3
+    assert decode_ssf(encoded) == document
+    assert encode_ssf(encoded, "zlib") == encoded
+
+    # 压缩之前写入的明文，以及小于阈值的文档，都按明文读取
+    assert codec_of(document) == "none"
+    assert decode_ssf(document) == document
+    assert encode_ssf('{"a": 1}', "zlib") == '{"a": 1}'
+    assert recode_ssf(encoded, "none") == document
+
+
+def test_unknown_codec_is_rejected():
+    with pytest.raises(ValueError):
+        encode_ssf(_document(50), "brotli")
+
+
+def test_story_ssf_is_stored_compressed(client):
+    from sqlmodel import Session
+
+    from genstoryai_backend.database.db import engine
+    from genstoryai_backend.database.jobs import recompress_stories
+    from genstoryai_backend.models.story import Story
+
+    document = _document(50)
+    created = client.post("/story/stories/", json={"title": "compressed", "creator_user_id": 11, "story_template_id": None, "ssf": document}).json()
+    story_id = client.get("/story/stories/", params={"creator_user_id": 11}).json()["items"][0]["id"]
+    assert created["id"] == story_id
+    assert json.loads(created["ssf"])["metadata"]["title"] == "codec"
+    # 请求中不接受存储格式，避免在校验请求时解压客户端数据
+    bomb = encode_ssf(json.dumps({"metadata": {"title": "x" * 1_000_000}}), "zlib")
+    assert client.post("/story/stories/", json={"title": "bomb", "creator_user_id": 11, "story_template_id": None, "ssf": bomb}).status_code == 422
+    assert client.put(f"/story/stories/{story_id}", json={"ssf": bomb}).status_code == 422
+
+    with Session(engine) as session:
+        story = session.get(Story, story_id)
+        assert codec_of(story.ssf) == "zlib"
+        assert story.ssf_obj.metadata.title == "codec"
+        update_time = story.update_time
+    # 正文保存在 story_block 中：故事详情的 ssf 中 blocks 为空，完整文档通过 /ssf 导出
+    stored = json.loads(document)
+    stored["content_blocks"]["blocks"] = []
+    assert json.loads(client.get(f"/story/stories/{story_id}").json()["ssf"]) == stored
+    assert client.get(f"/story/stories/{story_id}/ssf").json() == json.loads(document)
+
+    assert recompress_stories("none") >= 1
+    with Session(engine) as session:
+        story = session.get(Story, story_id)
+        assert codec_of(story.ssf) == "none"
+        assert story.update_time == update_time
+    recompress_stories()
+
+
+def test_ssf_obj_parse_is_memoized_and_lazy():
+    from genstoryai_backend.models.story import Story
+    from genstoryai_backend.ssf.parse_cache import ssf_parse_cache
+
+    story = Story(id=123456, title="parsed", creator_user_id=1, story_template_id=None, ssf=encode_ssf(_document(50)))
+    lazy = story.ssf_lazy
+    assert lazy.metadata.title == "codec"
+    assert not lazy.is_loaded
+
+    hits = ssf_parse_cache.hits
+    first = story.ssf_obj
+    assert lazy.is_loaded
+    assert story.ssf_obj is first
+    assert ssf_parse_cache.hits == hits + 2
+
+    changed = first.model_copy(update={"metadata": first.metadata.model_copy(update={"title": "renamed"})})
+    # 正文保存在 story_block 中，不能再通过 ssf_obj 写回 ssf 列
+    with pytest.raises(ValueError):
+        story.ssf_obj = changed
+    changed = changed.model_copy(update={"content_blocks": changed.content_blocks.model_copy(update={"blocks": []})})
+    story.ssf_obj = changed
+    assert story.ssf_obj is changed
+    assert json.loads(decode_ssf(story.ssf))["metadata"]["title"] == "renamed"
+    assert json.loads(decode_ssf(story.ssf))["content_blocks"]["blocks"] == []
+
+
+def test_lazy_ssf_full_is_thread_safe():
+    import sys
+    import threading
+
+    from genstoryai_backend.ssf.ssf import LazyStorySchemaFormat
+
+    document = _document(20)
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        for _ in range(20):
+            lazy = LazyStorySchemaFormat(document)
+            barrier = threading.Barrier(8)
+            results, errors = [], []
+
+            def load():
+                barrier.wait()
+                try:
+                    results.append(lazy.full())
+                except Exception as e:
+                    errors.append(e)
+
+            threads = [threading.Thread(target=load) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            assert errors == []
+            assert all(result is results[0] for result in results)
+    finally:
+        sys.setswitchinterval(interval)
+
+
+def test_story_export_uses_parse_cache(client, caplog):
+    from genstoryai_backend.models.story import Story
+    from genstoryai_backend.ssf.parse_cache import ssf_parse_cache
+
+    document = json.loads(_document(3))
+    document["characters"] = {"艾莉丝": {"role": "主角"}}
+    story_id = client.post("/story/stories/", json={
+        "title": "cached", "creator_user_id": 12, "story_template_id": None, "ssf": json.dumps(document, ensure_ascii=False),
+    }).json()["id"]
+    assert client.get(f"/story/stories/{story_id}/ssf").json() == document
+    hits = ssf_parse_cache.hits
+    # 整篇读取不再重复解析 ssf；模型中没有定义的字段原样导出
+    assert client.get(f"/story/stories/{story_id}/ssf").json() == document
+    assert ssf_parse_cache.hits > hits
+
+    with caplog.at_level("WARNING", logger="genstoryai_backend.models.story"):
+        assert Story(id=654321, title="broken", creator_user_id=1, story_template_id=None, ssf="[1, 2]").ssf_lazy is None
+    assert "Error parsing SSF JSON of story 654321" in caplog.text
@@ -0,0 +1,48 @@
+import json
+
+import pytest
+
+from genstoryai_backend.ssf.container import (
+    ContainerError, ContainerReader, container_to_json, encode_container, json_to_container, write_container,
+)
+
+
+def _document():
+    return {
+        "metadata": {"title": "container", "author": "", "genre": "fantasy", "summary": "", "version": 1},
+        "content_blocks": {"blocks": [f"第{index}章" * (index + 1) for index in range(20)], "style": "plain"},
+        "characters": {}, "timeline": {}, "extended_metadata": {"custom": [1, 2]},
+    }
+
+
+@pytest.mark.parametrize("codec", ["none", "zlib"])
+def test_container_roundtrip_is_lossless(codec):
+    document = _document()
+    data = json_to_container(json.dumps(document), codec)
+    assert json.loads(container_to_json(data)) == document
+    assert document["content_blocks"]["blocks"]
+
+
+def test_container_random_access_from_mmap(tmp_path):
+    path = tmp_path / "story.ssfb"
+    with open(path, "wb") as fp:
+        write_container(_document(), fp)
+
+    with ContainerReader.open(str(path)) as reader:
+        assert len(reader) == 20
+        assert reader.metadata()["metadata"]["title"] == "container"
+        assert "blocks" not in reader.metadata()["content_blocks"]
+        assert reader.block(7) == "第7章" * 8
+        assert list(reader.blocks(18)) == ["第18章" * 19, "第19章" * 20]
+        assert reader.to_document().metadata.title == "container"
+
+
+def test_container_rejects_corruption():
+    data = bytearray(encode_container(_document(), "zlib"))
+    with pytest.raises(ContainerError):
+        ContainerReader(bytes(data[:-1]))
+    # 修改第一个块的内容
+    offset = ContainerReader(bytes(data))._meta[0] + ContainerReader(bytes(data))._meta[1]
+    data[offset] ^= 0xFF
+    with pytest.raises(ContainerError):
+        ContainerReader(bytes(data)).block(0)
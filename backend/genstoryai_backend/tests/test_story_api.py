@@ -0,0 +1,115 @@
+def _create_story(client, title, **fields):
+    response = client.post("/story/stories/", json={"title": title, "creator_user_id": 1, "story_template_id": None, **fields})
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_story_keyset_pagination(client):
+    for index in range(5):
+        _create_story(client, f"paged-{index}", creator_user_id=42, genre="mystery")
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 2, "creator_user_id": 42, "genre": "mystery"}
+        if cursor:
+            params["cursor"] = cursor
+        page = client.get("/story/stories/", params=params).json()
+        seen.extend(item["title"] for item in page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert seen == [f"paged-{index}" for index in reversed(range(5))]
+    assert client.get("/story/stories/", params={"cursor": "not-a-cursor"}).status_code == 400
+
+
+def test_soft_delete_hides_story_until_purged(client):
+    from sqlmodel import Session
+
+    from genstoryai_backend.database.db import engine
+    from genstoryai_backend.database.jobs import purge_all_deleted
+    from genstoryai_backend.models.story import Story
+
+    _create_story(client, "to-delete", creator_user_id=7)
+    story_id = client.get("/story/stories/", params={"creator_user_id": 7}).json()["items"][0]["id"]
+
+    assert client.delete(f"/story/stories/{story_id}").status_code == 200
+    assert client.get(f"/story/stories/{story_id}").status_code == 404
+    assert client.get("/story/stories/", params={"creator_user_id": 7}).json()["items"] == []
+    with Session(engine) as session:
+        assert session.get(Story, story_id).is_deleted
+
+    assert purge_all_deleted(retention_days=-1)["story"] >= 1
+    with Session(engine) as session:
+        assert session.get(Story, story_id) is None
+
+
+def test_story_reads_are_cached_and_invalidated(client):
+    from genstoryai_backend.database.entity_cache import story_cache
+
+    _create_story(client, "cached", creator_user_id=8)
+    story_id = client.get("/story/stories/", params={"creator_user_id": 8}).json()["items"][0]["id"]
+
+    first = client.get(f"/story/stories/{story_id}").json()
+    hits = story_cache.local_hits
+    assert client.get(f"/story/stories/{story_id}").json() == first
+    assert story_cache.local_hits == hits + 1
+
+    client.put(f"/story/stories/{story_id}", json={"title": "cached-v2"})
+    assert client.get(f"/story/stories/{story_id}").json()["title"] == "cached-v2"
+
+
+def test_story_list_omits_ssf_body(client):
+    ssf = '{"metadata": {"title": "lean"}, "content_blocks": {"blocks": ["a"]}, "characters": {}, "timeline": {}, "extended_metadata": {}}'
+    _create_story(client, "lean", creator_user_id=9, ssf=ssf)
+
+    item = client.get("/story/stories/", params={"creator_user_id": 9}).json()["items"][0]
+    assert "ssf" not in item
+    assert item["title"] == "lean"
+
+    body = client.get(f"/story/stories/{item['id']}/ssf")
+    assert body.status_code == 200
+    assert body.json()["content_blocks"]["blocks"] == ["a"]
+
+
+def test_story_conditional_get_and_if_match(client):
+    _create_story(client, "etag", creator_user_id=10)
+    story_id = client.get("/story/stories/", params={"creator_user_id": 10}).json()["items"][0]["id"]
+
+    first = client.get(f"/story/stories/{story_id}")
+    etag = first.headers["etag"]
+    assert etag == f'"{story_id}-1"'
+    assert client.get(f"/story/stories/{story_id}", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get(
+        f"/story/stories/{story_id}", headers={"If-Modified-Since": first.headers["last-modified"]}
+    ).status_code == 304
+
+    updated = client.put(f"/story/stories/{story_id}", json={"title": "etag-v2"}, headers={"If-Match": etag})
+    assert updated.status_code == 200
+    assert updated.json()["version"] == 2
+    assert updated.headers["etag"] == f'"{story_id}-2"'
+
+    stale = client.put(f"/story/stories/{story_id}", json={"title": "lost"}, headers={"If-Match": etag})
+    assert stale.status_code == 412
+    assert client.get(f"/story/stories/{story_id}", headers={"If-None-Match": etag}).json()["title"] == "etag-v2"
+
+
+def test_hard_bulk_delete_is_one_transaction(client, monkeypatch):
+    import pytest
+
+    from genstoryai_backend.config import settings
+    from genstoryai_backend.database.crud import story_crud
+
+    story_id = _create_story(client, "atomic", creator_user_id=11, ssf=None)["id"]
+    client.post(f"/story/stories/{story_id}/blocks", json={"content": "kept"})
+
+    async def failing(db, story_ids):
+        raise RuntimeError("boom")
+    monkeypatch.setattr(settings, "SOFT_DELETE", False)
+    monkeypatch.setattr(story_crud, "delete_story_timelines_async", failing)
+    with pytest.raises(RuntimeError):
+        client.request("DELETE", "/story/stories/bulk", json=[story_id])
+    monkeypatch.undo()
+    # 关联数据删除失败时故事本身也不会被删除
+    assert client.get(f"/story/stories/{story_id}").status_code == 200
+    assert [block["content"] for block in client.get(f"/story/stories/{story_id}/blocks").json()] == ["kept"]
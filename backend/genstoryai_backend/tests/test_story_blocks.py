@@ -0,0 +1,85 @@
+import json
+
+
+def _ssf(blocks):
+    return json.dumps({
+        "metadata": {"title": "blocks"}, "content_blocks": {"blocks": blocks},
+        "characters": {}, "timeline": {}, "extended_metadata": {},
+    })
+
+
+def _contents(client, story_id, **params):
+    response = client.get(f"/story/stories/{story_id}/blocks", params=params)
+    assert response.status_code == 200
+    return [block["content"] for block in response.json()]
+
+
+def test_block_edits_and_export(client):
+    client.post("/story/stories/", json={"title": "blocks", "creator_user_id": 12, "story_template_id": None, "ssf": _ssf(["a", "b", "c"])})
+    story_id = client.get("/story/stories/", params={"creator_user_id": 12}).json()["items"][0]["id"]
+
+    assert _contents(client, story_id) == ["a", "b", "c"]
+    assert _contents(client, story_id, start=1, end=2) == ["b"]
+
+    assert client.post(f"/story/stories/{story_id}/blocks", params={"index": 1}, json={"content": "a2"}).json()["block_index"] == 1
+    assert client.put(f"/story/stories/{story_id}/blocks/3", json={"content": "c2"}).json()["content"] == "c2"
+    assert client.delete(f"/story/stories/{story_id}/blocks/0").status_code == 200
+    assert _contents(client, story_id) == ["a2", "b", "c2"]
+
+    reordered = client.post(f"/story/stories/{story_id}/blocks/reorder", json={"order": [2, 0, 1]}).json()
+    assert [block["content"] for block in reordered] == ["c2", "a2", "b"]
+    assert client.post(f"/story/stories/{story_id}/blocks/reorder", json={"order": [0, 0, 1]}).status_code == 400
+    assert client.get(f"/story/stories/{story_id}/blocks/9").status_code == 404
+
+    exported = client.get(f"/story/stories/{story_id}/ssf").json()
+    assert exported["metadata"]["title"] == "blocks"
+    assert exported["content_blocks"]["blocks"] == ["c2", "a2", "b"]
+
+
+def test_legacy_ssf_blocks_are_migrated_on_first_access(client):
+    from sqlmodel import Session
+
+    from genstoryai_backend.database.db import engine
+    from genstoryai_backend.models.story import Story
+
+    with Session(engine) as session:
+        story = Story(title="legacy", creator_user_id=13, story_template_id=None, ssf=_ssf(["x", "y"]))
+        session.add(story)
+        session.commit()
+        story_id = story.id
+
+    assert _contents(client, story_id) == ["x", "y"]
+    with Session(engine) as session:
+        assert json.loads(session.get(Story, story_id).ssf)["content_blocks"]["blocks"] == []
+    assert client.get(f"/story/stories/{story_id}/ssf").json()["content_blocks"]["blocks"] == ["x", "y"]
+
+
+def test_story_update_replaces_blocks_and_block_edits_bump_version(client, monkeypatch):
+    client.post("/story/stories/", json={"title": "put", "creator_user_id": 14, "story_template_id": None, "ssf": _ssf(["a", "b"])})
+    story_id = client.get("/story/stories/", params={"creator_user_id": 14}).json()["items"][0]["id"]
+
+    response = client.put(f"/story/stories/{story_id}", json={"ssf": _ssf(["NEW1", "NEW2", "NEW3"])})
+    assert response.status_code == 200
+    assert _contents(client, story_id) == ["NEW1", "NEW2", "NEW3"]
+    assert client.get(f"/story/stories/{story_id}/ssf").json()["content_blocks"]["blocks"] == ["NEW1", "NEW2", "NEW3"]
+    # ssf 中没有 blocks 时正文保持不变
+    document = json.loads(_ssf([]))
+    del document["content_blocks"]["blocks"]
+    client.put(f"/story/stories/{story_id}", json={"ssf": json.dumps(document), "summary": "kept"})
+    assert _contents(client, story_id) == ["NEW1", "NEW2", "NEW3"]
+
+    etag = client.get(f"/story/stories/{story_id}").headers["ETag"]
+    client.put(f"/story/stories/{story_id}/blocks/0", json={"content": "edited"})
+    story = client.get(f"/story/stories/{story_id}")
+    assert story.headers["ETag"] != etag
+    assert client.put(f"/story/stories/{story_id}", json={"summary": "x"}, headers={"If-Match": etag}).status_code == 412
+
+    # 模拟两个并发插入读到相同的块数
+    from genstoryai_backend.database.crud import story_block_crud
+
+    async def stale_count(db, story_id):
+        return 1
+    monkeypatch.setattr(story_block_crud, "_block_count", stale_count)
+    assert client.post(f"/story/stories/{story_id}/blocks", json={"content": "late"}).status_code == 409
+    monkeypatch.undo()
+    assert _contents(client, story_id) == ["edited", "NEW2", "NEW3"]
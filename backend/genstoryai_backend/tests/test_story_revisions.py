@@ -0,0 +1,86 @@
+import json
+
+
+def _create(client, blocks, creator_user_id):
+    ssf = json.dumps({"metadata": {"title": "history"}, "content_blocks": {"blocks": blocks}, "characters": {}, "timeline": {}, "extended_metadata": {}})
+    client.post("/story/stories/", json={"title": "history", "creator_user_id": creator_user_id, "story_template_id": None, "ssf": ssf})
+    return client.get("/story/stories/", params={"creator_user_id": creator_user_id}).json()["items"][0]["id"]
+
+
+def _blocks(client, story_id):
+    return [block["content"] for block in client.get(f"/story/stories/{story_id}/blocks").json()]
+
+
+def _revisions(client, story_id):
+    return [item["revision"] for item in client.get(f"/story/stories/{story_id}/revisions").json()]
+
+
+def test_revisions_store_deltas_and_restore(client):
+    story_id = _create(client, ["a", "b", "c"], creator_user_id=17)
+    # 创建故事时记录第一个版本；内容没有变化时不产生新版本，只补上说明
+    first = client.post(f"/story/stories/{story_id}/revisions", json={"message": "draft"}).json()
+    assert (first["revision"], first["kind"], first["message"]) == (1, "snapshot", "draft")
+    assert client.post(f"/story/stories/{story_id}/revisions", json={}).json()["revision"] == 1
+
+    client.put(f"/story/stories/{story_id}/blocks/1", json={"content": "b2"})
+    client.post(f"/story/stories/{story_id}/blocks", json={"content": "d"})
+    second, third = client.get(f"/story/stories/{story_id}/revisions").json()[1::-1]
+    assert (second["revision"], second["kind"], second["block_count"]) == (2, "delta", 3)
+    assert (third["revision"], third["block_count"]) == (3, 4)
+
+    delta = client.get(f"/story/stories/{story_id}/revisions/2/delta").json()
+    assert delta["ops"] == [["c", 0, 1], ["i", ["b2"]], ["c", 2, 3]]
+    assert client.get(f"/story/stories/{story_id}/revisions/1").json()["content_blocks"]["blocks"] == ["a", "b", "c"]
+
+    restored = client.post(f"/story/stories/{story_id}/revisions/1/restore").json()
+    assert (restored["revision"], restored["message"]) == (4, "Restore revision 1")
+    assert _blocks(client, story_id) == ["a", "b", "c"]
+    assert _revisions(client, story_id) == [4, 3, 2, 1]
+    assert client.get(f"/story/stories/{story_id}/revisions/9").status_code == 404
+
+
+def test_story_updates_record_revisions(client):
+    story_id = _create(client, ["a"], creator_user_id=19)
+    ssf = json.dumps({"metadata": {"title": "history"}, "content_blocks": {"blocks": ["a", "b"]}, "characters": {}, "timeline": {}, "extended_metadata": {}})
+    client.put(f"/story/stories/{story_id}", json={"ssf": ssf})
+    assert client.patch("/story/stories/bulk", json=[{"id": story_id, "summary": "changed"}]).json()["succeeded"] == 1
+    assert _revisions(client, story_id) == [2, 1]
+    assert client.get(f"/story/stories/{story_id}/revisions/2").json()["content_blocks"]["blocks"] == ["a", "b"]
+
+    ssf = ssf.replace('"history"', '"renamed"')
+    client.patch("/story/stories/bulk", json=[{"id": story_id, "ssf": ssf}])
+    assert _revisions(client, story_id) == [3, 2, 1]
+    assert client.get(f"/story/stories/{story_id}/revisions/3").json()["metadata"]["title"] == "renamed"
+
+
+def test_consecutive_edits_are_coalesced(client, monkeypatch):
+    from genstoryai_backend.config import settings
+
+    story_id = _create(client, ["a"], creator_user_id=20)
+    monkeypatch.setattr(settings, "STORY_REVISION_COALESCE_SECONDS", 3600)
+    for content in ["b", "c", "d"]:
+        client.post(f"/story/stories/{story_id}/blocks", json={"content": content})
+    # 第一个版本是快照，不参与合并；之后的修改合并为一个版本
+    assert _revisions(client, story_id) == [2, 1]
+    assert client.get(f"/story/stories/{story_id}/revisions/2").json()["content_blocks"]["blocks"] == ["a", "b", "c", "d"]
+    # 带说明的版本不会被改写
+    client.post(f"/story/stories/{story_id}/revisions", json={"message": "checkpoint"})
+    client.delete(f"/story/stories/{story_id}/blocks/3")
+    assert _revisions(client, story_id) == [3, 2, 1]
+    # 合并的修改改回原样时删除该版本
+    client.post(f"/story/stories/{story_id}/blocks", json={"content": "d"})
+    assert _revisions(client, story_id) == [2, 1]
+
+
+def test_compaction_keeps_latest_revisions_restorable(client):
+    from genstoryai_backend.database.jobs import compact_revisions
+
+    story_id = _create(client, ["x"], creator_user_id=18)
+    for index in range(4):
+        client.post(f"/story/stories/{story_id}/blocks", json={"content": f"y{index}"})
+
+    assert compact_revisions(keep=2) >= 2
+    revisions = client.get(f"/story/stories/{story_id}/revisions").json()
+    assert [item["revision"] for item in revisions] == [5, 4]
+    assert revisions[-1]["kind"] == "snapshot"
+    assert client.get(f"/story/stories/{story_id}/revisions/5").json()["content_blocks"]["blocks"] == ["x", "y0", "y1", "y2", "y3"]
@@ -0,0 +1,100 @@
+import json
+
+
+def _ndjson(blocks, title="streamed", creator_user_id=14):
+    lines = [{"type": "header", "story": {"title": title, "creator_user_id": creator_user_id}, "ssf": {"metadata": {"title": title}}}]
+    lines += [{"type": "block", "content": content} for content in blocks]
+    return "\n".join(json.dumps(line, ensure_ascii=False) for line in lines) + "\n"
+
+
+def test_ndjson_import_and_streaming_export(client, monkeypatch):
+    from genstoryai_backend.config import settings
+
+    monkeypatch.setattr(settings, "SSF_STREAM_BATCH_SIZE", 3)
+    blocks = [f"第{index}段" for index in range(10)]
+
+    imported = client.post("/story/stories/import", content=_ndjson(blocks).encode())
+    assert imported.status_code == 200
+    story_id = imported.json()["id"]
+
+    exported = client.get(f"/story/stories/{story_id}/export")
+    assert exported.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in exported.text.splitlines()]
+    assert lines[0]["story"]["title"] == "streamed"
+    assert [line["content"] for line in lines[1:]] == blocks
+
+    document = client.get(f"/story/stories/{story_id}/export", params={"format": "json"}).json()
+    assert document["metadata"]["title"] == "streamed"
+    assert document["content_blocks"]["blocks"] == blocks
+    assert document == client.get(f"/story/stories/{story_id}/ssf").json()
+
+    # 重新导入导出的内容得到同样的正文
+    again = client.post("/story/stories/import", content=exported.content).json()
+    assert client.get(f"/story/stories/{again['id']}/ssf").json()["content_blocks"]["blocks"] == blocks
+
+
+def test_ndjson_import_rejects_invalid_lines(client):
+    body = _ndjson(["ok"], title="broken", creator_user_id=15) + '{"type": "block"}\n'
+    response = client.post("/story/stories/import", content=body.encode())
+    assert response.status_code == 400
+    assert "line 3" in response.json()["detail"]
+    assert client.get("/story/stories/", params={"creator_user_id": 15}).json()["items"] == []
+
+
+def test_ndjson_import_does_not_hold_write_lock_while_receiving(client):
+    import asyncio
+
+    from genstoryai_backend.database.crud import create_character_async, import_story_async
+    from genstoryai_backend.database.db import async_session_maker
+    from genstoryai_backend.models.character import CharacterCreate
+
+    async def main():
+        async def slow_upload():
+            for index, line in enumerate(_ndjson(["a", "b", "c"], creator_user_id=16).encode().splitlines()):
+                if index == 2:
+                    # 上传进行中，其他请求仍然可以写入
+                    async with async_session_maker() as other:
+                        await asyncio.wait_for(create_character_async(other, CharacterCreate(name="writer")), timeout=2)
+                yield line
+
+        async with async_session_maker() as db:
+            story = await import_story_async(db, slow_upload())
+        return story.id
+
+    story_id = asyncio.run(main())
+    assert [block["content"] for block in client.get(f"/story/stories/{story_id}/blocks").json()] == ["a", "b", "c"]
+
+
+def test_export_reads_one_snapshot(client):
+    import asyncio
+
+    from genstoryai_backend.database.crud import insert_block_async, iter_block_contents_async
+    from genstoryai_backend.database.db import async_session_maker, begin_read_snapshot
+
+    story_id = client.post("/story/stories/import", content=_ndjson(["a", "b", "c", "d"], creator_user_id=17).encode()).json()["id"]
+
+    async def main():
+        async with async_session_maker() as db:
+            await begin_read_snapshot(db)
+            contents = []
+            async for content in iter_block_contents_async(db, story_id, batch_size=2):
+                contents.append(content)
+                if len(contents) == 2:
+                    # 导出进行中插入到开头，后面的块整体后移
+                    async with async_session_maker() as other:
+                        await insert_block_async(other, story_id, "new", 0)
+            return contents
+
+    assert asyncio.run(main()) == ["a", "b", "c", "d"]
+    assert [block["content"] for block in client.get(f"/story/stories/{story_id}/blocks").json()] == ["new", "a", "b", "c", "d"]
+
+
+def test_container_export_streams_blocks(client):
+    from genstoryai_backend.ssf.container import ContainerReader
+
+    story_id = client.post("/story/stories/import", content=_ndjson(["一", "二", "三"], title="binary", creator_user_id=16).encode()).json()["id"]
+    exported = client.get(f"/story/stories/{story_id}/export", params={"format": "ssfb"})
+    assert exported.status_code == 200
+    with ContainerReader(exported.content) as reader:
+        assert reader.block(2) == "三"
+        assert reader.metadata()["metadata"]["title"] == "binary"
@@ -0,0 +1,16 @@
+def test_startup_importtime_is_disabled_by_default_and_bounded(client, monkeypatch):
+    from genstoryai_backend.config import settings
+
+    response = client.get("/system/startup")
+    assert response.status_code == 200
+    assert "imports" not in response.json()
+    assert client.get("/system/startup", params={"importtime": True}).status_code == 403
+
+    monkeypatch.setattr(settings, "STARTUP_IMPORTTIME_ENABLED", True)
+    monkeypatch.setattr(settings, "STARTUP_IMPORTTIME_TIMEOUT_SECONDS", 0.001)
+    assert client.get("/system/startup", params={"importtime": True}).status_code == 504
+
+
+def test_cache_stats_cover_all_caches(client):
+    stats = client.get("/system/cache").json()
+    assert {"enabled", "story", "character", "ssf_parse", "relationship_graph", "timeline_index", "generation"} <= stats.keys()
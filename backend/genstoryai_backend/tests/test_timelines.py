@@ -0,0 +1,89 @@
+import json
+import random
+from datetime import datetime, timedelta
+
+from genstoryai_backend.database.pagination import encode_cursor
+from genstoryai_backend.database.timeline_index import IntervalIndex
+
+
+def _story(client, creator_user_id):
+    client.post("/story/stories/", json={
+        "title": "timeline", "creator_user_id": creator_user_id, "story_template_id": None,
+        "ssf": json.dumps({"metadata": {"title": "timeline"}, "content_blocks": {"blocks": []},
+                           "characters": {}, "timeline": {}, "extended_metadata": {}}),
+    })
+    return client.get("/story/stories/", params={"creator_user_id": creator_user_id}).json()["items"][0]["id"]
+
+
+def _names(client, **params):
+    response = client.get("/timeline/events/", params=params)
+    assert response.status_code == 200
+    return [event["name"] for event in response.json()["items"]]
+
+
+def test_timeline_events_split_and_merge(client):
+    story_id = _story(client, 19)
+    main = client.post("/timeline/timelines/", json={
+        "story_id": story_id, "name": "main", "start_time": "2000-01-01T00:00:00", "end_time": "2000-12-31T00:00:00",
+    }).json()["id"]
+    side = client.post("/timeline/timelines/", json={
+        "story_id": story_id, "name": "side", "start_time": "2000-03-01T00:00:00", "end_time": "2001-06-01T00:00:00",
+    }).json()["id"]
+    for name, start, end, timelines in [
+        ("a", "2000-01-10T00:00:00", "2000-02-10T00:00:00", [main]),
+        ("b", "2000-03-05T00:00:00", None, [side]),
+        ("c", "2000-05-01T00:00:00", "2000-08-01T00:00:00", [main, side]),
+        ("d", "2000-09-01T08:00:00+08:00", "2001-01-01T00:00:00", [main]),
+    ]:
+        assert client.post("/timeline/events/", json={
+            "story_id": story_id, "name": name, "start_time": start, "end_time": end, "timeline_ids": timelines,
+        }).status_code == 200
+
+    assert _names(client, story_id=story_id) == ["a", "b", "c", "d"]
+    assert _names(client, story_id=story_id, start="2000-02-10T00:00:00", end="2000-03-05T00:00:00") == ["a", "b"]
+    assert _names(client, story_id=story_id, start="2000-06-01T00:00:00", end="2000-06-02T00:00:00") == ["c"]
+    assert _names(client, story_id=story_id, timeline_id=[side]) == ["b", "c"]
+    page = client.get("/timeline/events/", params={"story_id": story_id, "limit": 3}).json()
+    assert client.get("/timeline/events/", params={"story_id": story_id, "cursor": page["next_cursor"]}).json()["items"][0]["name"] == "d"
+    # 带时区的查询时间按 UTC 比较，伪造的游标返回 400
+    assert _names(client, story_id=story_id, start="2000-09-01T08:00:00+08:00", end="2000-09-01T01:00:00+01:00") == ["d"]
+    for forged in ([1, 2], [{"dt": "2000-01-01T00:00:00+08:00"}, 1], [{"dt": "2000-01-01T00:00:00"}, "x"]):
+        cursor = encode_cursor(forged)
+        assert client.get("/timeline/events/", params={"story_id": story_id, "cursor": cursor}).status_code == 400
+
+    first, second = client.post(f"/timeline/timelines/{main}/split", json={"at": "2000-06-01T00:00:00", "name": "late"}).json()
+    assert first["end_time"] == second["start_time"] == "2000-06-01T00:00:00"
+    assert _names(client, story_id=story_id, timeline_id=[main]) == ["a", "c"]
+    assert _names(client, story_id=story_id, timeline_id=[second["id"]]) == ["d"]
+
+    merged = client.post("/timeline/timelines/merge", json={"target_id": main, "source_ids": [side, second["id"]]}).json()
+    assert (merged["start_time"], merged["end_time"]) == ("2000-01-01T00:00:00", "2001-06-01T00:00:00")
+    assert _names(client, story_id=story_id, timeline_id=[main]) == ["a", "b", "c", "d"]
+    assert [timeline["id"] for timeline in client.get("/timeline/timelines/", params={"story_id": story_id}).json()] == [main]
+
+    assert client.post("/timeline/events/", json={"story_id": story_id, "name": "e", "timeline_ids": [side]}).status_code == 400
+    client.delete(f"/timeline/timelines/{main}")
+    assert _names(client, story_id=story_id, timeline_id=[main]) == []
+
+
+def test_interval_index_matches_scan():
+    rng = random.Random(7)
+    base = datetime(2000, 1, 1)
+    events = []
+    for event_id in range(2000):
+        start = base + timedelta(days=rng.randint(0, 3650))
+        events.append((event_id, start, start + timedelta(days=rng.randint(0, 90)) if rng.random() < 0.7 else None))
+    links = [(rng.randint(1, 4), event_id) for event_id, _, _ in events]
+    index = IntervalIndex(events, links)
+    timelines = {}
+    for timeline_id, event_id in links:
+        timelines.setdefault(event_id, set()).add(timeline_id)
+    ordered = sorted(events, key=lambda event: (event[1], event[0]))
+    for _ in range(50):
+        start = base + timedelta(days=rng.randint(0, 3650))
+        end = start + timedelta(days=rng.randint(0, 60))
+        expected = [
+            event_id for event_id, event_start, event_end in ordered
+            if event_start <= end and (event_end or event_start) >= start and timelines[event_id] & {1, 3}
+        ]
+        assert index.overlapping(start, end, timeline_ids=[1, 3]) == expected
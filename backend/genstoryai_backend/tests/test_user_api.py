@@ -0,0 +1,61 @@
+def test_register_rejects_duplicate_email_and_username(client):
+    user = {"username": "dup-user", "email": "dup@example.com", "password": "secret"}
+    assert client.post("/user/register", json=user).status_code == 200
+
+    same_email = client.post("/user/register", json={**user, "username": "other"})
+    assert same_email.status_code == 400
+    assert same_email.json()["detail"] == "Email already registered"
+
+    same_username = client.post("/user/register", json={**user, "email": "other@example.com"})
+    assert same_username.status_code == 400
+    assert same_username.json()["detail"] == "Username already taken"
+
+
+def test_login_by_username_or_email(client):
+    user = {"username": "login-user", "email": "login@example.com", "password": "secret"}
+    assert client.post("/user/register", json=user).status_code == 200
+
+    for login in ("login-user", "login@example.com"):
+        response = client.post("/user/token", data={"username": login, "password": "secret"})
+        # 找到了用户且密码正确，只是邮箱尚未验证
+        assert response.status_code == 401
+        assert response.json()["detail"] == "请先验证您的邮箱地址"
+
+    wrong = client.post("/user/token", data={"username": "login-user", "password": "bad"})
+    assert wrong.json()["detail"] == "Incorrect username or password"
+
+
+def test_register_checks_email_and_username_separately(client):
+    user = {"username": "both-user", "email": "both@example.com", "password": "secret"}
+    assert client.post("/user/register", json=user).status_code == 200
+    other = {"username": "both-other", "email": "both-other@example.com", "password": "secret"}
+    assert client.post("/user/register", json=other).status_code == 200
+
+    # 邮箱与一个用户冲突、用户名与另一个用户冲突时，先报告邮箱
+    crossed = client.post("/user/register", json={**user, "username": "both-other"})
+    assert crossed.json()["detail"] == "Email already registered"
+
+    # 未填写用户名的用户可以有多个
+    for index in range(2):
+        response = client.post("/user/register", json={"email": f"anonymous-{index}@example.com", "password": "secret"})
+        assert response.status_code == 200
+
+
+def test_deleted_user_releases_email_and_username(client):
+    from sqlmodel import Session, select
+
+    from genstoryai_backend.config import settings
+    from genstoryai_backend.database.db import engine
+    from genstoryai_backend.models.user import User
+
+    user = {"username": "gone-user", "email": "gone@example.com", "password": "secret"}
+    assert client.post("/user/register", json=user).status_code == 200
+    with Session(engine) as session:
+        user_id = session.exec(select(User.id).where(User.email == "gone@example.com")).one()
+    assert client.delete(f"/user/users/{user_id}").status_code == 200
+
+    assert client.post("/user/register", json=user).status_code == 200
+    if settings.SOFT_DELETE:
+        with Session(engine) as session:
+            deleted = session.get(User, user_id)
+            assert deleted.is_deleted and deleted.email == f"gone@example.com#deleted-{user_id}"